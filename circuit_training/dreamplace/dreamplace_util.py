@@ -31,9 +31,10 @@ def print_and_save_result(plc, duration, method_name, filename_prefix,
   logging.info('*** %s took %g seconds.', method_name, duration)
   logging.info('***')
   logging.info('*** Wirelength: %g', plc.get_wirelength())
-  logging.info('*** Wirelength cost: %g', plc.get_cost())
-  logging.info('*** Density cost: %g', plc.get_density_cost())
-  logging.info('*** Congestion cost: %g', plc.get_congestion_cost())
+  costs = plc.get_cost_info()
+  logging.info('*** Wirelength cost: %g', costs['wirelength'])
+  logging.info('*** Density cost: %g', costs['density'])
+  logging.info('*** Congestion cost: %g', costs['congestion'])
   logging.info('***')
   logging.info('*** Plc file: %s', plc_filename)
   logging.info('**************************************************\n')
@@ -102,9 +102,13 @@ def convert_nodes(db, plc, hard_macro_order):
   hard_macro_indices = hard_macro_order
   non_movable_node_indices = []
 
-  for node_index in range(plc.num_nodes()):
-    node_type = plc.get_node_type(node_index)
-    if plc.is_node_fixed(node_index):
+  num_nodes = plc.num_nodes()
+  replies = plc.call_many([('get_node_type', (i,)) for i in range(num_nodes)] +
+                          [('is_node_fixed', (i,)) for i in range(num_nodes)])
+  node_types, is_fixed = replies[:num_nodes], replies[num_nodes:]
+  for node_index in range(num_nodes):
+    node_type = node_types[node_index]
+    if is_fixed[node_index]:
       assert node_index not in hard_macro_indices, (
           f'hard macro {node_index} is fixed and should '
           'not be included in `hard_macro_order`.')
@@ -135,7 +139,7 @@ def convert_nodes(db, plc, hard_macro_order):
       x, y = plc.get_node_location(node_index)
       logging.log_first_n(0, 'Node %s is placed at (%f, %f).', 5, node_index, x,
                           y)
-    if plc.get_node_type(node_index) == 'PORT':
+    if node_types[node_index] == 'PORT':
       # Treat a port as a node with 0 dimension and 'N' orientation.
       db.node_orient.append(b'N')
       db.original_node_size_x.append(0)
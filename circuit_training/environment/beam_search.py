@@ -0,0 +1,161 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Beam search over the actions of a placement policy.
+
+Each hard macro is placed at the `top_k` most likely feasible locations of
+every beam, and the `beam_width` most likely partial placements are kept.
+The expansions are stepped in parallel, each CircuitEnv with its own
+PlacementCost, by restoring the state of their beam:
+
+  envs = [environment.CircuitEnv(...) for _ in range(8)]
+  searcher = beam_search.BeamSearch(envs, logits_fn, beam_width=8, top_k=4)
+  result = searcher.search()
+  envs[0].set_state(result.state)  # e.g. to save the best placement.
+"""
+
+import concurrent.futures
+import dataclasses
+from typing import Any, Callable, Dict, List, Sequence, Text, Tuple
+
+from absl import logging
+from circuit_training.environment import environment
+import numpy as np
+
+ObsType = environment.ObsType
+
+
+@dataclasses.dataclass
+class _Beam:
+  log_prob: float
+  state: environment.CircuitEnvState
+  obs: ObsType
+  reward: float = 0.0
+  info: Any = None
+
+
+@dataclasses.dataclass
+class BeamSearchResult:
+  """The most rewarded complete placement of a search."""
+  actions: Tuple[int, ...]
+  reward: float
+  info: Dict[Text, float]
+  log_prob: float
+  state: environment.CircuitEnvState
+
+
+def _copy_obs(obs: ObsType) -> ObsType:
+  # The observations may be views of reused buffers of the env.
+  return {key: np.copy(value) for key, value in obs.items()}
+
+
+class BeamSearch(object):
+  """Beam search of placements, with the expansions stepped in parallel."""
+
+  def __init__(self,
+               envs: Sequence[environment.CircuitEnv],
+               logits_fn: Callable[[ObsType], np.ndarray],
+               beam_width: int = 8,
+               top_k: int = 4) -> None:
+    """Creates a BeamSearch.
+
+    Args:
+      envs: Environments of the same netlist and node order, each with its own
+        PlacementCost. The expansions are stepped on them in parallel.
+      logits_fn: Returns the logits of the policy over the actions of an
+        observation, e.g. from the action distribution of a PPO policy.
+      beam_width: Number of partial placements kept per node.
+      top_k: Number of actions expanded per partial placement.
+    """
+    if not envs:
+      raise ValueError('At least one environment is needed.')
+    if beam_width < 1 or top_k < 1:
+      raise ValueError('beam_width and top_k should be positive, got '
+                       f'{beam_width} and {top_k}.')
+    self._envs = list(envs)
+    self._logits_fn = logits_fn
+    self._beam_width = beam_width
+    self._top_k = top_k
+    self._executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=len(self._envs))
+
+  def _expand(self, beam: _Beam) -> List[Tuple[float, _Beam, int]]:
+    """Returns the top_k feasible actions of a beam, with their log probs."""
+    # The mask of the observation is bit-packed if the observations are compact.
+    mask = beam.state.mask.astype(bool)
+    logits = np.asarray(self._logits_fn(beam.obs), dtype=np.float64)
+    logits = np.where(mask, logits, -np.inf)
+    log_probs = logits - np.logaddexp.reduce(logits[mask])
+    num_actions = min(self._top_k, int(np.sum(mask)))
+    actions = np.argsort(-log_probs, kind='stable')[:num_actions]
+    return [(beam.log_prob + log_probs[a], beam, int(a)) for a in actions]
+
+  def _step(self, env: environment.CircuitEnv,
+            candidates: Sequence[Tuple[float, _Beam, int]]) -> List[_Beam]:
+    """Steps the candidates on an env, dropping the infeasible ones."""
+    beams = []
+    for log_prob, beam, action in candidates:
+      env.set_state(beam.state)
+      current_node = beam.state.current_node
+      obs, reward, done, info = env.step(action)
+      state = env.get_state()
+      if done and state.current_node != current_node + 1:
+        # The env was reset after reaching an infeasible state.
+        continue
+      beams.append(
+          _Beam(
+              log_prob=log_prob,
+              state=state,
+              obs=_copy_obs(obs),
+              reward=reward,
+              info=info))
+    return beams
+
+  def search(self) -> BeamSearchResult:
+    """Returns the most rewarded placement among the final beams.
+
+    Raises:
+      ValueError: If all the expansions become infeasible.
+    """
+    env = self._envs[0]
+    obs = env.reset()
+    beams = [_Beam(log_prob=0.0, state=env.get_state(), obs=_copy_obs(obs))]
+    while not beams[0].state.done:
+      candidates = [c for beam in beams for c in self._expand(beam)]
+      candidates.sort(key=lambda c: -c[0])
+      candidates = candidates[:self._beam_width]
+      chunks = [
+          candidates[i::len(self._envs)] for i in range(len(self._envs))
+      ]
+      futures = [
+          self._executor.submit(self._step, env, chunk)
+          for env, chunk in zip(self._envs, chunks)
+          if chunk
+      ]
+      beams = [beam for f in futures for beam in f.result()]
+      if not beams:
+        raise ValueError('All the beams reached an infeasible state.')
+      beams.sort(key=lambda b: -b.log_prob)
+      logging.info('Beam search at node %d, best log prob: %f',
+                   beams[0].state.current_node, beams[0].log_prob)
+    best = max(beams, key=lambda b: b.reward)
+    return BeamSearchResult(
+        actions=best.state.current_actions,
+        reward=best.reward,
+        info=best.info,
+        log_prob=best.log_prob,
+        state=best.state)
+
+  def close(self) -> None:
+    self._executor.shutdown()
@@ -0,0 +1,75 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for beam_search."""
+
+import functools
+import os
+
+from absl import flags
+from circuit_training.environment import beam_search
+from circuit_training.environment import environment
+from circuit_training.environment import placement_util
+from circuit_training.utils import test_utils
+import numpy as np
+
+FLAGS = flags.FLAGS
+
+_TEST_NETLIST_DIR = ('circuit_training/environment/test_data/'
+                     'sample_clustered')
+
+
+def _create_env():
+  return environment.CircuitEnv(
+      netlist_file=os.path.join(FLAGS.test_srcdir, _TEST_NETLIST_DIR,
+                                'netlist.pb.txt'),
+      init_placement=os.path.join(FLAGS.test_srcdir, _TEST_NETLIST_DIR,
+                                  'initial.plc'),
+      create_placement_cost_fn=functools.partial(
+          placement_util.create_placement_cost, backend='numpy'))
+
+
+class BeamSearchTest(test_utils.TestCase):
+
+  def test_search(self):
+    envs = [_create_env() for _ in range(2)]
+    rng = np.random.default_rng(0)
+    logits = rng.normal(size=envs[0].action_space.n)
+    searcher = beam_search.BeamSearch(
+        envs, lambda obs: logits, beam_width=3, top_k=2)
+    result = searcher.search()
+    searcher.close()
+    self.assertLen(result.actions, 2)
+    self.assertLess(result.log_prob, 0.0)
+
+    # Replaying the actions gives the same reward.
+    env = _create_env()
+    env.reset()
+    for action in result.actions:
+      _, reward, done, _ = env.step(action)
+    self.assertTrue(done)
+    self.assertAlmostEqual(reward, result.reward)
+
+    # The first node is only placed at its top_k most likely locations.
+    obs = env.reset()
+    masked_logits = np.where(obs['mask'] > 0, logits, -np.inf)
+    self.assertIn(result.actions[0], np.argsort(-masked_logits)[:2])
+
+  def test_invalid_args(self):
+    with self.assertRaises(ValueError):
+      beam_search.BeamSearch([], lambda obs: None)
+
+
+if __name__ == '__main__':
+  test_utils.main()
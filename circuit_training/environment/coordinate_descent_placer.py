@@ -21,6 +21,7 @@ from typing import Callable, Dict, Optional, List, Text, Tuple
 from absl import logging
 from circuit_training.environment import placement_util
 from circuit_training.environment import plc_client
+from circuit_training.environment import plc_pool
 import numpy as np
 
 NS_ORIENTATIONS = ['N', 'FN', 'S', 'FS']
@@ -47,7 +48,8 @@ class CoordinateDescentPlacer(object):
     """Creates a CoordinateDescentPlacer.
 
     Args:
-      plc: The placement cost object.
+      plc: The placement cost object. If it is a plc_pool.PlacementCostPool,
+        the candidate locations of a node are evaluated in parallel.
       cost_fn: The cost function that gets the plc and returns cost and info.
       epochs: Number of epochs (iterations) in coordinate descend algorithm.
       use_stdcell_placer: If True, places stdcells using stdcell placer.
@@ -136,13 +138,18 @@ class CoordinateDescentPlacer(object):
   def find_best_location(self, node: int, mask: List[int],
                          locations: List[int]) -> Optional[int]:
     """Given a soft macro, search the best location."""
+
+    def get_cost(plc, loc):
+      assert mask[loc] == 1
+      plc.place_node(node, loc)
+      new_cost, _ = self.cost_fn(plc)
+      plc.unplace_node(node)
+      return new_cost
+
     best_loc = None
     best_cost = float('inf')
-    for loc in locations:
-      assert mask[loc] == 1
-      self.plc.place_node(node, loc)
-      new_cost, _ = self.cost_fn(self.plc)
-      self.plc.unplace_node(node)
+    costs = plc_pool.map_jobs(self.plc, get_cost, locations)
+    for loc, new_cost in zip(locations, costs):
       if new_cost < best_cost:
         best_loc = loc
         best_cost = new_cost
@@ -154,20 +161,25 @@ class CoordinateDescentPlacer(object):
       orientations: List[Text]) -> Tuple[Optional[int], Optional[Text]]:
     """Given a hard macro, search the best location and orientation."""
     assert orientations
+
+    def get_cost(plc, loc_ori):
+      loc, ori = loc_ori
+      plc.place_node(node, loc)
+      plc.update_macro_orientation(node, ori)
+      new_cost, _ = self.cost_fn(plc)
+      plc.unplace_node(node)
+      return new_cost
+
     best_loc = None
     best_ori = None
     best_cost = float('inf')
-
-    for loc in locations:
-      for ori in orientations:
-        self.plc.place_node(node, loc)
-        self.plc.update_macro_orientation(node, ori)
-        new_cost, _ = self.cost_fn(self.plc)
-        self.plc.unplace_node(node)
-        if new_cost < best_cost:
-          best_loc = loc
-          best_ori = ori
-          best_cost = new_cost
+    candidates = [(loc, ori) for loc in locations for ori in orientations]
+    costs = plc_pool.map_jobs(self.plc, get_cost, candidates)
+    for (loc, ori), new_cost in zip(candidates, costs):
+      if new_cost < best_cost:
+        best_loc = loc
+        best_ori = ori
+        best_cost = new_cost
 
     return best_loc, best_ori
 
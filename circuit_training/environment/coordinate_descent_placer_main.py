@@ -39,12 +39,17 @@ from absl import flags
 from circuit_training.environment import coordinate_descent_placer
 from circuit_training.environment import environment
 from circuit_training.environment import placement_util
+from circuit_training.environment import plc_pool
 import numpy as np
 
 flags.DEFINE_string('netlist_file', None, 'Path to netlist file.')
 flags.DEFINE_string('init_placement', None, 'Path to initial placement file.')
 flags.DEFINE_string('cd_output_dir', '/tmp/cd', 'CD output dir.')
 flags.DEFINE_string('cd_placement_filename', 'cd', 'CD placement filename.')
+flags.DEFINE_integer(
+    'cd_num_workers', 1,
+    'Number of plc_wrapper_main processes that evaluate the candidate '
+    'locations of a node in parallel.')
 
 FLAGS = flags.FLAGS
 
@@ -52,8 +57,14 @@ FLAGS = flags.FLAGS
 def main(_):
   np.random.seed(FLAGS.seed)
 
-  plc = placement_util.create_placement_cost(FLAGS.netlist_file,
-                                             FLAGS.init_placement)
+  create_placement_cost_fn = functools.partial(
+      placement_util.create_placement_cost, FLAGS.netlist_file,
+      FLAGS.init_placement)
+  if FLAGS.cd_num_workers > 1:
+    plc = plc_pool.PlacementCostPool(create_placement_cost_fn,
+                                     FLAGS.cd_num_workers)
+  else:
+    plc = create_placement_cost_fn()
 
   if not FLAGS.cd_use_init_location:
     plc.unplace_all_nodes()
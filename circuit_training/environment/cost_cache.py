@@ -0,0 +1,80 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""An LRU cache of the final costs of episodes.
+
+Once the policy converges, many episodes place the hard macros at the same
+locations. CircuitEnv with `cost_cache_size` > 0 reuses the cost and info of
+such an episode instead of running the analytical placer and the cost calls
+again:
+
+  cache = cost_cache.EpisodeCostCache(max_size=1024)
+  key = cost_cache.episode_key(netlist_file, actions)
+  cost_and_info = cache.get(key)  # None on a miss.
+  cache.put(key, (cost, info))
+"""
+
+import collections
+import hashlib
+from typing import Dict, Optional, Sequence, Text, Tuple
+
+import numpy as np
+
+CostAndInfo = Tuple[float, Dict[Text, float]]
+
+
+def episode_key(netlist_file: Text, actions: Sequence[int]) -> bytes:
+  """Returns the key of the episode that took `actions` on `netlist_file`."""
+  digest = hashlib.sha256(netlist_file.encode('utf-8'))
+  digest.update(np.asarray(actions, dtype=np.int64).tobytes())
+  return digest.digest()
+
+
+class EpisodeCostCache(object):
+  """Cost and info of the last `max_size` episodes, with hit/miss counts."""
+
+  def __init__(self, max_size: int) -> None:
+    if max_size < 1:
+      raise ValueError(f'max_size should be positive, got {max_size}.')
+    self._max_size = max_size
+    # Key -> (cost, info), least recently used first.
+    self._entries = collections.OrderedDict()
+    self.hits = 0
+    self.misses = 0
+
+  def get(self, key: bytes) -> Optional[CostAndInfo]:
+    """Returns a copy of the cost and info of `key`, or None on a miss."""
+    entry = self._entries.get(key)
+    if entry is None:
+      self.misses += 1
+      return None
+    self.hits += 1
+    self._entries.move_to_end(key)
+    cost, info = entry
+    return cost, dict(info)
+
+  def put(self, key: bytes, cost_and_info: CostAndInfo) -> None:
+    """Adds the cost and info of `key`, evicting the least recently used."""
+    cost, info = cost_and_info
+    self._entries[key] = (cost, dict(info))
+    self._entries.move_to_end(key)
+    while len(self._entries) > self._max_size:
+      self._entries.popitem(last=False)
+
+  def __len__(self) -> int:
+    return len(self._entries)
+
+  def stats(self) -> Dict[Text, int]:
+    """Returns the number of hits, misses and cached episodes."""
+    return {'hits': self.hits, 'misses': self.misses, 'size': len(self)}
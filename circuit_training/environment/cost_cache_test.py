@@ -0,0 +1,57 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for cost_cache."""
+
+from circuit_training.environment import cost_cache
+from circuit_training.utils import test_utils
+
+
+class CostCacheTest(test_utils.TestCase):
+
+  def test_episode_key(self):
+    key = cost_cache.episode_key('a.pb.txt', [1, 2, 3])
+    self.assertEqual(key, cost_cache.episode_key('a.pb.txt', [1, 2, 3]))
+    self.assertNotEqual(key, cost_cache.episode_key('a.pb.txt', [1, 3, 2]))
+    self.assertNotEqual(key, cost_cache.episode_key('b.pb.txt', [1, 2, 3]))
+
+  def test_get_and_put(self):
+    cache = cost_cache.EpisodeCostCache(max_size=2)
+    self.assertIsNone(cache.get(b'a'))
+    cache.put(b'a', (1.0, {'wirelength': 0.5}))
+    cost, info = cache.get(b'a')
+    self.assertEqual((cost, info), (1.0, {'wirelength': 0.5}))
+    # The cached info is not changed through the returned copy.
+    info['wirelength'] = 2.0
+    self.assertEqual(cache.get(b'a'), (1.0, {'wirelength': 0.5}))
+    self.assertEqual(cache.stats(), {'hits': 2, 'misses': 1, 'size': 1})
+
+  def test_evicts_least_recently_used(self):
+    cache = cost_cache.EpisodeCostCache(max_size=2)
+    cache.put(b'a', (1.0, {}))
+    cache.put(b'b', (2.0, {}))
+    cache.get(b'a')
+    cache.put(b'c', (3.0, {}))
+    self.assertLen(cache, 2)
+    self.assertIsNone(cache.get(b'b'))
+    self.assertEqual(cache.get(b'a'), (1.0, {}))
+    self.assertEqual(cache.get(b'c'), (3.0, {}))
+
+  def test_invalid_size(self):
+    with self.assertRaises(ValueError):
+      cost_cache.EpisodeCostCache(max_size=0)
+
+
+if __name__ == '__main__':
+  test_utils.main()
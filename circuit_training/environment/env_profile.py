@@ -0,0 +1,86 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Time spent in each phase of the steps and resets of CircuitEnv.
+
+Phases nest, and are named after the phases they are in:
+
+  profile = env_profile.EnvProfile()
+  with profile.phase('step'):
+    with profile.phase('mask'):
+      ...
+  profile.snapshot()  # {'step': {...}, 'step/mask': {...}}
+"""
+
+import collections
+import contextlib
+import time
+from typing import Dict, Iterator, Sequence, Text
+
+ProfileType = Dict[Text, Dict[Text, float]]
+
+
+class _PhaseStats(object):
+
+  def __init__(self):
+    self.count = 0
+    self.total_seconds = 0.0
+
+
+class EnvProfile(object):
+  """Cumulative call count and time per phase. Not thread-safe."""
+
+  def __init__(self):
+    self._phases = collections.defaultdict(_PhaseStats)
+    self._current = []
+
+  @contextlib.contextmanager
+  def phase(self, name: Text) -> Iterator[None]:
+    """Times the block as `name`, inside the phases it is nested in."""
+    self._current.append(name)
+    full_name = '/'.join(self._current)
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      stats = self._phases[full_name]
+      stats.count += 1
+      stats.total_seconds += time.perf_counter() - start
+      self._current.pop()
+
+  def snapshot(self) -> ProfileType:
+    """Returns the number of calls and the total seconds of every phase."""
+    return {
+        name: {
+            'count': stats.count,
+            'total_seconds': stats.total_seconds
+        } for name, stats in self._phases.items()
+    }
+
+  def reset(self) -> None:
+    self._phases.clear()
+
+
+def merge_profiles(profiles: Sequence[ProfileType]) -> ProfileType:
+  """Returns the sum of several snapshots, e.g. of a batch of environments."""
+  merged = {}
+  for profile in profiles:
+    for name, stats in profile.items():
+      merged_stats = merged.setdefault(name, {
+          'count': 0,
+          'total_seconds': 0.0
+      })
+      merged_stats['count'] += stats['count']
+      merged_stats['total_seconds'] += stats['total_seconds']
+  return merged
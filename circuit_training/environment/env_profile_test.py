@@ -0,0 +1,64 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for env_profile."""
+
+from circuit_training.environment import env_profile
+from circuit_training.utils import test_utils
+
+
+class EnvProfileTest(test_utils.TestCase):
+
+  def test_nested_phases(self):
+    profile = env_profile.EnvProfile()
+    for _ in range(2):
+      with profile.phase('step'):
+        with profile.phase('mask'):
+          pass
+    with profile.phase('reset'):
+      with profile.phase('mask'):
+        pass
+    snapshot = profile.snapshot()
+    self.assertCountEqual(snapshot,
+                          ['step', 'step/mask', 'reset', 'reset/mask'])
+    self.assertEqual(snapshot['step']['count'], 2)
+    self.assertEqual(snapshot['reset/mask']['count'], 1)
+    self.assertGreaterEqual(snapshot['step']['total_seconds'],
+                            snapshot['step/mask']['total_seconds'])
+    profile.reset()
+    self.assertEmpty(profile.snapshot())
+
+  def test_phase_with_exception(self):
+    profile = env_profile.EnvProfile()
+    with self.assertRaises(ValueError):
+      with profile.phase('step'):
+        raise ValueError()
+    with profile.phase('reset'):
+      pass
+    self.assertCountEqual(profile.snapshot(), ['step', 'reset'])
+
+  def test_merge_profiles(self):
+    merged = env_profile.merge_profiles([
+        {'step': {'count': 1, 'total_seconds': 1.0}},
+        {'step': {'count': 2, 'total_seconds': 0.5},
+         'reset': {'count': 1, 'total_seconds': 0.25}},
+    ])
+    self.assertEqual(merged, {
+        'step': {'count': 3, 'total_seconds': 1.5},
+        'reset': {'count': 1, 'total_seconds': 0.25},
+    })
+
+
+if __name__ == '__main__':
+  test_utils.main()
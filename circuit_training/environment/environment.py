@@ -14,21 +14,27 @@
 # limitations under the License.
 """Circuit training Environmnet with gin config."""
 
+import dataclasses
 import datetime
+import functools
 import math
-import os
-from typing import Any, Callable, Dict, Text, Tuple, Optional
+from typing import Any, Callable, Dict, Sequence, Text, Tuple, Optional
 
 from absl import logging
-from circuit_training.environment import coordinate_descent_placer as cd_placer
+from circuit_training.environment import cost_cache
+from circuit_training.environment import env_profile
 from circuit_training.environment import observation_config
 from circuit_training.environment import observation_extractor
+from circuit_training.environment import occupancy_mask
+from circuit_training.environment import placement_saver
 from circuit_training.environment import placement_util
 from circuit_training.environment import plc_client
 import gin
 import gym
 import numpy as np
 import tensorflow as tf
+from tf_agents.environments import batched_py_environment
+from tf_agents.environments import gym_wrapper
 from tf_agents.environments import suite_gym
 from tf_agents.environments import wrappers
 
@@ -58,6 +64,34 @@ class InfeasibleActionError(ValueError):
 COST_COMPONENTS = ['wirelength', 'congestion', 'density']
 
 
+@dataclasses.dataclass
+class CircuitEnvState:
+  """The state of a CircuitEnv episode, see `CircuitEnv.get_state`."""
+  current_node: int
+  current_actions: Tuple[int, ...]
+  done: bool
+  mask: np.ndarray
+  placement: plc_client.PlacementSnapshot
+  # Node locations and placed flags of the observation extractor.
+  features: Dict[Text, np.ndarray]
+
+
+def _profiled(
+    name: Text) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+  """Times a method of CircuitEnv as the phase `name` of its profile."""
+
+  def decorator(method):
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+      with self._profile.phase(name):  # pylint: disable=protected-access
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+  return decorator
+
+
 @gin.configurable
 def cost_info_function(
     plc: plc_client.PlacementCost,
@@ -89,17 +123,17 @@ def cost_info_function(
   if not done:
     return proxy_cost, info
 
-  if wirelength_weight > 0.0:
-    info['wirelength'] = plc.get_cost()
-    proxy_cost += wirelength_weight * info['wirelength']
-
-  if congestion_weight > 0.0:
-    info['congestion'] = plc.get_congestion_cost()
-    proxy_cost += congestion_weight * info['congestion']
-
-  if density_weight > 0.0:
-    info['density'] = plc.get_density_cost()
-    proxy_cost += density_weight * info['density']
+  # Only the costs with a positive weight are evaluated, in a single call, and
+  # reused by later calls until the placement changes.
+  weights = {
+      'wirelength': wirelength_weight,
+      'congestion': congestion_weight,
+      'density': density_weight,
+  }
+  components = [cost for cost in COST_COMPONENTS if weights[cost] > 0.0]
+  for cost, value in plc.get_cost_info(components).items():
+    info[cost] = value
+    proxy_cost += weights[cost] * value
 
   return proxy_cost, info
 
@@ -132,6 +166,13 @@ class CircuitEnv(object):
       unplace_all_nodes_in_init: bool = True,
       output_all_features: bool = False,
       node_order: Text = 'descending_size_macro_first',
+      cost_cache_size: int = 0,
+      reuse_observation_buffers: bool = False,
+      incremental_mask: bool = False,
+      check_incremental_mask: bool = False,
+      fast_reset: bool = False,
+      lookahead_mask: bool = False,
+      async_save_placement: bool = False,
       ):
     """Creates a CircuitEnv.
 
@@ -164,8 +205,36 @@ class CircuitEnv(object):
       output_all_features: If true, it outputs all the observation features.
         Otherwise, it only outputs the dynamic observations.
       node_order: The sequence order of nodes placed by RL.
+      cost_cache_size: If positive, the cost and info of the last
+        `cost_cache_size` distinct episodes are kept, and an episode that
+        places the hard macros like one of them skips the analytical placer
+        and the cost calls. Not used in eval, which saves the placements.
+      reuse_observation_buffers: If True, the observations are views of
+        preallocated arrays reused by later steps, instead of new arrays. An
+        observation stays valid for the next step, e.g. for the trajectories
+        of a PyDriver, and has to be copied to be kept longer.
+      incremental_mask: If True, the masks of the hard macros are computed in
+        Python from the macros placed so far, instead of calling
+        plc.get_node_mask at every step.
+      check_incremental_mask: If True, every incremental mask is compared to
+        plc.get_node_mask, for debugging.
+      fast_reset: If True, a reset after the first one only unplaces the nodes
+        placed during the episode, by RL or by the analytical placer, resets
+        the orientations of its hard macros to the ones of the first reset, and
+        reuses the mask of the first node, which is the same in every episode.
+      lookahead_mask: If True, the mask also excludes the grid cells that
+        provably leave no room for the hard macros placed later, so that
+        doomed episodes end earlier. Requires incremental_mask.
+      async_save_placement: If True, the eval placements are saved and
+        fine-tuned with CD from a background thread with its own PlacementCost,
+        instead of in step. A placement that waits while a newer one is saved
+        is dropped. Call `close` to wait for the pending placements.
+
+    Raises:
+      ValueError: If lookahead_mask is set without incremental_mask.
     """
     self._global_seed = global_seed
+    self._profile = env_profile.EnvProfile()
     if not netlist_file:
       raise ValueError('netlist_file must be provided.')
 
@@ -175,7 +244,6 @@ class CircuitEnv(object):
     self._is_eval = is_eval
     self._save_best_cost = save_best_cost
     self._output_plc_file = output_plc_file
-    self._output_plc_dir = os.path.dirname(output_plc_file)
     self._make_soft_macros_square = make_soft_macros_square
     self._cd_finetune = cd_finetune
     self._cd_plc_file = cd_plc_file
@@ -183,8 +251,27 @@ class CircuitEnv(object):
     self._netlist_index = netlist_index
     self._output_all_features = output_all_features
     self._node_order = node_order
+    self._cost_cache = None
+    if cost_cache_size > 0 and not is_eval:
+      self._cost_cache = cost_cache.EpisodeCostCache(cost_cache_size)
     self._plc = create_placement_cost_fn(
         netlist_file=netlist_file, init_placement=init_placement)
+    self._placement_saver = None
+    if async_save_placement and is_eval:
+
+      def create_saver_plc():
+        plc = create_placement_cost_fn(
+            netlist_file=netlist_file, init_placement=init_placement)
+        if make_soft_macros_square:
+          plc.make_soft_macros_square()
+        return plc
+
+      self._placement_saver = placement_saver.AsyncPlacementSaver(
+          create_saver_plc,
+          cost_info_fn=cost_info_fn,
+          output_plc_file=output_plc_file,
+          cd_finetune=cd_finetune,
+          cd_plc_file=cd_plc_file)
 
     # We call ObservationExtractor before unplace_all_nodes, so we use the
     # inital placement in the static features (location_x and location_y).
@@ -193,7 +280,8 @@ class CircuitEnv(object):
     self._observation_extractor = observation_extractor.ObservationExtractor(
         plc=self._plc,
         observation_config=self._observation_config,
-        netlist_index=self._netlist_index)
+        netlist_index=self._netlist_index,
+        reuse_buffers=reuse_observation_buffers)
 
     if self._make_soft_macros_square:
       # It is better to make the shape of soft macros square before using
@@ -204,22 +292,33 @@ class CircuitEnv(object):
     self._canvas_width, self._canvas_height = self._plc.get_canvas_width_height(
     )
 
+    macro_indices = self._plc.get_macro_indices()
+    is_soft = self._plc.call_many([
+        ('is_node_soft_macro', (m,)) for m in macro_indices
+    ])
     self._hard_macro_indices = [
-        m for m in self._plc.get_macro_indices()
-        if not self._plc.is_node_soft_macro(m)
+        m for m, soft in zip(macro_indices, is_soft) if not soft
     ]
     self._num_hard_macros = len(self._hard_macro_indices)
 
     self._sorted_node_indices = placement_util.get_ordered_node_indices(
         mode=self._node_order, plc=self._plc, seed=self._global_seed)
 
+    self._occupancy_mask = None
+    self._check_incremental_mask = check_incremental_mask
+    if incremental_mask:
+      self._occupancy_mask = occupancy_mask.OccupancyMask(self._plc)
+    if lookahead_mask and not incremental_mask:
+      raise ValueError('lookahead_mask requires incremental_mask.')
+    self._lookahead_mask = lookahead_mask
+
     self._sorted_soft_macros = self._sorted_node_indices[self._num_hard_macros:]
 
     # Generate a map from actual macro_index to its position in
     # self.macro_indices. Needed because node adjacency matrix is in the same
     # node order of plc.get_macro_indices.
     self._macro_index_to_pos = {}
-    for i, macro_index in enumerate(self._plc.get_macro_indices()):
+    for i, macro_index in enumerate(macro_indices):
       self._macro_index_to_pos[macro_index] = i
 
     # Padding for mapping the placement canvas on the agent canvas.
@@ -230,6 +329,32 @@ class CircuitEnv(object):
     self._low_pad = rows_pad - self._up_pad
     self._left_pad = cols_pad - self._right_pad
 
+    self._reuse_observation_buffers = reuse_observation_buffers
+    if reuse_observation_buffers:
+      # Index of each grid cell in the padded mask, whose padding stays zero.
+      max_grid_size = self._observation_config.max_grid_size
+      rows, cols = np.meshgrid(
+          np.arange(self._grid_rows), np.arange(self._grid_cols),
+          indexing='ij')
+      self._mask_index = ((rows + self._up_pad) * max_grid_size + cols +
+                          self._right_pad).ravel()
+      # A step that ends in an infeasible state gets a second mask from reset,
+      # so three buffers keep the mask of the previous observation valid.
+      self._mask_buffers = [
+          np.zeros((max_grid_size**2,), dtype=np.int32) for _ in range(3)
+      ]
+      self._mask_buffer_index = 0
+
+    self._fast_reset = fast_reset
+    # Nodes placed in the episode, None until a full reset.
+    self._episode_nodes = None
+    # Non-fixed soft macros and stdcells, placed by the analytical placer.
+    self._analytical_placer_nodes = None
+    # Orientations of the hard macros at the first reset. CD and restored
+    # states can change them.
+    self._hard_macro_orientations = None
+    self._first_mask = None
+
     self._saved_cost = np.inf
     self._current_actions = []
     self._current_node = 0
@@ -240,8 +365,12 @@ class CircuitEnv(object):
     if unplace_all_nodes_in_init:
       # TODO(b/223026568) Remove unplace_all_nodes from init
       self._plc.unplace_all_nodes()
+      if self._occupancy_mask:
+        self._occupancy_mask.reset()
       logging.warning('* Unplaced all Nodes in init *')
     logging.info('***Num node to place***:%s', self._num_hard_macros)
+    # Only the steps and resets are profiled.
+    self._profile.reset()
 
   @property
   def observation_space(self) -> gym.spaces.Space:
@@ -271,6 +400,11 @@ class CircuitEnv(object):
   def grid_rows(self) -> int:
     return self._grid_rows
 
+  @property
+  def cost_cache(self) -> Optional[cost_cache.EpisodeCostCache]:
+    """The cache of the episode costs, None if `cost_cache_size` is 0."""
+    return self._cost_cache
+
   def get_static_obs(self):
     """Get the static observation for the environment.
 
@@ -283,27 +417,72 @@ class CircuitEnv(object):
     """
     return self._observation_extractor.get_static_features()
 
+  def get_profile(self) -> env_profile.ProfileType:
+    """Returns the number of calls and the total seconds of every phase.
+
+    The phases of the steps and resets are named e.g. 'step', 'step/mask',
+    'step/place_node', 'step/observation', 'step/analytical_placer',
+    'step/cost', 'reset' and 'reset/unplace_all_nodes'.
+    """
+    return self._profile.snapshot()
+
+  def close(self) -> None:
+    """Waits for the placements being saved in the background, if any."""
+    if self._placement_saver:
+      self._placement_saver.close()
+
   def get_cost_info(self,
                     done: bool = False) -> Tuple[float, Dict[Text, float]]:
     return self._cost_info_fn(plc=self._plc, done=done)  # pytype: disable=wrong-keyword-args  # trace-all-classes
 
+  @_profiled('mask')
   def _get_mask(self) -> np.ndarray:
     """Gets the node mask for the current node.
 
     Returns:
       List of 0s and 1s indicating if action is feasible or not.
     """
+    if self._reuse_observation_buffers:
+      self._mask_buffer_index = (self._mask_buffer_index + 1) % len(
+          self._mask_buffers)
+      mask = self._mask_buffers[self._mask_buffer_index]
+      if self._done:
+        mask.fill(0)
+      else:
+        node_index = self._sorted_node_indices[self._current_node]
+        mask[self._mask_index] = self._get_node_mask(node_index)
+      return mask
     if self._done:
       mask = np.zeros(self._observation_config.max_grid_size**2, dtype=np.int32)
     else:
       node_index = self._sorted_node_indices[self._current_node]
-      mask = np.asarray(self._plc.get_node_mask(node_index), dtype=np.int32)
+      mask = np.asarray(self._get_node_mask(node_index), dtype=np.int32)
       mask = np.reshape(mask, [self._grid_rows, self._grid_cols])
       pad = ((self._up_pad, self._low_pad), (self._right_pad, self._left_pad))
       mask = np.pad(mask, pad, mode='constant', constant_values=0)
     return np.reshape(
         mask, (self._observation_config.max_grid_size**2,)).astype(np.int32)
 
+  def _get_node_mask(self, node_index: int) -> Sequence[int]:
+    """Returns the grid mask of a hard macro."""
+    if not self._occupancy_mask:
+      return self._plc.get_node_mask(node_index)
+    mask = self._occupancy_mask.get_node_mask(node_index)
+    if self._check_incremental_mask:
+      expected = np.asarray(self._plc.get_node_mask(node_index), dtype=bool)
+      if not np.array_equal(mask, expected):
+        raise RuntimeError(
+            f'Incremental mask of node {node_index} differs from '
+            f'plc.get_node_mask in {np.sum(mask != expected)} grid cells.')
+    if self._lookahead_mask:
+      with self._profile.phase('lookahead'):
+        mask = mask & self._occupancy_mask.get_lookahead_mask(
+            node_index,
+            self._sorted_node_indices[self._current_node +
+                                      1:self._num_hard_macros])
+    return mask
+
+  @_profiled('observation')
   def _get_obs(self) -> ObsType:
     """Returns the observation."""
     if self._current_node > 0:
@@ -329,22 +508,7 @@ class CircuitEnv(object):
           current_node_index=current_node_index,
           mask=self._current_mask)
 
-  def _run_cd(self):
-    """Runs coordinate descent to finetune the current placement."""
-
-    # CD only modifies macro orientation.
-    # Plc modified by CD will be reset at the end of the episode.
-
-    def cost_fn(plc):
-      return self._cost_info_fn(plc=plc, done=True)  # pytype: disable=wrong-keyword-args  # trace-all-classes
-
-    cd = cd_placer.CoordinateDescentPlacer(
-        plc=self._plc,
-        cost_fn=cost_fn,
-        use_stdcell_placer=True,
-        optimize_only_orientation=True)
-    cd.place()
-
+  @_profiled('save_placement')
   def _save_placement(self, cost: float) -> None:
     """Saves the current placement.
 
@@ -361,26 +525,27 @@ class CircuitEnv(object):
       if self._train_step:
         user_comments = f'Train step : {self._train_step.numpy()}'
 
-      placement_util.save_placement(self._plc, self._output_plc_file,
-                                    user_comments)
       ts = datetime.datetime.now().strftime('%Y%m%d_%H%M%S')
-      ppo_snapshot_file = os.path.join(
-          self._output_plc_dir,
-          f'snapshot_ppo_opt_placement_timestamp_{ts}_cost_{cost:.4f}.plc')
-      placement_util.save_placement(self._plc, ppo_snapshot_file, user_comments)
       self._saved_cost = cost
+      if self._placement_saver:
+        self._placement_saver.submit(
+            placement_saver.SaveRequest(
+                snapshot=self._plc.snapshot(),
+                cost=cost,
+                user_comments=user_comments,
+                timestamp=ts))
+        return
 
       # Only runs CD if this is the best RL placement seen so far.
-      if self._cd_finetune:
-        self._run_cd()
-        cost = self._cost_info_fn(plc=self._plc, done=True)[0]  # pytype: disable=wrong-keyword-args  # trace-all-classes
-        cd_plc_file = os.path.join(self._output_plc_dir, self._cd_plc_file)
-        placement_util.save_placement(self._plc, cd_plc_file, user_comments)
-        cd_snapshot_file = os.path.join(
-            self._output_plc_dir,
-            f'snapshot_ppo_cd_placement_timestamp_{ts}_cost_{cost:.4f}.plc')
-        placement_util.save_placement(self._plc, cd_snapshot_file,
-                                      user_comments)
+      placement_saver.save_placements(
+          self._plc,
+          cost=cost,
+          user_comments=user_comments,
+          timestamp=ts,
+          output_plc_file=self._output_plc_file,
+          cost_info_fn=self._cost_info_fn,
+          cd_finetune=self._cd_finetune,
+          cd_plc_file=self._cd_plc_file)
 
   def call_analytical_placer_and_get_cost(self) -> Tuple[float, InfoType]:
     """Calls analytical placer.
@@ -391,13 +556,25 @@ class CircuitEnv(object):
     Returns:
       A tuple for placement cost and info.
     """
+    key = None
+    if self._done and self._cost_cache is not None:
+      # The std cells placement only depends on the hard macro placement, so
+      # an episode with the same actions has the same cost.
+      key = cost_cache.episode_key(self.netlist_file, self._current_actions)
+      cached = self._cost_cache.get(key)
+      if cached is not None:
+        cost, info = cached
+        return -cost, info
     if self._done:
       self.analytical_placer()
     # Only evaluates placement cost when all nodes are placed.
     # All samples in the episode receive the same reward equal to final cost.
     # This is realized by setting intermediate steps cost as zero, and
     # propagate the final cost with discount factor set to 1 in replay buffer.
-    cost, info = self._cost_info_fn(self._plc, self._done)
+    with self._profile.phase('cost'):
+      cost, info = self._cost_info_fn(self._plc, self._done)
+    if key is not None:
+      self._cost_cache.put(key, (cost, info))
 
     # We only save placement if all nodes by placed RL, because the dreamplace
     # mix-sized placement may not be legal.
@@ -406,17 +583,91 @@ class CircuitEnv(object):
 
     return -cost, info
 
+  @_profiled('reset')
   def reset(self) -> ObsType:
     """Restes the environment.
 
     Returns:
       An initial observation.
     """
-    self._plc.unplace_all_nodes()
+    if self._fast_reset and self._episode_nodes is not None:
+      with self._profile.phase('unplace_episode_nodes'):
+        calls = [('unplace_node', (node,)) for node in self._episode_nodes]
+        calls.extend(
+            ('update_macro_orientation',
+             (node, self._hard_macro_orientations[node]))
+            for node in self._episode_nodes
+            if node in self._hard_macro_orientations)
+        self._plc.call_many(calls)
+        if self._occupancy_mask:
+          self._occupancy_mask.reset(from_plc=False)
+    else:
+      with self._profile.phase('unplace_all_nodes'):
+        self._plc.unplace_all_nodes()
+        if self._fast_reset:
+          self._reset_hard_macro_orientations()
+        if self._occupancy_mask:
+          self._occupancy_mask.reset()
+    if self._fast_reset:
+      self._episode_nodes = []
     self._current_actions = []
     self._current_node = 0
     self._done = False
-    self._current_mask = self._get_mask()
+    if self._first_mask is None:
+      self._current_mask = self._get_mask()
+      if self._fast_reset:
+        self._first_mask = np.copy(self._current_mask)
+    elif self._reuse_observation_buffers:
+      self._mask_buffer_index = (self._mask_buffer_index + 1) % len(
+          self._mask_buffers)
+      self._current_mask = self._mask_buffers[self._mask_buffer_index]
+      np.copyto(self._current_mask, self._first_mask)
+    else:
+      self._current_mask = np.copy(self._first_mask)
+    return self._get_obs()
+
+  def _reset_hard_macro_orientations(self) -> None:
+    """Restores the orientations of the first reset, records them at first."""
+    if self._hard_macro_orientations is None:
+      orientations = self._plc.call_many([
+          ('get_macro_orientation', (m,)) for m in self._hard_macro_indices
+      ])
+      self._hard_macro_orientations = dict(
+          zip(self._hard_macro_indices, orientations))
+    else:
+      self._plc.update_macro_orientation_bulk(
+          list(self._hard_macro_orientations),
+          list(self._hard_macro_orientations.values()))
+
+  def get_state(self) -> CircuitEnvState:
+    """Returns the state of the episode, e.g. to branch it in a search."""
+    return CircuitEnvState(
+        current_node=self._current_node,
+        current_actions=tuple(self._current_actions),
+        done=self._done,
+        mask=np.copy(self._current_mask),
+        placement=self._plc.snapshot(),
+        features=self._observation_extractor.get_state())
+
+  def set_state(self, state: CircuitEnvState) -> ObsType:
+    """Restores a state of `get_state`, of this or another env of the netlist.
+
+    Args:
+      state: The state to restore.
+
+    Returns:
+      The observation of the state.
+    """
+    self._plc.restore(state.placement)
+    if self._occupancy_mask:
+      self._occupancy_mask.reset()
+    # The nodes placed since the last reset are not known anymore.
+    self._episode_nodes = None
+    self._current_node = state.current_node
+    self._current_actions = list(state.current_actions)
+    self._done = state.done
+    self._current_mask = np.copy(state.mask)
+    self._observation_extractor.set_state(state.features)
     return self._get_obs()
 
   def translate_to_original_canvas(self, action: int) -> int:
@@ -432,16 +683,67 @@ class CircuitEnv(object):
       raise InfeasibleActionError(action, self._current_mask)
     return action
 
+  @_profiled('place_node')
   def place_node(self, node_index: int, action: int) -> None:
-    self._plc.place_node(node_index, self.translate_to_original_canvas(action))
-
+    grid_cell_index = self.translate_to_original_canvas(action)
+    self._plc.place_node(node_index, grid_cell_index)
+    if self._occupancy_mask:
+      self._occupancy_mask.place_node(node_index, grid_cell_index)
+    if self._episode_nodes is not None:
+      self._episode_nodes.append(node_index)
+
+  @_profiled('analytical_placer')
   def analytical_placer(self) -> None:
+    if self._episode_nodes is not None:
+      if self._analytical_placer_nodes is None:
+        movable = np.isin(self._plc.node_types(), ['MACRO', 'STDCELL'])
+        movable[self._hard_macro_indices] = False
+        movable = np.flatnonzero(movable)
+        self._analytical_placer_nodes = movable[~self._plc.fixed_mask(
+            movable)].tolist()
+      self._episode_nodes.extend(self._analytical_placer_nodes)
     if self._std_cell_placer_mode == 'fd':
       placement_util.fd_placement_schedule(self._plc)
     else:
       raise ValueError('%s is not a supported std_cell_placer_mode.' %
                        (self._std_cell_placer_mode))
 
+  @_profiled('replay')
+  def replay(self, actions: Sequence[int]) -> Tuple[float, InfoType]:
+    """Places all the hard macros and returns the cost of the placement.
+
+    Unlike stepping through the actions, they are not checked against the
+    masks, there are no observations, and the placement is not saved. The env
+    has to be reset before the next step.
+
+    Args:
+      actions: The action of every hard macro, in the node order of the env.
+
+    Returns:
+      The cost and info of `cost_info_fn`, after the analytical placer.
+
+    Raises:
+      ValueError: If there is not one action per hard macro.
+      InfeasibleActionError: If an action is outside of the canvas.
+    """
+    if len(actions) != self._num_hard_macros:
+      raise ValueError(f'Expected {self._num_hard_macros} actions, got '
+                       f'{len(actions)}.')
+    self._plc.unplace_all_nodes()
+    if self._occupancy_mask:
+      self._occupancy_mask.reset()
+    # The next reset unplaces all the nodes.
+    self._episode_nodes = None
+    self._current_actions = [int(action) for action in actions]
+    for node_index, action in zip(self._sorted_node_indices,
+                                  self._current_actions):
+      self.place_node(node_index, action)
+    self._current_node = self._num_hard_macros
+    self._done = True
+    self.analytical_placer()
+    return self._cost_info_fn(plc=self._plc, done=True)  # pytype: disable=wrong-keyword-args  # trace-all-classes
+
+  @_profiled('step')
   def step(self, action: int) -> Tuple[ObsType, float, bool, Any]:
     """Steps the environment.
 
@@ -502,3 +804,38 @@ def create_circuit_environment(*args, **kwarg) -> wrappers.ActionClipWrapper:
   env = CircuitEnv(*args, **kwarg)
 
   return wrappers.ActionClipWrapper(suite_gym.wrap_env(env))
+
+
+class BatchedCircuitEnv(batched_py_environment.BatchedPyEnvironment):
+  """Steps several wrapped `CircuitEnv`s together, with stacked time steps.
+
+  A step of a `CircuitEnv` mostly waits on its `PlacementCost`, e.g. on
+  plc_wrapper_main, so the environments are stepped from a thread pool and the
+  policy is called once per step for all of them.
+  """
+
+  def wrapped_env(self) -> gym_wrapper.GymWrapper:
+    """Returns the first wrapped environment, e.g. for its static features."""
+    return self.envs[0].wrapped_env()
+
+  def get_profile(self) -> env_profile.ProfileType:
+    """Returns the sum of the profiles of the environments."""
+    return env_profile.merge_profiles([env.get_profile() for env in self.envs])
+
+
+def create_batched_circuit_environment(num_envs: int, *args,
+                                       **kwarg) -> BatchedCircuitEnv:
+  """Create `num_envs` environments of `create_circuit_environment` as a batch.
+
+  Args:
+    num_envs: Number of environments, each with its own `PlacementCost`.
+    *args: Arguments of `create_circuit_environment`.
+    **kwarg: keyworded Arguments of `create_circuit_environment`.
+
+  Returns:
+    Batched PyEnvironment used for training.
+  """
+  if num_envs < 1:
+    raise ValueError(f'num_envs should be positive, got {num_envs}.')
+  envs = [create_circuit_environment(*args, **kwarg) for _ in range(num_envs)]
+  return BatchedCircuitEnv(envs, multithreading=True)
@@ -14,10 +14,14 @@
 # limitations under the License.
 """Tests for circuit_training.environment."""
 
+import functools
 import os
+from unittest import mock
 
 from absl import flags
 from circuit_training.environment import environment
+from circuit_training.environment import observation_config
+from circuit_training.environment import placement_util
 from circuit_training.utils import test_utils
 import gin
 import numpy as np
@@ -113,6 +117,57 @@ class EnvironmentTest(test_utils.TestCase):
       self.assertIsInstance(reward, float)
       self.assertIsInstance(done, bool)
 
+  def test_numpy_backend(self):
+    test_netlist_dir = ('circuit_training/'
+                        'environment/test_data/sample_clustered')
+    netlist_file = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                'netlist.pb.txt')
+    init_placement = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                  'initial.plc')
+    env = environment.CircuitEnv(
+        netlist_file=netlist_file,
+        init_placement=init_placement,
+        create_placement_cost_fn=functools.partial(
+            placement_util.create_placement_cost, backend='numpy'))
+
+    obs = env.reset()
+    self.assertTrue(env.observation_space.contains(obs))
+    done = False
+    while not done:
+      action = random_action(obs['mask'])
+      obs, reward, done, info = env.step(action)
+      self.assertTrue(env.observation_space.contains(obs))
+    self.assertLess(reward, 0.0)
+    self.assertGreater(info['wirelength'], 0.0)
+
+    profile = env.get_profile()
+    self.assertEqual(profile['reset']['count'], 1)
+    self.assertEqual(profile['step/analytical_placer']['count'], 1)
+    self.assertEqual(profile['step/mask']['count'],
+                     profile['step']['count'])
+    self.assertGreater(profile['step']['total_seconds'],
+                       profile['step/analytical_placer']['total_seconds'])
+
+  def test_cost_info_function_skips_zero_weights(self):
+    test_netlist_dir = ('circuit_training/'
+                        'environment/test_data/sample_clustered')
+    plc = placement_util.create_placement_cost(
+        netlist_file=os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                  'netlist.pb.txt'),
+        init_placement=os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                    'initial.plc'),
+        backend='numpy')
+    with mock.patch.object(
+        plc, 'get_congestion_cost') as get_congestion_cost, mock.patch.object(
+            plc, 'get_density_cost') as get_density_cost:
+      cost, info = environment.cost_info_function(
+          plc, done=True, density_weight=0.0, congestion_weight=0.0)
+    get_congestion_cost.assert_not_called()
+    get_density_cost.assert_not_called()
+    self.assertEqual(cost, plc.get_cost())
+    self.assertEqual(info['congestion'], -1.0)
+    self.assertEqual(info['density'], -1.0)
+
   def test_save_file_train_step(self):
     test_netlist_dir = ('circuit_training/'
                         'environment/test_data/sample_clustered')
@@ -149,6 +204,45 @@ class EnvironmentTest(test_utils.TestCase):
     with open(output_cd_file) as f:
       self.assertIn('Train step : 1234', f.read())
 
+  def test_async_save_placement(self):
+    test_netlist_dir = ('circuit_training/'
+                        'environment/test_data/sample_clustered')
+    netlist_file = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                'netlist.pb.txt')
+    init_placement = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                  'initial.plc')
+    output_dir = self.create_tempdir()
+    output_plc_file = os.path.join(output_dir, 'ppo_opt_placement.plc')
+    output_cd_file = os.path.join(output_dir, 'ppo_cd_placement.plc')
+
+    train_step = train_utils.create_train_step()
+    train_step.assign(1234)
+
+    env = environment.CircuitEnv(
+        netlist_file=netlist_file,
+        init_placement=init_placement,
+        create_placement_cost_fn=functools.partial(
+            placement_util.create_placement_cost, backend='numpy'),
+        is_eval=True,
+        save_best_cost=True,
+        output_plc_file=output_plc_file,
+        cd_finetune=True,
+        train_step=train_step,
+        async_save_placement=True)
+
+    obs = env.reset()
+    done = False
+    while not done:
+      action = random_action(obs['mask'])
+      obs, _, done, _ = env.step(action)
+    # The placements are saved when the env is closed at the latest.
+    env.close()
+
+    with open(output_plc_file) as f:
+      self.assertIn('Train step : 1234', f.read())
+    with open(output_cd_file) as f:
+      self.assertIn('Train step : 1234', f.read())
+
   def test_action_space(self):
     bindings = """
       ObservationConfig.max_grid_size = 128
@@ -197,6 +291,338 @@ class EnvironmentTest(test_utils.TestCase):
     with self.assertRaises(environment.InfeasibleActionError):
       env.step(action)
 
+  def test_cost_cache(self):
+    test_netlist_dir = ('circuit_training/'
+                        'environment/test_data/sample_clustered')
+    netlist_file = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                'netlist.pb.txt')
+    init_placement = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                  'initial.plc')
+    env = environment.CircuitEnv(
+        netlist_file=netlist_file,
+        init_placement=init_placement,
+        create_placement_cost_fn=functools.partial(
+            placement_util.create_placement_cost, backend='numpy'),
+        cost_cache_size=4)
+
+    def run_episode(actions):
+      obs = env.reset()
+      done = False
+      while not done:
+        if len(actions) == env._current_node:
+          actions.append(random_action(obs['mask']))
+        obs, reward, done, info = env.step(actions[env._current_node])
+      return reward, info
+
+    actions = []
+    reward, info = run_episode(actions)
+    self.assertEqual(env.cost_cache.stats(), {
+        'hits': 0,
+        'misses': 1,
+        'size': 1
+    })
+    with mock.patch.object(env, 'analytical_placer') as analytical_placer:
+      self.assertEqual(run_episode(actions), (reward, info))
+      analytical_placer.assert_not_called()
+    self.assertEqual(env.cost_cache.hits, 1)
+
+  def test_reuse_observation_buffers(self):
+    test_netlist_dir = ('circuit_training/'
+                        'environment/test_data/sample_clustered')
+    netlist_file = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                'netlist.pb.txt')
+    init_placement = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                  'initial.plc')
+    envs = [
+        environment.CircuitEnv(
+            netlist_file=netlist_file,
+            init_placement=init_placement,
+            create_placement_cost_fn=functools.partial(
+                placement_util.create_placement_cost, backend='numpy'),
+            reuse_observation_buffers=reuse)
+        for reuse in (False, True)
+    ]
+    expected_obs, obs = [env.reset() for env in envs]
+    done = False
+    while not done:
+      self.assertTrue(envs[1].observation_space.contains(obs))
+      for key in expected_obs:
+        self.assertAllEqual(obs[key], expected_obs[key])
+      action = random_action(obs['mask'])
+      previous_obs = obs
+      previous_copy = {key: np.copy(value) for key, value in obs.items()}
+      (expected_obs, _, _, _), (obs, _, done, _) = [
+          env.step(action) for env in envs
+      ]
+      # The observation of the previous step is still valid.
+      for key in previous_obs:
+        self.assertAllEqual(previous_obs[key], previous_copy[key])
+    for key in expected_obs:
+      self.assertAllEqual(obs[key], expected_obs[key])
+
+  def test_incremental_mask(self):
+    test_netlist_dir = ('circuit_training/'
+                        'environment/test_data/macro_tiles_10x10')
+    netlist_file = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                'netlist.pb.txt')
+    init_placement = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                  'initial.plc')
+    env = environment.CircuitEnv(
+        netlist_file=netlist_file,
+        init_placement=init_placement,
+        create_placement_cost_fn=functools.partial(
+            placement_util.create_placement_cost, backend='numpy'),
+        incremental_mask=True,
+        check_incremental_mask=True)
+    for _ in range(2):
+      obs = env.reset()
+      done = False
+      # Every mask is checked against plc.get_node_mask.
+      while not done:
+        obs, _, done, _ = env.step(random_action(obs['mask']))
+
+  def test_get_and_set_state(self):
+    test_netlist_dir = ('circuit_training/'
+                        'environment/test_data/macro_tiles_10x10')
+    netlist_file = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                'netlist.pb.txt')
+    init_placement = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                  'initial.plc')
+    envs = [
+        environment.CircuitEnv(
+            netlist_file=netlist_file,
+            init_placement=init_placement,
+            create_placement_cost_fn=functools.partial(
+                placement_util.create_placement_cost, backend='numpy'),
+            incremental_mask=True) for _ in range(2)
+    ]
+    env = envs[0]
+    obs = env.reset()
+    for _ in range(3):
+      obs, _, _, _ = env.step(random_action(obs['mask']))
+    state = env.get_state()
+    expected_obs = {key: np.copy(value) for key, value in obs.items()}
+    action = random_action(obs['mask'])
+    expected_step = env.step(action)
+    expected_step_obs = {
+        key: np.copy(value) for key, value in expected_step[0].items()
+    }
+    env.step(random_action(expected_step[0]['mask']))
+
+    # The state is restored on the same env and on another one.
+    for other_env in envs:
+      obs = other_env.set_state(state)
+      for key in expected_obs:
+        self.assertAllEqual(obs[key], expected_obs[key])
+      step_obs, reward, done, _ = other_env.step(action)
+      self.assertEqual((reward, done), expected_step[1:3])
+      for key in expected_step_obs:
+        self.assertAllEqual(step_obs[key], expected_step_obs[key])
+
+  def test_fast_reset(self):
+    test_netlist_dir = ('circuit_training/'
+                        'environment/test_data/sample_clustered')
+    netlist_file = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                'netlist.pb.txt')
+    init_placement = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                  'initial.plc')
+    envs = [
+        environment.CircuitEnv(
+            netlist_file=netlist_file,
+            init_placement=init_placement,
+            create_placement_cost_fn=functools.partial(
+                placement_util.create_placement_cost, backend='numpy'),
+            incremental_mask=True,
+            reuse_observation_buffers=True,
+            fast_reset=fast_reset) for fast_reset in (False, True)
+    ]
+    for _ in range(3):
+      expected_obs = envs[0].reset()
+      obs = envs[1].reset()
+      done = False
+      while True:
+        for key in expected_obs:
+          self.assertAllEqual(obs[key], expected_obs[key])
+        if done:
+          break
+        action = random_action(obs['mask'])
+        expected_obs, expected_reward, _, _ = envs[0].step(action)
+        obs, reward, done, _ = envs[1].step(action)
+        self.assertAllClose(reward, expected_reward)
+
+    # Only the first reset unplaces all the nodes and gets a mask.
+    profile = envs[1].get_profile()
+    self.assertEqual(profile['reset/unplace_all_nodes']['count'], 1)
+    self.assertEqual(profile['reset/unplace_episode_nodes']['count'], 2)
+    self.assertEqual(profile['reset/mask']['count'], 1)
+
+  def test_fast_reset_restores_orientations(self):
+    test_netlist_dir = ('circuit_training/'
+                        'environment/test_data/sample_clustered')
+    netlist_file = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                'netlist.pb.txt')
+    init_placement = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                  'initial.plc')
+    plcs = []
+
+    def create_placement_cost(*args, **kwargs):
+      plcs.append(
+          placement_util.create_placement_cost(
+              *args, backend='numpy', **kwargs))
+      return plcs[-1]
+
+    env = environment.CircuitEnv(
+        netlist_file=netlist_file,
+        init_placement=init_placement,
+        create_placement_cost_fn=create_placement_cost,
+        fast_reset=True)
+    plc, = plcs
+    obs = env.reset()
+    done = False
+    while not done:
+      obs, _, done, _ = env.step(random_action(obs['mask']))
+    # E.g. CD fine-tuned the orientations of the placement.
+    plc.update_macro_orientation(2, 'FS')
+    env.reset()
+    self.assertEqual(plc.get_macro_orientation(2), 'N')
+
+    # A restored state with other orientations.
+    plc.update_macro_orientation(3, 'E')
+    state = env.get_state()
+    env.set_state(state)
+    env.reset()
+    self.assertEqual(plc.get_macro_orientation(3), 'N')
+
+  def test_lookahead_mask(self):
+    test_netlist_dir = ('circuit_training/'
+                        'environment/test_data/macro_tiles_10x10')
+    netlist_file = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                'netlist.pb.txt')
+    init_placement = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                  'initial.plc')
+    create_placement_cost_fn = functools.partial(
+        placement_util.create_placement_cost, backend='numpy')
+    with self.assertRaises(ValueError):
+      environment.CircuitEnv(
+          netlist_file=netlist_file,
+          init_placement=init_placement,
+          create_placement_cost_fn=create_placement_cost_fn,
+          lookahead_mask=True)
+    envs = [
+        environment.CircuitEnv(
+            netlist_file=netlist_file,
+            init_placement=init_placement,
+            create_placement_cost_fn=create_placement_cost_fn,
+            incremental_mask=True,
+            lookahead_mask=lookahead_mask) for lookahead_mask in (False, True)
+    ]
+    node_mask = envs[0].reset()['mask']
+    obs = envs[1].reset()
+    done = False
+    while not done:
+      # The lookahead mask is a subset of the mask of the node.
+      self.assertAllEqual(obs['mask'] & node_mask, obs['mask'])
+      action = random_action(obs['mask'])
+      node_mask = envs[0].step(action)[0]['mask']
+      obs, _, done, _ = envs[1].step(action)
+    self.assertGreater(envs[1].get_profile()['step/mask/lookahead']['count'],
+                       0)
+
+  def test_replay(self):
+    test_netlist_dir = ('circuit_training/'
+                        'environment/test_data/sample_clustered')
+    netlist_file = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                'netlist.pb.txt')
+    init_placement = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                  'initial.plc')
+    env = environment.CircuitEnv(
+        netlist_file=netlist_file,
+        init_placement=init_placement,
+        create_placement_cost_fn=functools.partial(
+            placement_util.create_placement_cost, backend='numpy'))
+    obs = env.reset()
+    done = False
+    while not done:
+      obs, reward, done, info = env.step(random_action(obs['mask']))
+    actions = env.get_state().current_actions
+
+    env.reset()
+    cost, replay_info = env.replay(actions)
+    self.assertAllClose(-cost, reward)
+    self.assertEqual(replay_info, info)
+    with self.assertRaises(RuntimeError):
+      env.step(actions[0])
+    with self.assertRaises(ValueError):
+      env.replay(actions[:-1])
+
+  def test_compact_observation(self):
+    test_netlist_dir = ('circuit_training/'
+                        'environment/test_data/sample_clustered')
+    netlist_file = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                'netlist.pb.txt')
+    init_placement = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                  'initial.plc')
+    envs = []
+    for compact, reuse_observation_buffers in ((False, False), (True, False),
+                                               (True, True)):
+      gin.parse_config(f'ObservationConfig.compact = {compact}')
+      envs.append(
+          environment.CircuitEnv(
+              netlist_file=netlist_file,
+              init_placement=init_placement,
+              create_placement_cost_fn=functools.partial(
+                  placement_util.create_placement_cost, backend='numpy'),
+              reuse_observation_buffers=reuse_observation_buffers))
+    env, compact_env, reuse_env = envs
+    self.assertEqual(compact_env.observation_space['mask'].dtype, np.uint32)
+
+    expected_obs = env.reset()
+    obs = compact_env.reset()
+    reuse_obs = reuse_env.reset()
+    done = False
+    while True:
+      self.assertTrue(compact_env.observation_space.contains(obs))
+      unpacked_obs = observation_config.unpack_observation(
+          obs, compact_env.observation_config)
+      for key in expected_obs:
+        self.assertAllClose(unpacked_obs[key], expected_obs[key], atol=1e-3)
+      # The reused buffers hold the same compact observations.
+      for key in obs:
+        self.assertEqual(reuse_obs[key].dtype, obs[key].dtype, msg=key)
+        self.assertAllEqual(reuse_obs[key], obs[key], msg=key)
+      if done:
+        break
+      action = random_action(expected_obs['mask'])
+      expected_obs, _, _, _ = env.step(action)
+      obs, _, done, _ = compact_env.step(action)
+      reuse_obs, _, _, _ = reuse_env.step(action)
+
+  def test_batched_environment(self):
+    test_netlist_dir = ('circuit_training/'
+                        'environment/test_data/sample_clustered')
+    netlist_file = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                'netlist.pb.txt')
+    init_placement = os.path.join(FLAGS.test_srcdir, test_netlist_dir,
+                                  'initial.plc')
+    env = environment.create_batched_circuit_environment(
+        3,
+        netlist_file=netlist_file,
+        init_placement=init_placement,
+        create_placement_cost_fn=functools.partial(
+            placement_util.create_placement_cost, backend='numpy'))
+    self.assertEqual(env.batch_size, 3)
+    self.assertIn('sparse_adj_i', env.wrapped_env().get_static_obs())
+
+    time_step = env.reset()
+    self.assertEqual(time_step.observation['mask'].shape[0], 3)
+    while not np.all(time_step.is_last()):
+      actions = np.array(
+          [random_action(mask) for mask in time_step.observation['mask']])
+      time_step = env.step(actions)
+      self.assertEqual(time_step.reward.shape, (3,))
+    self.assertTrue(np.all(time_step.reward < 0.0))
+    self.assertEqual(env.get_profile()['reset']['count'], 3)
+
   def test_wrap_tfpy_environment(self):
     bindings = """
       ObservationConfig.max_grid_size = 128
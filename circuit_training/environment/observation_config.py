@@ -61,6 +61,14 @@ DYNAMIC_OBSERVATIONS = ('locations_x', 'locations_y', 'is_node_placed',
 
 ALL_OBSERVATIONS = STATIC_OBSERVATIONS + DYNAMIC_OBSERVATIONS
 
+# The observations of 0s and 1s, bit-packed into uint32 words when compact.
+PACKED_OBSERVATIONS = ('is_node_placed', 'mask')
+
+# The observations stored as float16 when compact.
+HALF_PRECISION_OBSERVATIONS = ('locations_x', 'locations_y')
+
+_BITS_PER_WORD = 32
+
 
 @gin.configurable
 class ObservationConfig(object):
@@ -72,15 +80,64 @@ class ObservationConfig(object):
   def __init__(self,
                max_num_nodes: int = 3500,
                max_num_edges: int = 31000,
-               max_grid_size: int = 128):
+               max_grid_size: int = 128,
+               compact: bool = False):
+    """Creates an ObservationConfig.
+
+    Args:
+      max_num_nodes: Number of nodes the node features are padded to.
+      max_num_edges: Number of edges the edge features are padded to.
+      max_grid_size: Number of rows and columns the mask is padded to.
+      compact: If True, the mask and is_node_placed are bit-packed into uint32
+        words and the locations are float16, which shrinks the observations of
+        the replay buffer. The models unpack them with `unpack_observation`.
+    """
     self.max_num_edges = max_num_edges
     self.max_num_nodes = max_num_nodes
     self.max_grid_size = max_grid_size
+    self.compact = compact
+
+  @property
+  def unpacked_sizes(self) -> Dict[Text, int]:
+    """The number of 0s and 1s of the bit-packed observations."""
+    return {
+        'is_node_placed': self.max_num_nodes,
+        'mask': self.max_grid_size**2,
+    }
+
+  def _compact_space(
+      self, spaces: Dict[Text, gym.spaces.Box]) -> gym.spaces.Dict:
+    """Returns the space, with the compact dtypes if the config is compact."""
+    if self.compact:
+      for key, size in self.unpacked_sizes.items():
+        spaces[key] = gym.spaces.Box(
+            low=0,
+            high=np.iinfo(np.uint32).max,
+            shape=(num_packed_words(size),),
+            dtype=np.uint32)
+      for key in HALF_PRECISION_OBSERVATIONS:
+        spaces[key] = gym.spaces.Box(
+            low=0, high=1, shape=spaces[key].shape, dtype=np.float16)
+    return gym.spaces.Dict(spaces)
+
+  def compact_observation(
+      self, obs: Dict[Text, np.ndarray]) -> Dict[Text, np.ndarray]:
+    """Returns the observation with the compact dtypes if the config is."""
+    if not self.compact:
+      return obs
+    obs = dict(obs)
+    for key in PACKED_OBSERVATIONS:
+      if key in obs:
+        obs[key] = pack_bits(obs[key])
+    for key in HALF_PRECISION_OBSERVATIONS:
+      if key in obs:
+        obs[key] = np.asarray(obs[key], dtype=np.float16)
+    return obs
 
   @property
   def dynamic_observation_space(self) -> gym.spaces.Space:
     """Env Dynamic Observation space."""
-    return gym.spaces.Dict({
+    return self._compact_space({
         'is_node_placed':
             gym.spaces.Box(
                 low=0, high=1, shape=(self.max_num_nodes,), dtype=np.int32),
@@ -103,7 +160,7 @@ class ObservationConfig(object):
   @property
   def observation_space(self) -> gym.spaces.Space:
     """Env Observation space."""
-    return gym.spaces.Dict({
+    return self._compact_space({
         'normalized_num_edges':
             gym.spaces.Box(low=0, high=1, shape=(1,)),
         'normalized_num_hard_macros':
@@ -169,6 +226,83 @@ class ObservationConfig(object):
     })
 
 
+def num_packed_words(size: int) -> int:
+  """Returns the number of uint32 words `size` bits are packed into."""
+  return (size + _BITS_PER_WORD - 1) // _BITS_PER_WORD
+
+
+def pack_bits(bits: np.ndarray) -> np.ndarray:
+  """Packs 0s and 1s into uint32 words, bit j of word i is bits[32 * i + j]."""
+  bits = np.asarray(bits).astype(bool)
+  padded = np.zeros((num_packed_words(bits.shape[-1]) * _BITS_PER_WORD,),
+                    dtype=bool)
+  padded[:bits.shape[-1]] = bits
+  return np.packbits(padded, bitorder='little').view('<u4').astype(np.uint32)
+
+
+class BitPacker(object):
+  """Packs 0s and 1s like `pack_bits`, into preallocated words.
+
+  Packing reuses a padded copy of the bits, so a step of an environment with
+  reused observation buffers does not allocate new arrays.
+  """
+
+  def __init__(self, size: int):
+    self._size = size
+    self._bits = np.zeros((num_packed_words(size), _BITS_PER_WORD),
+                          dtype=np.uint32)
+    self._weights = np.left_shift(
+        np.uint32(1), np.arange(_BITS_PER_WORD, dtype=np.uint32))
+
+  def pack(self, bits: np.ndarray, out: np.ndarray) -> np.ndarray:
+    """Writes the uint32 words of the `size` 0s and 1s to `out`, returns it."""
+    np.copyto(self._bits.reshape(-1)[:self._size], bits, casting='unsafe')
+    # The bits are 0 or 1, so the sum of the weights is their bitwise or.
+    return np.dot(self._bits, self._weights, out=out)
+
+
+def unpack_bits(words: TensorType, size: int) -> tf.Tensor:
+  """Unpacks the uint32 words of `pack_bits` into [..., size] int32 bits."""
+  words = tf.convert_to_tensor(words, dtype=tf.uint32)
+  shifts = tf.constant(np.arange(_BITS_PER_WORD, dtype=np.uint32))
+  bits = tf.bitwise.bitwise_and(
+      tf.bitwise.right_shift(words[..., tf.newaxis], shifts),
+      tf.constant(1, dtype=tf.uint32))
+  bits = tf.reshape(
+      bits,
+      tf.concat([tf.shape(words)[:-1], [words.shape[-1] * _BITS_PER_WORD]],
+                axis=0))
+  return tf.cast(bits[..., :size], tf.int32)
+
+
+def unpack_observation(
+    inputs: Dict[Text, TensorType],
+    observation_config: Optional[ObservationConfig] = None
+) -> Dict[Text, TensorType]:
+  """Returns the observation with its compact features unpacked.
+
+  The mask and is_node_placed become int32 0s and 1s, and the locations
+  float32, as in the observations that are not compact, which are returned
+  unchanged.
+
+  Args:
+    inputs: The observation, e.g. the inputs of a model.
+    observation_config: Optional observation config, for the unpacked sizes.
+
+  Returns:
+    The unpacked observation.
+  """
+  observation_config = observation_config or ObservationConfig()
+  outputs = dict(inputs)
+  for key, size in observation_config.unpacked_sizes.items():
+    if key in outputs and tf.as_dtype(outputs[key].dtype) == tf.uint32:
+      outputs[key] = unpack_bits(outputs[key], size)
+  for key in HALF_PRECISION_OBSERVATIONS:
+    if key in outputs and tf.as_dtype(outputs[key].dtype) == tf.float16:
+      outputs[key] = tf.cast(outputs[key], tf.float32)
+  return outputs
+
+
 def _to_dict(
     flatten_obs: TensorType,
     keys: FeatureKeyType,
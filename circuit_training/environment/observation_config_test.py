@@ -16,6 +16,8 @@
 
 from circuit_training.environment import observation_config
 from circuit_training.utils import test_utils
+import numpy as np
+import tensorflow as tf
 
 
 class ObservationConfigTest(test_utils.TestCase):
@@ -43,6 +45,37 @@ class ObservationConfigTest(test_utils.TestCase):
     for k in np_obs:
       self.assertAllEqual(obs[k], np_obs[k])
 
+  def test_pack_unpack_bits(self):
+    bits = np.random.default_rng(0).integers(0, 2, size=(3, 100))
+    words = np.stack([observation_config.pack_bits(b) for b in bits])
+    self.assertEqual(words.dtype, np.uint32)
+    self.assertEqual(words.shape, (3, 4))
+    self.assertAllEqual(observation_config.unpack_bits(words, 100), bits)
+
+  def test_compact_observation(self):
+    config = observation_config.ObservationConfig(
+        max_num_nodes=100, max_grid_size=12)
+    compact_config = observation_config.ObservationConfig(
+        max_num_nodes=100, max_grid_size=12, compact=True)
+    obs = config.observation_space.sample()
+    # The locations are exact in float16.
+    for key in ('locations_x', 'locations_y'):
+      obs[key] = obs[key].astype(np.float16).astype(np.float32)
+
+    compact_obs = compact_config.compact_observation(obs)
+    self.assertTrue(compact_config.observation_space.contains(compact_obs))
+    self.assertEqual(compact_obs['mask'].shape, (5,))
+    self.assertEqual(compact_obs['is_node_placed'].shape, (4,))
+    self.assertEqual(compact_obs['locations_x'].dtype, np.float16)
+    self.assertIs(config.compact_observation(obs), obs)
+
+    unpacked_obs = observation_config.unpack_observation(
+        compact_obs, compact_config)
+    for key in obs:
+      self.assertAllEqual(unpacked_obs[key], obs[key])
+      self.assertEqual(
+          tf.as_dtype(unpacked_obs[key].dtype), tf.as_dtype(obs[key].dtype))
+
   def test_observation_ordering(self):
     static_observations = ('normalized_num_edges', 'normalized_num_hard_macros',
                            'normalized_num_soft_macros',
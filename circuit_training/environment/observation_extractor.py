@@ -28,13 +28,31 @@ class ObservationExtractor(object):
 
   EPSILON = 1E-6
 
+  # Dynamic features copied to the reused buffers by every update.
+  _BUFFERED_FEATURES = ('locations_x', 'locations_y', 'is_node_placed')
+
   def __init__(self,
                plc: plc_client.PlacementCost,
                observation_config: Optional[
                    observation_config_lib.ObservationConfig] = None,
                netlist_index: int = 0,
                default_location_x: float = 0.5,
-               default_location_y: float = 0.5):
+               default_location_y: float = 0.5,
+               reuse_buffers: bool = False):
+    """Creates an ObservationExtractor.
+
+    Args:
+      plc: Placement cost object.
+      observation_config: Optional observation config.
+      netlist_index: Netlist index in the model static features.
+      default_location_x: Normalized x location of the unplaced nodes.
+      default_location_y: Normalized y location of the unplaced nodes.
+      reuse_buffers: If True, the dynamic features are written to two sets of
+        preallocated arrays used in turn, and the mask is not copied. The
+        features of an update stay valid until the update after the next one.
+        With a compact observation config, the buffers hold the packed words
+        and the float16 locations, and the mask is packed into them.
+    """
     self.plc = plc
     self._observation_config = (
         observation_config or observation_config_lib.ObservationConfig())
@@ -47,6 +65,13 @@ class ObservationExtractor(object):
     self.grid_width = self.width / self.num_cols
     self.grid_height = self.height / self.num_rows
 
+    # Macro indices and types do not change after loading the netlist, fetch
+    # them once.
+    self._macro_indices = self.plc.get_macro_indices()
+    self._is_soft_macro = self.plc.call_many([
+        ('is_node_soft_macro', (m,)) for m in self._macro_indices
+    ])
+
     # Since there are too many I/O ports, we have to cluster them together to
     # make it manageable for the model to process. The ports that are located in
     # the same grid cell are clustered togheter.
@@ -60,6 +85,29 @@ class ObservationExtractor(object):
     # Extract static features.
     self._features = self._extract_static_features()
 
+    self._reuse_buffers = reuse_buffers
+    self._buffer_index = 0
+    if reuse_buffers:
+      config = self._observation_config
+      self._buffers = [{
+          'current_node': np.zeros((1,), dtype=np.int32),
+          'netlist_index': self._features['netlist_index'],
+          **config.compact_observation({
+              key: np.copy(self._features[key])
+              for key in self._BUFFERED_FEATURES
+          })
+      } for _ in range(2)]
+      if config.compact:
+        for buffers in self._buffers:
+          buffers['mask'] = np.zeros(
+              (observation_config_lib.num_packed_words(
+                  config.unpacked_sizes['mask']),),
+              dtype=np.uint32)
+        self._bit_packers = {
+            key: observation_config_lib.BitPacker(size)
+            for key, size in config.unpacked_sizes.items()
+        }
+
   def _extract_static_features(self) -> Dict[Text, np.ndarray]:
     """Static features that are invariant across training steps."""
     features = dict()
@@ -89,20 +137,24 @@ class ObservationExtractor(object):
     self._pad_macro_dynamic_features(features)
 
   def _extract_num_macros(self, features: Dict[Text, np.ndarray]) -> None:
-    features['num_macros'] = np.asarray([len(self.plc.get_macro_indices())
+    features['num_macros'] = np.asarray([len(self._macro_indices)
                                         ]).astype(np.int32)
 
   def _extract_technology_info(self, features: Dict[Text, np.ndarray]) -> None:
     """Extracts Technology-related information."""
+    routes_per_micron, macro_routing_allocation = self.plc.call_many([
+        ('get_routes_per_micron', ()),
+        ('get_macro_routing_allocation', ()),
+    ])
     routing_resources = {
         'horizontal_routes_per_micron':
-            self.plc.get_routes_per_micron()[0],
+            routes_per_micron[0],
         'vertical_routes_per_micron':
-            self.plc.get_routes_per_micron()[1],
+            routes_per_micron[1],
         'macro_horizontal_routing_allocation':
-            self.plc.get_macro_routing_allocation()[0],
+            macro_routing_allocation[0],
         'macro_vertical_routing_allocation':
-            self.plc.get_macro_routing_allocation()[0],
+            macro_routing_allocation[0],
     }
     for k in routing_resources:
       features[k] = np.asarray([routing_resources[k]]).astype(np.float32)
@@ -113,11 +165,14 @@ class ObservationExtractor(object):
     locations_x = []
     locations_y = []
     is_node_placed = []
-    for macro_idx in self.plc.get_macro_indices():
-      x, y = self.plc.get_node_location(macro_idx)
+    num_macros = len(self._macro_indices)
+    replies = self.plc.call_many(
+        [('get_node_location', (m,)) for m in self._macro_indices] +
+        [('is_node_placed', (m,)) for m in self._macro_indices])
+    for (x, y), placed in zip(replies[:num_macros], replies[num_macros:]):
       locations_x.append(x)
       locations_y.append(y)
-      is_node_placed.append(1 if self.plc.is_node_placed(macro_idx) else 0)
+      is_node_placed.append(1 if placed else 0)
     for x, y in self.clustered_port_locations_vec:
       locations_x.append(x)
       locations_y.append(y)
@@ -129,8 +184,8 @@ class ObservationExtractor(object):
   def _extract_node_types(self, features: Dict[Text, np.ndarray]) -> None:
     """Extracts node types."""
     types = []
-    for macro_idx in self.plc.get_macro_indices():
-      if self.plc.is_node_soft_macro(macro_idx):
+    for is_soft_macro in self._is_soft_macro:
+      if is_soft_macro:
         types.append(observation_config_lib.SOFT_MACRO)
       else:
         types.append(observation_config_lib.HARD_MACRO)
@@ -142,13 +197,18 @@ class ObservationExtractor(object):
     """Extracts macro sizes."""
     macros_w = []
     macros_h = []
-    for macro_idx in self.plc.get_macro_indices():
-      if self.plc.is_node_soft_macro(macro_idx):
-        # Width and height of soft macros are set to zero.
-        width = 0
-        height = 0
-      else:
-        width, height = self.plc.get_node_width_height(macro_idx)
+    hard_macro_indices = [
+        m for m, soft in zip(self._macro_indices, self._is_soft_macro)
+        if not soft
+    ]
+    hard_macro_sizes = dict(
+        zip(
+            hard_macro_indices,
+            self.plc.call_many([('get_node_width_height', (m,))
+                                for m in hard_macro_indices])))
+    for macro_idx in self._macro_indices:
+      # Width and height of soft macros are set to zero.
+      width, height = hard_macro_sizes.get(macro_idx, (0, 0))
       macros_w.append(width)
       macros_h.append(height)
     for _ in range(len(self.clustered_port_locations_vec)):
@@ -160,7 +220,7 @@ class ObservationExtractor(object):
   def _extract_macro_and_port_adj_matrix(
       self, features: Dict[Text, np.ndarray]) -> None:
     """Extracts adjacency matrix."""
-    num_nodes = len(self.plc.get_macro_indices()) + len(
+    num_nodes = len(self._macro_indices) + len(
         self.clustered_port_locations_vec)
     assert num_nodes * num_nodes == len(self.adj_vec)
     sparse_adj_i = []
@@ -358,25 +418,55 @@ class ObservationExtractor(object):
     """Updates the dynamic features."""
     if previous_node_index >= 0:
       x, y = self.plc.get_node_location(
-          self.plc.get_macro_indices()[previous_node_index])
+          self._macro_indices[previous_node_index])
       self._features['locations_x'][previous_node_index] = (
           x / (self.width + ObservationExtractor.EPSILON))
       self._features['locations_y'][previous_node_index] = (
           y / (self.height + ObservationExtractor.EPSILON))
       self._features['is_node_placed'][previous_node_index] = 1
+    if self._reuse_buffers:
+      self._buffer_index = 1 - self._buffer_index
+      buffers = self._buffers[self._buffer_index]
+      buffers['current_node'][0] = current_node_index
+      if self._observation_config.compact:
+        for key in self._BUFFERED_FEATURES:
+          if key in self._bit_packers:
+            self._bit_packers[key].pack(self._features[key], out=buffers[key])
+          else:
+            np.copyto(buffers[key], self._features[key])
+        self._bit_packers['mask'].pack(mask, out=buffers['mask'])
+        return
+      for key in self._BUFFERED_FEATURES:
+        np.copyto(buffers[key], self._features[key])
+      buffers['mask'] = np.asarray(mask, dtype=np.int32)
+      return
     self._features['mask'] = mask.astype(np.int32)
     self._features['current_node'] = np.asarray([current_node_index
                                                 ]).astype(np.int32)
 
+  def get_state(self) -> Dict[Text, np.ndarray]:
+    """Returns a copy of the node locations and placed flags seen so far."""
+    return {
+        key: np.copy(self._features[key]) for key in self._BUFFERED_FEATURES
+    }
+
+  def set_state(self, state: Dict[Text, np.ndarray]) -> None:
+    """Restores the node locations and placed flags of `get_state`."""
+    for key in self._BUFFERED_FEATURES:
+      np.copyto(self._features[key], state[key])
+
   def get_dynamic_features(self, previous_node_index: int,
                            current_node_index: int,
                            mask: np.ndarray) -> Dict[Text, np.ndarray]:
     self._update_dynamic_features(previous_node_index, current_node_index, mask)
-    return {
+    if self._reuse_buffers:
+      # The buffers are already compact if the config is.
+      return self._buffers[self._buffer_index]
+    return self._observation_config.compact_observation({
         key: self._features[key]
         for key in observation_config_lib.DYNAMIC_OBSERVATIONS
         if key in self._features
-    }
+    })
 
   def get_all_features(self, previous_node_index: int, current_node_index: int,
                        mask: np.ndarray) -> Dict[Text, np.ndarray]:
@@ -167,6 +167,71 @@ class ObservationExtractorTest(test_utils.TestCase):
     self.assertAllClose(all_obs['current_node'], [2])
     self.assertEqual(all_obs['netlist_index'][0], 0)
 
+  def test_reuse_buffers(self):
+    extractor = observation_extractor.ObservationExtractor(
+        plc=self.extractor.plc,
+        observation_config=self._observation_config,
+        netlist_index=0,
+        reuse_buffers=True)
+    mask = np.ones(
+        self._observation_config.max_grid_size *
+        self._observation_config.max_grid_size,
+        dtype=np.int32)
+    first_obs = extractor.get_dynamic_features(
+        previous_node_index=-1, current_node_index=0, mask=mask)
+    self.assertIs(first_obs['mask'], mask)
+
+    extractor.plc.update_node_coords('M0', 100, 120)
+    second_obs = extractor.get_dynamic_features(
+        previous_node_index=0, current_node_index=1, mask=mask)
+    # The features of the first update are not changed by the second one.
+    self.assertAllEqual(first_obs['is_node_placed'], [0, 0, 0, 1, 1, 0])
+    self.assertAllClose(first_obs['current_node'], [0])
+    self.assertAllEqual(second_obs['is_node_placed'], [1, 0, 0, 1, 1, 0])
+    self.assertAllClose(second_obs['locations_x'],
+                        np.asarray([100., 150., 150., 0., 150., 0.0]) / 300.0)
+    self.assertAllClose(second_obs['current_node'], [1])
+
+    # The third update writes to the arrays of the first one.
+    third_obs = extractor.get_dynamic_features(
+        previous_node_index=1, current_node_index=2, mask=mask)
+    self.assertIs(third_obs['locations_x'], first_obs['locations_x'])
+
+
+  def test_reuse_compact_buffers(self):
+    compact_config = observation_config.ObservationConfig(
+        max_num_edges=8, max_num_nodes=6, max_grid_size=10, compact=True)
+    extractors = [
+        observation_extractor.ObservationExtractor(
+            plc=self.extractor.plc,
+            observation_config=compact_config,
+            netlist_index=0,
+            reuse_buffers=reuse_buffers) for reuse_buffers in (False, True)
+    ]
+    mask = np.zeros(compact_config.max_grid_size**2, dtype=np.int32)
+    mask[::3] = 1
+    first_obs = [
+        e.get_dynamic_features(
+            previous_node_index=-1, current_node_index=0, mask=mask)
+        for e in extractors
+    ]
+    self.extractor.plc.update_node_coords('M0', 100, 120)
+    second_obs = [
+        e.get_dynamic_features(
+            previous_node_index=0, current_node_index=1, mask=1 - mask)
+        for e in extractors
+    ]
+    for expected, obs in (first_obs, second_obs):
+      self.assertCountEqual(obs, expected)
+      for key in expected:
+        self.assertEqual(obs[key].dtype, expected[key].dtype, msg=key)
+        self.assertAllEqual(obs[key], expected[key], msg=key)
+
+    # The packed arrays are filled in place.
+    third_obs = extractors[1].get_dynamic_features(
+        previous_node_index=1, current_node_index=2, mask=mask)
+    for key in ('mask', 'is_node_placed', 'locations_x'):
+      self.assertIs(third_obs[key], first_obs[1][key])
 
 if __name__ == '__main__':
   test_utils.main()
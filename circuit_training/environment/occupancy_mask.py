@@ -0,0 +1,194 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Placement masks of the hard macros, computed in Python.
+
+`plc.get_node_mask` recomputes the whole grid in plc_wrapper_main and sends it
+back at every step of CircuitEnv, although a single macro was placed since the
+previous one. OccupancyMask keeps the hard macros placed so far and computes
+the mask of the next macro from them:
+
+  occupancy = occupancy_mask.OccupancyMask(plc)
+  occupancy.place_node(node, grid_cell_index)  # After plc.place_node.
+  mask = occupancy.get_node_mask(next_node)
+
+Like plc_wrapper_main, a hard macro cannot be placed where it would cross the
+canvas boundary (if the boundary check is on), a blockage, or come closer to a
+placed hard macro than the macro spacing.
+"""
+
+import collections
+from typing import Dict, List, Sequence, Tuple
+
+from circuit_training.environment import plc_client
+import numpy as np
+
+
+class OccupancyMask(object):
+  """The placed hard macros and the placement masks they leave."""
+
+  def __init__(self, plc: plc_client.PlacementCost) -> None:
+    """Fetches the canvas, the grid, the blockages and the hard macros.
+
+    Args:
+      plc: Placement cost object. The sizes and orientations of the hard macros
+        must not change afterwards.
+    """
+    self._plc = plc
+    macros = plc.get_macro_indices()
+    is_soft = plc.call_many([('is_node_soft_macro', (m,)) for m in macros])
+    self._hard_macros = [m for m, soft in zip(macros, is_soft) if not soft]
+    (canvas_size, grid_size, x_spacing, y_spacing, boundary_check, blockages,
+     *sizes) = plc.call_many([
+         ('get_canvas_width_height', ()),
+         ('get_grid_num_columns_rows', ()),
+         ('get_macro_bloat_width', ()),
+         ('get_macro_bloat_height', ()),
+         ('get_canvas_boundary_check', ()),
+         ('get_blockages', ()),
+     ] + [('get_node_width_height', (m,)) for m in self._hard_macros])
+    self._canvas_width, self._canvas_height = canvas_size
+    self._num_columns, self._num_rows = grid_size
+    self._x_spacing = x_spacing
+    self._y_spacing = y_spacing
+    self._boundary_check = boundary_check
+    self._blockages = np.reshape(
+        np.asarray(blockages, dtype=np.float64), (-1, 5))
+    self._sizes = dict(zip(self._hard_macros, sizes))
+    grid_width = self._canvas_width / self._num_columns
+    grid_height = self._canvas_height / self._num_rows
+    self._x_centers = (np.arange(self._num_columns) + 0.5) * grid_width
+    self._y_centers = (np.arange(self._num_rows) + 0.5) * grid_height
+    # Masks of the boundary and the blockages, per macro size.
+    self._static_masks: Dict[Tuple[float, float], np.ndarray] = {}
+    # Centers and sizes of the placed hard macros.
+    self._placed: List[Tuple[float, float, float, float]] = []
+    self._baseline: List[Tuple[float, float, float, float]] = []
+    self.reset()
+
+  def reset(self, from_plc: bool = True) -> None:
+    """Reads the hard macros that are placed, e.g. the fixed ones.
+
+    Args:
+      from_plc: If False, restores the hard macros read by the last reset from
+        plc instead, e.g. after unplacing the nodes placed since then.
+    """
+    if not from_plc:
+      self._placed = list(self._baseline)
+      return
+    replies = self._plc.call_many(
+        [('is_node_placed', (m,)) for m in self._hard_macros] +
+        [('get_node_location', (m,)) for m in self._hard_macros])
+    num_macros = len(self._hard_macros)
+    self._placed = [
+        (x, y) + tuple(self._sizes[m]) for m, placed, (x, y) in zip(
+            self._hard_macros, replies[:num_macros], replies[num_macros:])
+        if placed
+    ]
+    self._baseline = list(self._placed)
+
+  def place_node(self, node: int, grid_cell_index: int) -> None:
+    """Adds a hard macro placed at the center of a grid cell."""
+    self._placed.append(
+        (self._x_centers[grid_cell_index % self._num_columns],
+         self._y_centers[grid_cell_index // self._num_columns]) +
+        tuple(self._sizes[node]))
+
+  def _static_mask(self, width: float, height: float) -> np.ndarray:
+    """Returns the (rows, columns) mask of the boundary and the blockages."""
+    mask = self._static_masks.get((width, height))
+    if mask is not None:
+      return mask
+    x, y = self._x_centers, self._y_centers
+    mask = np.ones((self._num_rows, self._num_columns), dtype=bool)
+    if self._boundary_check:
+      mask &= np.outer(
+          (y - height / 2 >= 0) & (y + height / 2 <= self._canvas_height),
+          (x - width / 2 >= 0) & (x + width / 2 <= self._canvas_width))
+    for minx, miny, maxx, maxy, _ in self._blockages:
+      mask &= ~np.outer((y + height / 2 > miny) & (y - height / 2 < maxy),
+                        (x + width / 2 > minx) & (x - width / 2 < maxx))
+    self._static_masks[(width, height)] = mask
+    return mask
+
+  def get_node_mask(self, node: int) -> np.ndarray:
+    """Returns the flat mask of the grid cells a hard macro can be placed in."""
+    return self._size_mask(*self._sizes[node]).ravel()
+
+  def _size_mask(self, width: float, height: float) -> np.ndarray:
+    """Returns the (rows, columns) mask of a hard macro size."""
+    mask = self._static_mask(width, height)
+    if not self._placed:
+      return mask
+    placed = np.asarray(self._placed)
+    # The cells blocked by a placed macro form a box, whose rows and columns
+    # are those within the macro spacing. The boxes are summed with a 2D
+    # difference array instead of testing every macro against every cell.
+    x_blocked = np.abs(self._x_centers[None, :] - placed[:, 0:1]) < (
+        (width + placed[:, 2:3]) / 2 + self._x_spacing)
+    y_blocked = np.abs(self._y_centers[None, :] - placed[:, 1:2]) < (
+        (height + placed[:, 3:4]) / 2 + self._y_spacing)
+    boxes = np.any(x_blocked, axis=1) & np.any(y_blocked, axis=1)
+    x_blocked = x_blocked[boxes]
+    y_blocked = y_blocked[boxes]
+    col_start = np.argmax(x_blocked, axis=1)
+    col_end = self._num_columns - np.argmax(x_blocked[:, ::-1], axis=1)
+    row_start = np.argmax(y_blocked, axis=1)
+    row_end = self._num_rows - np.argmax(y_blocked[:, ::-1], axis=1)
+    counts = np.zeros((self._num_rows + 1, self._num_columns + 1),
+                      dtype=np.int32)
+    np.add.at(counts, (row_start, col_start), 1)
+    np.add.at(counts, (row_start, col_end), -1)
+    np.add.at(counts, (row_end, col_start), -1)
+    np.add.at(counts, (row_end, col_end), 1)
+    blocked = np.cumsum(np.cumsum(counts, axis=0), axis=1)[:-1, :-1] > 0
+    return mask & ~blocked
+
+  def get_lookahead_mask(self, node: int,
+                         later_nodes: Sequence[int]) -> np.ndarray:
+    """Returns the flat mask of the cells that keep the later macros placeable.
+
+    A hard macro needs a grid cell of its own, so the macros of a size cannot
+    all be placed if fewer cells than them are left in their mask. A cell is
+    masked out if placing `node` there leaves too few cells to the later
+    macros of a size, or if the later macros cannot fit in the free area of
+    the canvas. Both are necessary conditions, so a cell that is masked out
+    provably leads to an infeasible state, but one that is kept may too.
+
+    Args:
+      node: The hard macro to place.
+      later_nodes: The hard macros placed after it.
+    """
+    width, height = self._sizes[node]
+    mask = np.ones((self._num_rows, self._num_columns), dtype=bool)
+    counts = collections.Counter(tuple(self._sizes[m]) for m in later_nodes)
+    if self._boundary_check:
+      # The hard macros placed since the last read from plc do not overlap.
+      placed_area = sum(w * h for _, _, w, h in self._placed[len(
+          self._baseline):])
+      later_area = sum(w * h * n for (w, h), n in counts.items())
+      if (width * height + later_area + placed_area >
+          self._canvas_width * self._canvas_height):
+        return np.zeros(mask.size, dtype=bool)
+    x, y = self._x_centers, self._y_centers
+    for (later_width, later_height), num_macros in counts.items():
+      cells = self._size_mask(later_width, later_height).astype(np.float64)
+      # Number of the cells of the later size blocked by `node` at each cell.
+      x_blocked = np.abs(x[:, None] - x[None, :]) < (
+          (width + later_width) / 2 + self._x_spacing)
+      y_blocked = np.abs(y[:, None] - y[None, :]) < (
+          (height + later_height) / 2 + self._y_spacing)
+      blocked = y_blocked.astype(np.float64) @ cells @ x_blocked.T
+      mask &= np.sum(cells) - blocked >= num_macros
+    return mask.ravel()
@@ -0,0 +1,159 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for occupancy_mask."""
+
+import os
+
+from absl import flags
+from absl.testing import parameterized
+from circuit_training.environment import occupancy_mask
+from circuit_training.environment import plc_client
+from circuit_training.environment import plc_numpy
+from circuit_training.utils import test_utils
+import numpy as np
+
+FLAGS = flags.FLAGS
+
+_NETLIST_FILE = ('circuit_training/environment/test_data/macro_tiles_10x10/'
+                 'netlist.pb.txt')
+_SAMPLE_CLUSTERED_DIR = ('circuit_training/environment/test_data/'
+                         'sample_clustered')
+
+
+class OccupancyMaskTest(parameterized.TestCase, test_utils.TestCase):
+
+  def _create_plc(self, spacing):
+    plc = plc_numpy.PlacementCost(
+        os.path.join(FLAGS.test_srcdir, _NETLIST_FILE),
+        macro_macro_x_spacing=spacing,
+        macro_macro_y_spacing=spacing)
+    plc.set_placement_grid(20, 16)
+    plc.unplace_all_nodes()
+    return plc
+
+  @parameterized.named_parameters(('_no_spacing', 0.0),
+                                  ('_spacing', 10.0))
+  def test_matches_get_node_mask(self, spacing):
+    plc = self._create_plc(spacing)
+    width, height = plc.get_canvas_width_height()
+    plc.create_blockage(0.0, 0.0, width / 4, height / 3, 1.0)
+    plc.create_blockage(width / 2, height / 2, width * 0.6, height, 0.5)
+    mask = occupancy_mask.OccupancyMask(plc)
+    rng = np.random.default_rng(0)
+    hard_macros = [
+        m for m in plc.get_macro_indices() if not plc.is_node_soft_macro(m)
+    ]
+    for node in hard_macros:
+      expected = np.asarray(plc.get_node_mask(node), dtype=bool)
+      np.testing.assert_array_equal(mask.get_node_mask(node), expected)
+      if not np.any(expected):
+        break
+      grid_cell_index = rng.choice(np.flatnonzero(expected))
+      plc.place_node(node, grid_cell_index)
+      mask.place_node(node, grid_cell_index)
+
+  def test_matches_recorded_plc_wrapper_main_mask(self):
+    # The macros at their netlist locations, on the canvas and grid of
+    # plc_client_test.
+    plc = plc_numpy.PlacementCost(
+        os.path.join(FLAGS.test_srcdir, _NETLIST_FILE))
+    plc.set_canvas_size(1200.0, 1200.0)
+    plc.set_placement_grid(20, 20)
+    mask = occupancy_mask.OccupancyMask(plc)
+    # The mask of node 13 and M_R0_C1 (node 26) returned by plc_wrapper_main in
+    # plc_client_test: the macros cover the bottom left 10x10 cells.
+    expected = np.ones((20, 20), dtype=bool)
+    expected[:10, :10] = False
+    for node in (13, 26):
+      np.testing.assert_array_equal(mask.get_node_mask(node), expected.ravel())
+
+  @parameterized.named_parameters(('_no_boundary_check', False),
+                                  ('_boundary_check', True))
+  def test_matches_plc_wrapper_main(self, boundary_check):
+    # Blockages, and a placed soft macro that does not block the hard macros.
+    test_data_dir = os.path.join(FLAGS.test_srcdir, _SAMPLE_CLUSTERED_DIR)
+    plc = plc_client.PlacementCost(
+        os.path.join(test_data_dir, 'netlist.pb.txt'))
+    plc.set_canvas_size(500.0, 500.0)
+    plc.set_placement_grid(10, 10)
+    plc.set_canvas_boundary_check(boundary_check)
+    plc.restore_placement(os.path.join(test_data_dir, 'initial.plc'))
+    plc.create_blockage(0.0, 0.0, 120.0, 180.0, 1.0)
+    plc.create_blockage(300.0, 0.0, 500.0, 100.0, 0.5)
+    self.assertTrue(plc.is_node_placed(8))
+    hard_macros = [2, 3]
+    for node in hard_macros:
+      plc.unplace_node(node)
+    mask = occupancy_mask.OccupancyMask(plc)
+    for node in hard_macros:
+      expected = np.asarray(plc.get_node_mask(node), dtype=bool)
+      np.testing.assert_array_equal(mask.get_node_mask(node), expected)
+      valid = np.flatnonzero(expected)
+      grid_cell_index = valid[len(valid) // 3]
+      plc.place_node(node, grid_cell_index)
+      mask.place_node(node, grid_cell_index)
+
+  def test_reset(self):
+    plc = self._create_plc(0.0)
+    node = plc.get_macro_indices()[0]
+    plc.place_node(node, 0)
+    mask = occupancy_mask.OccupancyMask(plc)
+    # The macros already placed are read from plc.
+    np.testing.assert_array_equal(
+        mask.get_node_mask(node), np.asarray(plc.get_node_mask(node),
+                                             dtype=bool))
+    plc.unplace_all_nodes()
+    mask.reset()
+    np.testing.assert_array_equal(
+        mask.get_node_mask(node), np.asarray(plc.get_node_mask(node),
+                                             dtype=bool))
+
+  def test_reset_from_baseline(self):
+    plc = self._create_plc(0.0)
+    first, second = plc.get_macro_indices()[:2]
+    plc.place_node(first, 0)
+    mask = occupancy_mask.OccupancyMask(plc)
+    expected = mask.get_node_mask(second)
+    mask.place_node(second, 50)
+    # The hard macros placed after the last read from plc are removed.
+    mask.reset(from_plc=False)
+    np.testing.assert_array_equal(mask.get_node_mask(second), expected)
+
+  def test_lookahead_mask(self):
+    plc = self._create_plc(0.0)
+    mask = occupancy_mask.OccupancyMask(plc)
+    rng = np.random.default_rng(0)
+    hard_macros = plc.get_macro_indices()
+    for node in hard_macros[:40]:
+      grid_cell_index = rng.choice(np.flatnonzero(mask.get_node_mask(node)))
+      plc.place_node(node, grid_cell_index)
+      mask.place_node(node, grid_cell_index)
+    node, later_nodes = hard_macros[40], hard_macros[41:]
+    lookahead = mask.get_lookahead_mask(node, later_nodes)
+
+    # All the macros have the same size, so they need as many cells.
+    expected = np.zeros_like(lookahead)
+    for grid_cell_index in np.flatnonzero(mask.get_node_mask(node)):
+      plc.place_node(node, grid_cell_index)
+      expected[grid_cell_index] = np.sum(plc.get_node_mask(
+          later_nodes[0])) >= len(later_nodes)
+      plc.unplace_node(node)
+    np.testing.assert_array_equal(lookahead & mask.get_node_mask(node),
+                                  expected)
+    self.assertLess(np.sum(expected), np.sum(mask.get_node_mask(node)))
+
+
+if __name__ == '__main__':
+  test_utils.main()
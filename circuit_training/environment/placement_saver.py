@@ -0,0 +1,234 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Saves the best placements of the eval, and fine-tunes them with CD.
+
+Saving a placement computes all its costs for the header of the file, and the
+coordinate descent fine-tuning of the eval can take minutes. AsyncPlacementSaver
+does both from a background thread, on its own PlacementCost, so that the eval
+actor keeps stepping:
+
+  saver = placement_saver.AsyncPlacementSaver(create_plc_fn, cost_info_fn,
+                                              output_plc_file)
+  saver.submit(placement_saver.SaveRequest(plc.snapshot(), cost, '', ts))
+  saver.close()  # Waits for the pending requests.
+
+At most `max_pending` requests wait for the thread. A new request drops the
+oldest pending one, whose placement is worse than the ones saved after it.
+"""
+
+import collections
+import dataclasses
+import os
+import threading
+from typing import Callable, Dict, Optional, Text, Tuple
+
+from absl import logging
+from circuit_training.environment import coordinate_descent_placer as cd_placer
+from circuit_training.environment import placement_util
+from circuit_training.environment import plc_client
+
+CostInfoFnType = Callable[..., Tuple[float, Dict[Text, float]]]
+
+
+@dataclasses.dataclass
+class SaveRequest:
+  """A placement to save, with the arguments of `save_placements`."""
+  snapshot: plc_client.PlacementSnapshot
+  cost: float
+  user_comments: Text
+  # Timestamp in the names of the snapshot files.
+  timestamp: Text
+
+
+def run_cd(plc: plc_client.PlacementCost, cost_info_fn: CostInfoFnType) -> None:
+  """Runs coordinate descent to finetune the orientations of the macros."""
+
+  def cost_fn(plc):
+    return cost_info_fn(plc=plc, done=True)
+
+  cd = cd_placer.CoordinateDescentPlacer(
+      plc=plc,
+      cost_fn=cost_fn,
+      use_stdcell_placer=True,
+      optimize_only_orientation=True)
+  cd.place()
+
+
+def save_placements(plc: plc_client.PlacementCost, cost: float,
+                    user_comments: Text, timestamp: Text,
+                    output_plc_file: Text, cost_info_fn: CostInfoFnType,
+                    cd_finetune: bool, cd_plc_file: Text) -> None:
+  """Saves the placement of plc, and its CD fine-tuned placement.
+
+  The placement is saved to `output_plc_file` and to a snapshot file named
+  after its cost. With `cd_finetune`, plc is fine-tuned and saved the same way.
+
+  Args:
+    plc: Placement cost object, with the placement to save.
+    cost: The cost of the placement, in the name of its snapshot file.
+    user_comments: Comments added to the headers of the files.
+    timestamp: Timestamp in the names of the snapshot files.
+    output_plc_file: The path to save the placement.
+    cost_info_fn: The cost function, used for the cost of the CD placement.
+    cd_finetune: If True, runs coordinate descent on plc and saves the result.
+    cd_plc_file: Name of the CD fine-tuned plc file, in the directory of
+      output_plc_file.
+  """
+  output_plc_dir = os.path.dirname(output_plc_file)
+  placement_util.save_placement(plc, output_plc_file, user_comments)
+  ppo_snapshot_file = os.path.join(
+      output_plc_dir,
+      f'snapshot_ppo_opt_placement_timestamp_{timestamp}_'
+      f'cost_{cost:.4f}.plc')
+  placement_util.save_placement(plc, ppo_snapshot_file, user_comments)
+  if not cd_finetune:
+    return
+  run_cd(plc, cost_info_fn)
+  cd_cost = cost_info_fn(plc=plc, done=True)[0]
+  placement_util.save_placement(plc, os.path.join(output_plc_dir, cd_plc_file),
+                                user_comments)
+  cd_snapshot_file = os.path.join(
+      output_plc_dir, f'snapshot_ppo_cd_placement_timestamp_{timestamp}'
+      f'_cost_{cd_cost:.4f}.plc')
+  placement_util.save_placement(plc, cd_snapshot_file, user_comments)
+
+
+class AsyncPlacementSaver(object):
+  """Saves placements from a background thread with its own PlacementCost."""
+
+  def __init__(self,
+               create_plc_fn: Callable[[], plc_client.PlacementCost],
+               cost_info_fn: CostInfoFnType,
+               output_plc_file: Text,
+               cd_finetune: bool = False,
+               cd_plc_file: Text = 'ppo_cd_placement.plc',
+               max_pending: int = 1) -> None:
+    """Creates the saver and starts its thread.
+
+    Args:
+      create_plc_fn: Creates the PlacementCost of the thread, of the same
+        netlist, grid and soft macro shapes as the placements to save. Called
+        from the thread on the first request.
+      cost_info_fn: The cost function, used for the cost of the CD placement.
+      output_plc_file: The path to save the placements.
+      cd_finetune: If True, the placements are also fine-tuned with CD.
+      cd_plc_file: Name of the CD fine-tuned plc file, in the directory of
+        output_plc_file.
+      max_pending: Number of requests that wait for the thread before the
+        oldest one is dropped.
+    """
+    if max_pending < 1:
+      raise ValueError(f'max_pending should be positive, got {max_pending}.')
+    self._create_plc_fn = create_plc_fn
+    self._cost_info_fn = cost_info_fn
+    self._output_plc_file = output_plc_file
+    self._cd_finetune = cd_finetune
+    self._cd_plc_file = cd_plc_file
+    self._pending = collections.deque(maxlen=max_pending)
+    self._condition = threading.Condition()
+    self._busy = False
+    self._closed = False
+    self._error: Optional[Exception] = None
+    self._num_saved = 0
+    self._num_dropped = 0
+    self._thread = threading.Thread(target=self._run, daemon=True)
+    self._thread.start()
+
+  @property
+  def num_saved(self) -> int:
+    return self._num_saved
+
+  @property
+  def num_dropped(self) -> int:
+    return self._num_dropped
+
+  def _raise_error(self) -> None:
+    if self._error is not None:
+      error, self._error = self._error, None
+      raise RuntimeError('Saving a placement failed.') from error
+
+  def submit(self, request: SaveRequest) -> None:
+    """Queues a placement, dropping the oldest pending one if needed.
+
+    Raises:
+      RuntimeError: If a previous request failed, or the saver is closed.
+    """
+    with self._condition:
+      self._raise_error()
+      if self._closed:
+        raise RuntimeError('The placement saver is closed.')
+      if len(self._pending) == self._pending.maxlen:
+        self._num_dropped += 1
+        logging.info('Dropping the stale placement of cost %f.',
+                     self._pending[0].cost)
+      self._pending.append(request)
+      self._condition.notify_all()
+
+  def flush(self, timeout: Optional[float] = None) -> bool:
+    """Waits until the pending requests are saved.
+
+    Args:
+      timeout: Seconds to wait, or None to wait until they are saved.
+
+    Returns:
+      False if the timeout expired first.
+
+    Raises:
+      RuntimeError: If a request failed.
+    """
+    with self._condition:
+      done = self._condition.wait_for(
+          lambda: not self._pending and not self._busy, timeout=timeout)
+      self._raise_error()
+      return done
+
+  def close(self) -> None:
+    """Saves the pending requests and stops the thread."""
+    with self._condition:
+      self._closed = True
+      self._condition.notify_all()
+    self._thread.join()
+    with self._condition:
+      self._raise_error()
+
+  def _run(self) -> None:
+    plc = None
+    while True:
+      with self._condition:
+        self._condition.wait_for(lambda: self._pending or self._closed)
+        if not self._pending:
+          return
+        request = self._pending.popleft()
+        self._busy = True
+      error = None
+      try:
+        if plc is None:
+          plc = self._create_plc_fn()
+        plc.restore(request.snapshot)
+        save_placements(plc, request.cost, request.user_comments,
+                        request.timestamp, self._output_plc_file,
+                        self._cost_info_fn, self._cd_finetune,
+                        self._cd_plc_file)
+      except Exception as e:  # pylint: disable=broad-except
+        logging.exception('Saving the placement of cost %f failed.',
+                          request.cost)
+        error = e
+      with self._condition:
+        if error is None:
+          self._num_saved += 1
+        else:
+          self._error = error
+        self._busy = False
+        self._condition.notify_all()
@@ -0,0 +1,122 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for placement_saver."""
+
+import os
+import threading
+
+from absl import flags
+from circuit_training.environment import environment
+from circuit_training.environment import placement_saver
+from circuit_training.environment import placement_util
+from circuit_training.environment import plc_client
+from circuit_training.utils import test_utils
+
+FLAGS = flags.FLAGS
+
+_TEST_DATA_DIR = 'circuit_training/environment/test_data/sample_clustered'
+
+
+class PlacementSaverTest(test_utils.TestCase):
+
+  def _create_plc(self) -> plc_client.PlacementCost:
+    test_data_dir = os.path.join(FLAGS.test_srcdir, _TEST_DATA_DIR)
+    return placement_util.create_placement_cost(
+        netlist_file=os.path.join(test_data_dir, 'netlist.pb.txt'),
+        init_placement=os.path.join(test_data_dir, 'initial.plc'),
+        backend='numpy')
+
+  def _request(self, cost: float) -> placement_saver.SaveRequest:
+    return placement_saver.SaveRequest(
+        snapshot=self._create_plc().snapshot(),
+        cost=cost,
+        user_comments='Train step : 1',
+        timestamp='20220101_000000')
+
+  def test_save_with_cd(self):
+    output_dir = self.create_tempdir()
+    output_plc_file = os.path.join(output_dir, 'ppo_opt_placement.plc')
+    saver = placement_saver.AsyncPlacementSaver(
+        self._create_plc,
+        environment.cost_info_function,
+        output_plc_file=output_plc_file,
+        cd_finetune=True)
+    saver.submit(self._request(1.0))
+    saver.close()
+
+    self.assertEqual(saver.num_saved, 1)
+    with open(output_plc_file) as f:
+      self.assertIn('Train step : 1', f.read())
+    self.assertTrue(
+        os.path.exists(os.path.join(output_dir, 'ppo_cd_placement.plc')))
+    self.assertTrue(
+        os.path.exists(
+            os.path.join(
+                output_dir, 'snapshot_ppo_opt_placement_timestamp_'
+                '20220101_000000_cost_1.0000.plc')))
+
+  def test_drop_stale(self):
+    output_dir = self.create_tempdir()
+    started = threading.Event()
+    release = threading.Event()
+
+    def create_plc_fn():
+      started.set()
+      release.wait()
+      return self._create_plc()
+
+    saver = placement_saver.AsyncPlacementSaver(
+        create_plc_fn,
+        environment.cost_info_function,
+        output_plc_file=os.path.join(output_dir, 'ppo_opt_placement.plc'),
+        max_pending=1)
+    saver.submit(self._request(3.0))
+    started.wait()
+    # The thread saves the first request, the second one is dropped.
+    saver.submit(self._request(2.0))
+    saver.submit(self._request(1.0))
+    self.assertFalse(saver.flush(timeout=0.01))
+    release.set()
+    self.assertTrue(saver.flush())
+
+    self.assertEqual(saver.num_saved, 2)
+    self.assertEqual(saver.num_dropped, 1)
+    snapshot_files = sorted(
+        f for f in os.listdir(output_dir) if f.startswith('snapshot'))
+    self.assertEqual(snapshot_files, [
+        'snapshot_ppo_opt_placement_timestamp_20220101_000000_cost_1.0000.plc',
+        'snapshot_ppo_opt_placement_timestamp_20220101_000000_cost_3.0000.plc',
+    ])
+    saver.close()
+    with self.assertRaises(RuntimeError):
+      saver.submit(self._request(0.5))
+
+  def test_error(self):
+
+    def create_plc_fn():
+      raise IOError('No plc_wrapper_main.')
+
+    saver = placement_saver.AsyncPlacementSaver(
+        create_plc_fn,
+        environment.cost_info_function,
+        output_plc_file=os.path.join(self.create_tempdir(), 'placement.plc'))
+    saver.submit(self._request(1.0))
+    with self.assertRaises(RuntimeError):
+      saver.flush()
+    saver.close()
+
+
+if __name__ == '__main__':
+  test_utils.main()
@@ -24,6 +24,7 @@ from typing import Dict, Iterator, List, Optional, Tuple, Union
 
 from absl import logging
 from circuit_training.environment import plc_client
+from circuit_training.environment import plc_numpy
 import numpy as np
 
 # Internal gfile dependencies
@@ -45,33 +46,37 @@ def nodes_of_types(plc: plc_client.PlacementCost,
 def get_node_xy_coordinates(
     plc: plc_client.PlacementCost) -> Dict[int, Tuple[float, float]]:
   """Returns all node x,y coordinates (canvas) in a dict."""
-  node_coords = dict()
-  for node_index in nodes_of_types(plc, ['MACRO', 'STDCELL', 'PORT']):
-    if plc.is_node_placed(node_index):
-      node_coords[node_index] = plc.get_node_location(node_index)
-  return node_coords
+  nodes = np.flatnonzero(
+      np.isin(plc.node_types(), ['MACRO', 'STDCELL', 'PORT']))
+  nodes = nodes[plc.placed_mask(nodes)]
+  locations = plc.node_locations(nodes).tolist()
+  return {node: tuple(xy) for node, xy in zip(nodes.tolist(), locations)}
 
 
 def get_macro_orientations(plc: plc_client.PlacementCost) -> Dict[int, int]:
   """Returns all macros' orientations in a dict."""
-  macro_orientations = dict()
-  for node_index in nodes_of_types(plc, ['MACRO']):
-    macro_orientations[node_index] = plc.get_macro_orientation(node_index)
-  return macro_orientations
+  node_types = plc.node_types()
+  macros = np.flatnonzero(node_types == 'MACRO')
+  return dict(
+      zip(macros.tolist(),
+          plc.orientations(macros, node_types=node_types).tolist()))
 
 
 def restore_node_xy_coordinates(
     plc: plc_client.PlacementCost,
     node_coords: Dict[int, Tuple[float, float]]) -> None:
-  for node_index, coords in node_coords.items():
-    if not plc.is_node_fixed(node_index):
-      plc.update_node_coords(node_index, coords[0], coords[1])
+  nodes = list(node_coords)
+  fixed = plc.fixed_mask(nodes)
+  nodes = [node for node, f in zip(nodes, fixed) if not f]
+  plc.update_node_coords_bulk(nodes, [node_coords[node] for node in nodes])
 
 
 def restore_macro_orientations(plc: plc_client.PlacementCost,
                                macro_orientations: Dict[int, int]) -> None:
-  for node_index, orientation in macro_orientations.items():
-    plc.update_macro_orientation(node_index, orientation)
+  # Soft macros have no orientation.
+  nodes = [node for node, o in macro_orientations.items() if o]
+  plc.update_macro_orientation_bulk(
+      nodes, [macro_orientations[node] for node in nodes])
 
 
 def extract_attribute_from_comments(attribute: str,
@@ -179,6 +184,12 @@ def fix_port_coordinates(plc: plc_client.PlacementCost) -> None:
     plc.fix_node_coord(node)
 
 
+_PLACEMENT_COST_BACKENDS = {
+    'binary': plc_client.PlacementCost,
+    'numpy': plc_numpy.PlacementCost,
+}
+
+
 # The routing capacities are calculated based on the public information about
 # 7nm technology (https://en.wikichip.org/wiki/7_nm_lithography_process)
 # with an arbitary, yet reasonable, assumption of 18% of the tracks for
@@ -199,6 +210,7 @@ def create_placement_cost(
     macro_vertical_routing_allocation: float = 51.79,
     blockages: Optional[List[List[float]]] = None,
     fixed_macro_names_regex: Optional[List[str]] = None,
+    backend: str = 'binary',
 ) -> plc_client.PlacementCost:
   """Creates a placement_cost object.
 
@@ -218,6 +230,8 @@ def create_placement_cost(
     blockages: List of blockages.
     fixed_macro_names_regex: A list of macro names regex that should be fixed
       in the placement.
+    backend: Either 'binary' to use plc_wrapper_main through plc_client, or
+      'numpy' to use the in-process plc_numpy implementation.
 
   Returns:
     A PlacementCost object.
@@ -233,8 +247,10 @@ def create_placement_cost(
         'Please add the block_name in:\n%s\nor in:\n%s', netlist_file,
         init_placement)
 
-  plc = plc_client.PlacementCost(netlist_file, macro_macro_x_spacing,
-                                 macro_macro_y_spacing)
+  if backend not in _PLACEMENT_COST_BACKENDS:
+    raise ValueError(f'Unknown PlacementCost backend: {backend}.')
+  plc = _PLACEMENT_COST_BACKENDS[backend](netlist_file, macro_macro_x_spacing,
+                                          macro_macro_y_spacing)
 
   blockages = blockages or get_blockages_from_comments(
       [netlist_file, init_placement])
@@ -290,21 +306,29 @@ def get_node_type_counts(plc: plc_client.PlacementCost) -> Dict[str, int]:
       'HARD_MACRO_PIN': 0
   }
 
-  for node_index in nodes_of_types(plc,
-                                   ['MACRO', 'STDCELL', 'PORT', 'MACRO_PIN']):
-    node_type = plc.get_node_type(node_index)
-    counts[node_type] += 1
-    if node_type == 'MACRO':
-      if plc.is_node_soft_macro(node_index):
-        counts['SOFT_MACRO'] += 1
-      else:
-        counts['HARD_MACRO'] += 1
-    if node_type == 'MACRO_PIN':
-      ref_id = plc.get_ref_node_id(node_index)
-      if plc.is_node_soft_macro(ref_id):
-        counts['SOFT_MACRO_PIN'] += 1
-      else:
-        counts['HARD_MACRO_PIN'] += 1
+  node_types = plc.node_types()
+  for node_type in node_types.tolist():
+    if node_type in counts:
+      counts[node_type] += 1
+
+  macros = np.flatnonzero(node_types == 'MACRO').tolist()
+  macro_pins = np.flatnonzero(node_types == 'MACRO_PIN').tolist()
+  ref_ids = plc.call_many([('get_ref_node_id', (i,)) for i in macro_pins])
+  # Fetch the soft macro flags of all macros and pin owners in one batch.
+  owners = sorted(set(macros) | set(ref_ids))
+  is_soft = dict(
+      zip(owners,
+          plc.call_many([('is_node_soft_macro', (i,)) for i in owners])))
+  for node_index in macros:
+    if is_soft[node_index]:
+      counts['SOFT_MACRO'] += 1
+    else:
+      counts['HARD_MACRO'] += 1
+  for ref_id in ref_ids:
+    if is_soft[ref_id]:
+      counts['SOFT_MACRO_PIN'] += 1
+    else:
+      counts['HARD_MACRO_PIN'] += 1
   return counts
 
 
@@ -324,6 +348,7 @@ def save_placement(plc: plc_client.PlacementCost,
   hor_routes, ver_routes = plc.get_routes_per_micron()
   hor_macro_alloc, ver_macro_alloc = plc.get_macro_routing_allocation()
   smooth = plc.get_congestion_smooth_range()
+  costs = plc.get_cost_info()
   info = textwrap.dedent("""\
     Placement file for Circuit Training
     Source input file(s) : {src_filename}
@@ -352,9 +377,9 @@ def save_placement(plc: plc_client.PlacementCost,
       height=height,
       area=plc.get_area(),
       wl=plc.get_wirelength(),
-      wlc=plc.get_cost(),
-      cong=plc.get_congestion_cost(),
-      density=plc.get_density_cost(),
+      wlc=costs['wirelength'],
+      cong=costs['congestion'],
+      density=costs['density'],
       project=plc.get_project_name(),
       block_name=plc.get_block_name(),
       hor_routes=hor_routes,
@@ -433,14 +458,22 @@ def get_ordered_node_indices(mode: str,
     Node indices sorted according to the mode.
   """
   macro_indices = plc.get_macro_indices()
-  hard_macro_indices = [
-      m for m in macro_indices if not plc.is_node_soft_macro(m)
-  ]
-  soft_macro_indices = [m for m in macro_indices if plc.is_node_soft_macro(m)]
+  num_macros = len(macro_indices)
+  replies = plc.call_many(
+      [('is_node_soft_macro', (m,)) for m in macro_indices] +
+      [('get_node_width_height', (m,)) for m in macro_indices] +
+      [('is_node_fixed', (m,)) for m in macro_indices])
+  is_soft = dict(zip(macro_indices, replies[:num_macros]))
+  areas = {
+      m: w * h
+      for m, (w, h) in zip(macro_indices, replies[num_macros:2 * num_macros])
+  }
+  is_fixed = dict(zip(macro_indices, replies[2 * num_macros:]))
+  hard_macro_indices = [m for m in macro_indices if not is_soft[m]]
+  soft_macro_indices = [m for m in macro_indices if is_soft[m]]
 
   def macro_area(idx):
-    w, h = plc.get_node_width_height(idx)
-    return w * h
+    return areas[idx]
 
   # Make sure node order is consistent across all collectors, if random.
   logging.info('node_order: %s', mode)
@@ -461,7 +494,7 @@ def get_ordered_node_indices(mode: str,
     raise ValueError('{} is an unsupported node placement mode.'.format(mode))
 
   if exclude_fixed_nodes:
-    ordered_indices = [m for m in ordered_indices if not plc.is_node_fixed(m)]
+    ordered_indices = [m for m in ordered_indices if not is_fixed[m]]
   return ordered_indices
 
 
@@ -516,20 +549,16 @@ def extract_blockages_from_file(
 
 def get_node_locations(plc: plc_client.PlacementCost) -> Dict[int, int]:
   """Returns all node grid locations (macros and stdcells) in a dict."""
-  node_locations = dict()
-  for i in nodes_of_types(plc, ['MACRO', 'STDCELL']):
-    node_locations[i] = plc.get_grid_cell_of_node(i)
-  return node_locations
+  nodes = np.flatnonzero(np.isin(plc.node_types(), ['MACRO', 'STDCELL']))
+  return dict(zip(nodes.tolist(), plc.grid_cells(nodes).tolist()))
 
 
 def get_node_ordering_by_size(plc: plc_client.PlacementCost) -> List[int]:
   """Returns the list of nodes (macros and stdcells) ordered by area."""
-  node_areas = dict()
-  for i in nodes_of_types(plc, ['MACRO', 'STDCELL']):
-    if plc.is_node_fixed(i):
-      continue
-    w, h = plc.get_node_width_height(i)
-    node_areas[i] = w * h
+  nodes = np.flatnonzero(np.isin(plc.node_types(), ['MACRO', 'STDCELL']))
+  nodes = nodes[~plc.fixed_mask(nodes)]
+  node_areas = dict(zip(nodes.tolist(), np.prod(plc.node_sizes(nodes), axis=1)))
+  # Stable, nodes with the same area stay in index order.
   return sorted(node_areas, key=node_areas.get, reverse=True)
 
 
@@ -583,11 +612,14 @@ def place_near(plc: plc_client.PlacementCost, node_index: int,
 def disconnect_high_fanout_nets(plc: plc_client.PlacementCost,
                                 max_allowed_fanouts: int = 500) -> None:
   high_fanout_nets = []
-  for i in nodes_of_types(plc, ['PORT', 'STDCELL', 'MACRO_PIN']):
-    num_fanouts = len(plc.get_fan_outs_of_node(i))
-    if num_fanouts > max_allowed_fanouts:
+  drivers = np.flatnonzero(
+      np.isin(plc.node_types(), ['PORT', 'STDCELL', 'MACRO_PIN']))
+  indptr, _ = plc.fan_outs(drivers)
+  num_fanouts = np.diff(indptr)
+  for i, n in zip(drivers.tolist(), num_fanouts.tolist()):
+    if n > max_allowed_fanouts:
       print('Disconnecting node: {} with {} fanouts.'.format(
-          plc.get_node_name(i), num_fanouts))
+          plc.get_node_name(i), n))
       high_fanout_nets.append(i)
   plc.disconnect_nets(high_fanout_nets)
 
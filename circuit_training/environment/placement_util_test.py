@@ -19,6 +19,7 @@ import os
 from absl import flags
 from circuit_training.environment import placement_util
 from circuit_training.utils import test_utils
+import numpy as np
 
 # Internal gfile dependencies
 
@@ -47,6 +48,12 @@ class MockPlacementCost(object):
     ]
     self._fix_node_coord = [False] * len(self.node_type)
 
+  def num_nodes(self):
+    return len(self.node_type)
+
+  def call_many(self, calls):
+    return [getattr(self, name)(*args) for name, args in calls]
+
   def get_node_type(self, node: int):
     if node >= len(self.node_type):
       return None
@@ -88,6 +95,14 @@ class MockPlacementCost(object):
   def get_density_cost(self):
     return 14.0
 
+  def get_cost_info(self, components=None):
+    costs = {
+        'wirelength': self.get_cost(),
+        'congestion': self.get_congestion_cost(),
+        'density': self.get_density_cost(),
+    }
+    return {c: costs[c] for c in components or costs}
+
   def get_project_name(self):
     return 'project'
 
@@ -146,6 +161,22 @@ class MockPlacementCost(object):
   def is_node_fixed(self, index):
     return True
 
+  def node_types(self, nodes=None):
+    return np.array(self.node_type if nodes is None else
+                    [self.node_type[i] for i in nodes])
+
+  def node_locations(self, nodes=None):
+    nodes = range(6) if nodes is None else nodes
+    return np.array([self.get_node_location(i) for i in nodes], dtype=float)
+
+  def placed_mask(self, nodes=None):
+    return np.ones(6 if nodes is None else len(nodes), dtype=bool)
+
+  def orientations(self, nodes=None, node_types=None):
+    del node_types
+    nodes = range(6) if nodes is None else nodes
+    return np.array([self.get_macro_orientation(i) for i in nodes])
+
 
 class PlacementUtilTest(test_utils.TestCase):
 
@@ -0,0 +1,259 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""An asyncio PlacementCost client.
+
+`AsyncPlacementCost` talks to plc_wrapper_main over the same AF_UNIX channel as
+plc_client.PlacementCost, but its methods are coroutines, so a single thread
+can keep many plc_wrapper_main processes busy:
+
+  plcs = await asyncio.gather(*[
+      plc_async.AsyncPlacementCost.create(netlist_file) for _ in range(8)])
+  costs = await asyncio.gather(*[plc.get_cost() for plc in plcs])
+
+With --plc_framed_protocol, the requests to one process are pipelined: they are
+written without waiting for the previous replies, and the replies, which come
+back in order, are matched to the requests by a reader task. Without it, or
+with --plc_shared_memory_mb, the requests to one process are sent one at a
+time, since the end of a reply is only known once it parses as JSON, or since
+every reply reuses the shared buffer.
+"""
+
+import asyncio
+import collections
+import json
+import tempfile
+import time
+from typing import Any, List, Optional, Sequence, Text, Tuple
+
+from absl import flags
+from circuit_training.environment import plc_client
+from circuit_training.environment import plc_protocol
+from circuit_training.environment import plc_stats
+
+FLAGS = flags.FLAGS
+
+
+class AsyncPlacementCost(object):
+  """asyncio client of plc_wrapper_main."""
+
+  def __init__(self,
+               reader: asyncio.StreamReader,
+               writer: asyncio.StreamWriter,
+               framed_protocol: bool = False,
+               process: Optional[asyncio.subprocess.Process] = None,
+               shared_buffer: Optional[plc_protocol.SharedArrayBuffer] = None
+              ) -> None:
+    """Creates a client on a connected stream, see also `create`.
+
+    Args:
+      reader: The stream to read the replies from.
+      writer: The stream to write the requests to.
+      framed_protocol: If True, uses the length-prefixed frames of
+        plc_protocol and pipelines the requests.
+      process: The plc_wrapper_main process, killed by `close`.
+      shared_buffer: The buffer the framed replies may put their arrays in,
+        closed by `close`.
+    """
+    self._reader = reader
+    self._writer = writer
+    self._framed_protocol = framed_protocol
+    self._process = process
+    self._shared_buffer = shared_buffer
+    # Unframed or with a shared buffer: one request at a time.
+    self._lock = asyncio.Lock()
+    # Framed: the futures of the requests waiting for a reply, in order.
+    self._pending = collections.deque()
+    self._reader_task = None
+
+  @classmethod
+  async def create(cls,
+                   netlist_file: Text,
+                   macro_macro_x_spacing: float = 0.0,
+                   macro_macro_y_spacing: float = 0.0) -> 'AsyncPlacementCost':
+    """Starts plc_wrapper_main and returns a client connected to it.
+
+    Args:
+      netlist_file: Path to the netlist proto text file.
+      macro_macro_x_spacing: Macro-to-macro x spacing in microns.
+      macro_macro_y_spacing: Macro-to-macro y spacing in microns.
+
+    Returns:
+      The client.
+    """
+    if not FLAGS.plc_wrapper_main:
+      raise ValueError('FLAGS.plc_wrapper_main should be specified.')
+
+    connected = asyncio.get_running_loop().create_future()
+
+    def on_connect(reader, writer):
+      if not connected.done():
+        connected.set_result((reader, writer))
+
+    shared_buffer = None
+    if FLAGS.plc_framed_protocol and FLAGS.plc_shared_memory_mb > 0:
+      shared_buffer = plc_protocol.SharedArrayBuffer(
+          FLAGS.plc_shared_memory_mb * 1024 * 1024)
+    address = tempfile.NamedTemporaryFile().name
+    server = await asyncio.start_unix_server(on_connect, path=address)
+    process = await asyncio.create_subprocess_exec(
+        *plc_client.plc_wrapper_main_args(address, netlist_file,
+                                          macro_macro_x_spacing,
+                                          macro_macro_y_spacing, shared_buffer))
+    try:
+      reader, writer = await connected
+    finally:
+      server.close()
+    return cls(
+        reader,
+        writer,
+        framed_protocol=FLAGS.plc_framed_protocol,
+        process=process,
+        shared_buffer=shared_buffer)
+
+  def __getattr__(self, name: Text) -> Any:
+    if name.startswith('_'):
+      raise AttributeError(name)
+
+    async def f(*args) -> Any:
+      return await self.call(name, *args)
+
+    return f
+
+  async def call(self, name: Text, *args) -> Any:
+    """Calls the snake_case method `name` and returns its result."""
+    name = plc_protocol.to_pascal_case(name)
+    output = await self._request(name,
+                                 plc_protocol.encode_request(name, list(args)))
+    return plc_protocol.parse_reply(name, args, output)
+
+  async def call_many(
+      self, calls: Sequence[Tuple[Text, Sequence[Any]]]) -> List[Any]:
+    """Calls several methods and returns their results in order.
+
+    With the framed protocol the calls are sent as a single batch request, see
+    plc_client.PlacementCost.call_many.
+
+    Args:
+      calls: A sequence of (snake_case method name, args) pairs.
+
+    Returns:
+      The list of results, one per call.
+    """
+    if not self._framed_protocol:
+      return [await self.call(name, *args) for name, args in calls]
+    if not calls:
+      return []
+    calls = [(plc_protocol.to_pascal_case(name), list(args))
+             for name, args in calls]
+    outputs = await self._request(plc_protocol.BATCH_METHOD,
+                                  plc_protocol.encode_batch_request(calls))
+    return [
+        plc_protocol.parse_reply(name, args, output)
+        for (name, args), output in zip(calls, outputs)
+    ]
+
+  async def _request(self, name: Text, request: bytes) -> Any:
+    """Sends the request, returns the decoded reply and records the stats."""
+    start = time.perf_counter()
+    if self._framed_protocol and self._shared_buffer is not None:
+      # Not pipelined, every reply reuses the shared buffer.
+      request = plc_protocol.encode_frame(request)
+      async with self._lock:
+        output, response_bytes = await self._send_framed(request)
+    elif self._framed_protocol:
+      request = plc_protocol.encode_frame(request)
+      output, response_bytes = await self._send_framed(request)
+    else:
+      async with self._lock:
+        self._writer.write(request)
+        await self._writer.drain()
+        output, response_bytes = await self._read_json()
+    plc_stats.RPC_STATS.record(name,
+                               time.perf_counter() - start, len(request),
+                               response_bytes)
+    return output
+
+  async def _send_framed(self, request: bytes) -> Tuple[Any, int]:
+    """Pipelines a framed request, returns the reply and its size."""
+    if self._reader_task is None:
+      self._reader_task = asyncio.ensure_future(self._read_frames())
+    elif self._reader_task.done():
+      raise ConnectionError('The connection to plc_wrapper_main is closed.')
+    reply = asyncio.get_running_loop().create_future()
+    # The future stays in the queue even if the caller is cancelled, so that
+    # the following replies are matched to the right requests.
+    self._pending.append(reply)
+    try:
+      self._writer.write(request)
+      await self._writer.drain()
+    except ConnectionError:
+      # The reader task fails the pending replies.
+      pass
+    return await reply
+
+  async def _read_json(self) -> Tuple[Any, int]:
+    """Reads an unframed reply until it parses as JSON, returns its size."""
+    data = b''
+    while True:
+      part = await self._reader.read(plc_client.PlacementCost.BUFFER_LEN)
+      if not part:
+        raise ConnectionError('The connection to plc_wrapper_main is closed.')
+      data += part
+      try:
+        return json.loads(data.decode('utf-8')), len(data)
+      except (json.decoder.JSONDecodeError, UnicodeDecodeError):
+        continue
+
+  async def _read_frames(self) -> None:
+    """Reads the framed replies and resolves the pending requests in order."""
+    try:
+      while True:
+        header = await self._reader.readexactly(plc_protocol.HEADER.size)
+        encoding, size = plc_protocol.HEADER.unpack(header)
+        payload = await self._reader.readexactly(size)
+        reply = self._pending.popleft()
+        if reply.cancelled():
+          continue
+        try:
+          reply.set_result(
+              (plc_protocol.decode_payload(encoding, memoryview(payload),
+                                           self._shared_buffer),
+               plc_protocol.HEADER.size + size))
+        except ValueError as e:
+          reply.set_exception(e)
+    except (asyncio.IncompleteReadError, ConnectionError) as e:
+      while self._pending:
+        reply = self._pending.popleft()
+        if not reply.done():
+          reply.set_exception(
+              ConnectionError(
+                  f'The connection to plc_wrapper_main is closed: {e}'))
+
+  async def close(self) -> None:
+    """Closes the connection and stops plc_wrapper_main."""
+    self._writer.close()
+    if self._reader_task is not None:
+      self._reader_task.cancel()
+    if self._process is not None and self._process.returncode is None:
+      self._process.kill()
+      await self._process.wait()
+    if self._shared_buffer is not None:
+      self._shared_buffer.close()
+
+  async def __aenter__(self) -> 'AsyncPlacementCost':
+    return self
+
+  async def __aexit__(self, *unused_args) -> None:
+    await self.close()
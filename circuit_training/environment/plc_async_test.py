@@ -0,0 +1,179 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for plc_async."""
+
+import asyncio
+import json
+import os
+import re
+import socket
+import threading
+
+from absl import flags
+from circuit_training.environment import plc_async
+from circuit_training.environment import plc_numpy
+from circuit_training.environment import plc_protocol
+from circuit_training.environment import plc_stats
+from circuit_training.utils import test_utils
+import numpy as np
+
+FLAGS = flags.FLAGS
+
+_NETLIST_FILE = ('circuit_training/environment/test_data/sample_clustered/'
+                 'netlist.pb.txt')
+
+
+def _to_json(obj):
+  if isinstance(obj, tuple):
+    return {'__tuple__': True, 'items': list(obj)}
+  return obj
+
+
+class _Server(object):
+  """Answers requests like plc_wrapper_main, using the NumPy backend."""
+
+  def __init__(self,
+               conn,
+               framed_protocol,
+               wait_for_requests=1,
+               shared_buffer=None):
+    self._conn = conn
+    self._framed_protocol = framed_protocol
+    self._shared_buffer = shared_buffer
+    # Number of requests to read before sending the replies.
+    self._wait_for_requests = wait_for_requests
+    self.plc = plc_numpy.PlacementCost(
+        os.path.join(FLAGS.test_srcdir, _NETLIST_FILE))
+    self._thread = threading.Thread(target=self._serve, daemon=True)
+    self._thread.start()
+
+  def _run(self, name, args):
+    snake_name = re.sub(r'(?<!^)(?=[A-Z])', '_', name).lower()
+    try:
+      return _to_json(getattr(self.plc, snake_name)(*args))
+    except ValueError as e:
+      return {'ok': False, 'message': str(e)}
+
+  def _reply(self, request):
+    if request['name'] == plc_protocol.BATCH_METHOD:
+      return [self._run(name, args) for name, args in request['args']]
+    return self._run(request['name'], request['args'])
+
+  def _serve(self):
+    reader = plc_protocol.FrameReader()
+    try:
+      while True:
+        if self._framed_protocol:
+          requests = [
+              reader.read_object(self._conn)
+              for _ in range(self._wait_for_requests)
+          ]
+          self._conn.sendall(b''.join(
+              plc_protocol.encode_reply(
+                  self._reply(r), shared_buffer=self._shared_buffer)
+              for r in requests))
+        else:
+          request = json.loads(self._conn.recv(1024 * 1024))
+          self._conn.sendall(json.dumps(self._reply(request)).encode('utf-8'))
+    except (ConnectionError, OSError, ValueError):
+      return
+
+
+class PlcAsyncTest(test_utils.TestCase):
+
+  def _run_with_server(self,
+                       test_fn,
+                       framed_protocol,
+                       wait_for_requests=1,
+                       shared_buffer=None):
+    client, server = socket.socketpair()
+    self.addCleanup(server.close)
+    fake = _Server(server, framed_protocol, wait_for_requests, shared_buffer)
+
+    async def run():
+      reader, writer = await asyncio.open_unix_connection(sock=client)
+      async with plc_async.AsyncPlacementCost(
+          reader,
+          writer,
+          framed_protocol=framed_protocol,
+          shared_buffer=shared_buffer) as plc:
+        await asyncio.wait_for(test_fn(plc, fake.plc), timeout=30)
+
+    asyncio.run(run())
+
+  def test_calls(self):
+
+    async def test_fn(plc, expected):
+      self.assertEqual(await plc.get_macro_indices(), [2, 3, 8])
+      self.assertEqual(await plc.get_node_location(2),
+                       expected.get_node_location(2))
+      self.assertTrue(await plc.update_node_coords(2, 100.0, 100.0))
+      self.assertEqual(await plc.get_node_location(2), (100.0, 100.0))
+      self.assertEqual(
+          await plc.call_many([('get_node_type', (2,)), ('get_cost', ())]),
+          ['MACRO', expected.get_cost()])
+      with self.assertRaises(ValueError):
+        await plc.update_macro_orientation(2, 'X')
+
+    for framed_protocol in (False, True):
+      plc_stats.RPC_STATS.reset()
+      self._run_with_server(test_fn, framed_protocol)
+      stats = plc_stats.RPC_STATS.snapshot()
+      self.assertEqual(stats['GetNodeLocation']['count'], 2)
+      self.assertGreater(stats['GetMacroIndices']['response_bytes'], 0)
+      self.assertEqual('CallMany' in stats, framed_protocol)
+
+  def test_pipelining(self):
+    num_nodes = 12
+
+    async def test_fn(plc, expected):
+      # The server only replies once it has all the requests, which needs
+      # them to be pipelined.
+      types = await asyncio.gather(
+          *[plc.get_node_type(i) for i in range(num_nodes)])
+      self.assertEqual(types,
+                       [expected.get_node_type(i) for i in range(num_nodes)])
+
+    self._run_with_server(
+        test_fn, framed_protocol=True, wait_for_requests=num_nodes)
+
+  def test_shared_memory(self):
+
+    async def test_fn(plc, expected):
+      masks = await asyncio.gather(*[plc.get_node_mask(i) for i in (2, 3)])
+      for mask, node in zip(masks, (2, 3)):
+        self.assertIsInstance(mask, np.ndarray)
+        self.assertEqual(mask.tolist(), expected.get_node_mask(node))
+
+    shared_buffer = plc_protocol.SharedArrayBuffer(size=1024 * 1024)
+    self._run_with_server(
+        test_fn, framed_protocol=True, shared_buffer=shared_buffer)
+
+  def test_closed_connection(self):
+    client, server = socket.socketpair()
+
+    async def run():
+      reader, writer = await asyncio.open_unix_connection(sock=client)
+      plc = plc_async.AsyncPlacementCost(reader, writer, framed_protocol=True)
+      server.close()
+      with self.assertRaises(ConnectionError):
+        await asyncio.wait_for(plc.get_cost(), timeout=30)
+      await plc.close()
+
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+  test_utils.main()
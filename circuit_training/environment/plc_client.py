@@ -14,20 +14,328 @@
 # limitations under the License.
 """PlacementCost client class."""
 
+import atexit
+import collections
+import dataclasses
+import itertools
 import json
+import os
 import socket
 import subprocess
 import tempfile
-from typing import Any, Text
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Text, Tuple
 
 from absl import flags
 from absl import logging
+from circuit_training.environment import plc_protocol
+from circuit_training.environment import plc_stats
+from circuit_training.environment import plc_trace
+from circuit_training.environment import plc_warm_start
+import numpy as np
 
 flags.DEFINE_string('plc_wrapper_main', 'plc_wrapper_main',
                     'Path to plc_wrapper_main binary.')
+flags.DEFINE_bool(
+    'plc_framed_protocol', False,
+    'If set, talks to plc_wrapper_main using length-prefixed frames instead of '
+    'reading replies until they parse as JSON. Requires a plc_wrapper_main '
+    'that supports --framed_protocol.')
+flags.DEFINE_bool(
+    'plc_binary_arrays', False,
+    'If set (with --plc_framed_protocol), plc_wrapper_main sends flat numeric '
+    'lists, e.g. node masks and adjacency matrices, as raw arrays.')
+flags.DEFINE_integer(
+    'plc_shared_memory_mb', 0,
+    'If positive (with --plc_framed_protocol), maps a shared memory buffer of '
+    'this size that plc_wrapper_main writes the large numeric lists of its '
+    'replies to, e.g. node masks and adjacency matrices, which are then '
+    'returned as numpy arrays. Requires a plc_wrapper_main that supports '
+    '--shared_memory_file.')
+flags.DEFINE_bool(
+    'plc_cache_queries', False,
+    'If set, PlacementCost caches the results of queries that only change '
+    'with a few mutating methods, e.g. get_node_type or get_macro_indices, '
+    'and answers repeated calls without talking to plc_wrapper_main.')
+flags.DEFINE_bool(
+    'plc_print_rpc_stats_at_exit', False,
+    'If set, logs the per-method statistics of the calls to plc_wrapper_main '
+    '(see plc_stats) when the process exits.')
+
+flags.DEFINE_string(
+    'plc_record_traces_dir', None,
+    'If set, every PlacementCost writes the calls to plc_wrapper_main, their '
+    'replies and latencies to a trace file in this directory, which '
+    'ReplayPlacementCost can answer the same calls from (see plc_trace).')
+flags.DEFINE_integer(
+    'plc_max_recoveries', 0,
+    'If positive, a PlacementCost whose plc_wrapper_main dies, e.g. on a '
+    'preempted host, restarts it, replays the mutating calls made so far and '
+    'retries the failed call, up to this many times.')
+flags.DEFINE_integer(
+    'plc_warm_processes', 0,
+    'If positive, keeps this many plc_wrapper_main processes started in the '
+    'background per netlist (see plc_warm_start), so that new PlacementCost '
+    'objects of a netlist do not wait for it to be parsed.')
+flags.DEFINE_integer(
+    'plc_warm_max_netlists', 4,
+    'With --plc_warm_processes, number of most recently used netlists that '
+    'keep pre-started processes.')
 
 FLAGS = flags.FLAGS
 
+# Methods that change the state of a PlacementCost object. All the other
+# methods only query it.
+MUTATING_METHODS = frozenset([
+    'allow_hard_macros_over_std_cells',
+    'create_blockage',
+    'disconnect_nets',
+    'fix_node_coord',
+    'make_soft_macros_square',
+    'optimize_stdcells',
+    'place_node',
+    'place_node_by_name',
+    'restore_placement',
+    'set_block_name',
+    'set_canvas_boundary_check',
+    'set_canvas_size',
+    'set_congestion_smooth_range',
+    'set_macro_routing_allocation',
+    'set_overlap_threshold',
+    'set_placement_grid',
+    'set_project_name',
+    'set_routes_per_micron',
+    'set_use_incremental_cost',
+    'snap_ports_to_edges',
+    'unfix_node_coord',
+    'unplace_all_nodes',
+    'unplace_node',
+    'unplace_node_by_name',
+    'update_macro_orientation',
+    'update_macro_orientation_by_name',
+    'update_node_coords',
+    'update_node_coords_by_name',
+    'update_port_sides',
+])
+
+# Mutating methods that only change the placement, of a single node (the first
+# argument) or of all the nodes. Without the `_by_name` suffix.
+NODE_MUTATING_METHODS = frozenset([
+    'fix_node_coord',
+    'place_node',
+    'unfix_node_coord',
+    'unplace_node',
+    'update_macro_orientation',
+    'update_node_coords',
+])
+PLACEMENT_MUTATING_METHODS = frozenset([
+    'optimize_stdcells',
+    'restore_placement',
+    'unplace_all_nodes',
+])
+
+# The proxy cost components returned by `get_cost_info` and their getters.
+COST_INFO_METHODS = {
+    'wirelength': 'get_cost',
+    'congestion': 'get_congestion_cost',
+    'density': 'get_density_cost',
+}
+
+# PascalCase name -> snake_case name of the MUTATING_METHODS.
+_PASCAL_CASE_MUTATING_METHODS = {
+    plc_protocol.to_pascal_case(name): name for name in MUTATING_METHODS
+}
+
+# Number of calls in the recovery journal that triggers a checkpoint.
+_MAX_JOURNAL_CALLS = 10000
+
+
+# Cacheable queries and the mutating methods (without the `_by_name` suffix)
+# that change their results. The ones with no mutating methods only depend on
+# the netlist. `restore_placement` sets the orientations and fixed bits of the
+# nodes, and the canvas and grid sizes of the file header.
+CACHEABLE_METHODS = {
+    'get_area': ('make_soft_macros_square',),
+    'get_block_name': ('set_block_name',),
+    'get_blockages': ('create_blockage',),
+    'get_canvas_boundary_check': ('set_canvas_boundary_check',),
+    'get_canvas_width_height': ('restore_placement', 'set_canvas_size'),
+    'get_congestion_smooth_range': ('set_congestion_smooth_range',),
+    'get_fan_outs_of_node': ('disconnect_nets',),
+    'get_grid_num_columns_rows': ('restore_placement', 'set_placement_grid'),
+    'get_macro_adjacency': ('disconnect_nets',),
+    'get_macro_indices': (),
+    'get_macro_routing_allocation': ('set_macro_routing_allocation',),
+    'get_node_name': (),
+    'get_node_type': (),
+    'get_node_weight': (),
+    'get_node_width_height': ('make_soft_macros_square', 'restore_placement',
+                              'update_macro_orientation'),
+    'get_overlap_threshold': ('set_overlap_threshold',),
+    'get_project_name': ('set_project_name',),
+    'get_ref_node_id': (),
+    'get_routes_per_micron': ('set_routes_per_micron',),
+    'get_source_filename': (),
+    'is_node_fixed': ('fix_node_coord', 'restore_placement',
+                      'unfix_node_coord'),
+    'is_node_soft_macro': (),
+    'num_nodes': (),
+}
+
+
+def _invalidated_methods() -> Dict[Text, List[Text]]:
+  """Maps the mutating methods to the cached methods they invalidate."""
+  invalidated = collections.defaultdict(list)
+  for method, mutating_methods in CACHEABLE_METHODS.items():
+    for mutating_method in mutating_methods:
+      assert mutating_method in MUTATING_METHODS, mutating_method
+      invalidated[mutating_method].append(method)
+      if mutating_method + '_by_name' in MUTATING_METHODS:
+        invalidated[mutating_method + '_by_name'].append(method)
+  return dict(invalidated)
+
+
+_INVALIDATED_METHODS = _invalidated_methods()
+
+
+def _log_rpc_stats() -> None:
+  logging.info('plc_wrapper_main calls:\n%s',
+               plc_stats.format_stats(plc_stats.RPC_STATS.snapshot()))
+
+
+def plc_wrapper_main_args(
+    address: Text,
+    netlist_file: Text,
+    macro_macro_x_spacing: float,
+    macro_macro_y_spacing: float,
+    shared_buffer: Optional[plc_protocol.SharedArrayBuffer] = None
+) -> List[Text]:
+  """Returns the command line of plc_wrapper_main connecting to `address`."""
+  args = [
+      FLAGS.plc_wrapper_main,  #
+      '--uid=',
+      '--gid=',
+      f'--pipe_address={address}',
+      f'--netlist_file={netlist_file}',
+      f'--macro_macro_x_spacing={macro_macro_x_spacing}',
+      f'--macro_macro_y_spacing={macro_macro_y_spacing}',
+  ]
+  if FLAGS.plc_framed_protocol:
+    args.append('--framed_protocol')
+    if FLAGS.plc_binary_arrays:
+      args.append('--binary_arrays')
+    if shared_buffer is not None:
+      args.append(f'--shared_memory_file={shared_buffer.path}')
+      args.append(f'--shared_memory_size={shared_buffer.size}')
+  return [str(a) for a in args]
+
+
+# The socket, process, connection and shared memory buffer (or None) of a
+# plc_wrapper_main.
+_Started = Tuple[socket.socket, subprocess.Popen, socket.socket,
+                 Optional[plc_protocol.SharedArrayBuffer]]
+
+
+def _start_plc_wrapper_main(key: Tuple[Any, ...]) -> _Started:
+  """Starts plc_wrapper_main for the key made by PlacementCost."""
+  netlist_file, macro_macro_x_spacing, macro_macro_y_spacing = key[:3]
+  shared_buffer = None
+  if FLAGS.plc_framed_protocol and FLAGS.plc_shared_memory_mb > 0:
+    shared_buffer = plc_protocol.SharedArrayBuffer(
+        FLAGS.plc_shared_memory_mb * 1024 * 1024)
+  sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+  address = tempfile.NamedTemporaryFile().name
+  sock.bind(address)
+  sock.listen(1)
+  process = subprocess.Popen(
+      plc_wrapper_main_args(address, netlist_file, macro_macro_x_spacing,
+                            macro_macro_y_spacing, shared_buffer))
+  conn, _ = sock.accept()
+  return sock, process, conn, shared_buffer
+
+
+def _acquire_plc_wrapper_main(key: Tuple[Any, ...]) -> _Started:
+  if FLAGS.plc_warm_processes > 0:
+    return _get_warm_start_cache().acquire(key)
+  return _start_plc_wrapper_main(key)
+
+
+def _stop_plc_wrapper_main(started: _Started) -> None:
+  sock, process, conn, shared_buffer = started
+  process.kill()
+  process.wait()
+  conn.close()
+  sock.close()
+  if shared_buffer is not None:
+    shared_buffer.close()
+
+
+# Numbers the trace files of the process.
+_trace_ids = itertools.count()
+
+_warm_start_cache = None
+_warm_start_cache_lock = threading.Lock()
+
+
+def _get_warm_start_cache() -> plc_warm_start.WarmStartCache:
+  global _warm_start_cache
+  with _warm_start_cache_lock:
+    if _warm_start_cache is not None:
+      return _warm_start_cache
+    _warm_start_cache = plc_warm_start.WarmStartCache(
+        _start_plc_wrapper_main,
+        _stop_plc_wrapper_main,
+        num_spares=FLAGS.plc_warm_processes,
+        max_keys=FLAGS.plc_warm_max_netlists)
+    atexit.register(_warm_start_cache.close)
+    return _warm_start_cache
+
+
+@dataclasses.dataclass
+class PlacementSnapshot:
+  """The placement of the macros, stdcells and ports, see `snapshot`."""
+  # Indices of the nodes, all the nodes except the macro pins.
+  nodes: np.ndarray
+  # [len(nodes), 2] array of the (x, y) of the nodes.
+  locations: np.ndarray
+  # Orientations of the nodes, '' for the nodes without one.
+  orientations: np.ndarray
+  placed: np.ndarray
+  fixed: np.ndarray
+
+
+def _restore_calls(
+    snapshot: PlacementSnapshot) -> List[Tuple[Text, Tuple[Any, ...]]]:
+  """Returns the calls that restore a snapshot."""
+  calls = []
+  for node, (x, y), orientation, placed, fixed in zip(
+      snapshot.nodes.tolist(), snapshot.locations.tolist(),
+      snapshot.orientations.tolist(), snapshot.placed.tolist(),
+      snapshot.fixed.tolist()):
+    calls.append(('unfix_node_coord', (node,)))
+    if placed:
+      calls.append(('update_node_coords', (node, x, y)))
+    else:
+      calls.append(('unplace_node', (node,)))
+    if orientation:
+      calls.append(('update_macro_orientation', (node, orientation)))
+    if fixed:
+      calls.append(('fix_node_coord', (node,)))
+  return calls
+
+
+def _is_placement_mutation(name: Text) -> bool:
+  name = name[:-len('_by_name')] if name.endswith('_by_name') else name
+  return name in NODE_MUTATING_METHODS or name in PLACEMENT_MUTATING_METHODS
+
+
+def _copy(value: Any) -> Any:
+  # Cached lists are copied so that callers can not change the cache.
+  if isinstance(value, np.ndarray):
+    return value.copy()
+  return list(value) if isinstance(value, list) else value
+
 
 class PlacementCost(object):
   """PlacementCost object wrapper."""
@@ -35,6 +343,18 @@ class PlacementCost(object):
   BUFFER_LEN = 1024 * 1024
   MAX_RETRY = 10
 
+  _framed_protocol = False
+  _shared_buffer = None
+  _cache = None
+  # The result of get_cost_info, reset by the mutating calls.
+  _cost_info = None
+  _trace_writer = None
+  # The mutating calls to replay after a restart, None if disabled.
+  _journal = None
+  _recovering = False
+
+  _print_rpc_stats_registered = False
+
   def __init__(self,
                netlist_file: Text,
                macro_macro_x_spacing: float = 0.0,
@@ -42,7 +362,8 @@ class PlacementCost(object):
     """Creates a PlacementCost client object.
 
     It creates a subprocess by calling plc_wrapper_main and communicate with
-    it over an `AF_UNIX` channel.
+    it over an `AF_UNIX` channel. With --plc_warm_processes, the subprocess is
+    taken from the ones started ahead of time for the same netlist.
 
     Args:
       netlist_file: Path to the netlist proto text file.
@@ -51,67 +372,459 @@ class PlacementCost(object):
     """
     if not FLAGS.plc_wrapper_main:
       raise ValueError('FLAGS.plc_wrapper_main should be specified.')
+    if (FLAGS.plc_print_rpc_stats_at_exit and
+        not PlacementCost._print_rpc_stats_registered):
+      PlacementCost._print_rpc_stats_registered = True
+      atexit.register(_log_rpc_stats)
 
-    self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-    address = tempfile.NamedTemporaryFile().name
-    self.sock.bind(address)
-    self.sock.listen(1)
-    args = [
-        FLAGS.plc_wrapper_main,  #
-        '--uid=',
-        '--gid=',
-        f'--pipe_address={address}',
-        f'--netlist_file={netlist_file}',
-        f'--macro_macro_x_spacing={macro_macro_x_spacing}',
-        f'--macro_macro_y_spacing={macro_macro_y_spacing}',
-    ]
-    self.process = subprocess.Popen([str(a) for a in args])
-    self.conn, _ = self.sock.accept()
+    self._framed_protocol = FLAGS.plc_framed_protocol
+    self._frame_reader = plc_protocol.FrameReader(PlacementCost.BUFFER_LEN)
+    # Method name -> {args: result} for the CACHEABLE_METHODS.
+    self._cache = (
+        collections.defaultdict(dict) if FLAGS.plc_cache_queries else None)
+    # The flags are part of the key since they change the command line.
+    self._key = (netlist_file, macro_macro_x_spacing, macro_macro_y_spacing,
+                 FLAGS.plc_wrapper_main, FLAGS.plc_framed_protocol,
+                 FLAGS.plc_binary_arrays, FLAGS.plc_shared_memory_mb)
+    self.sock, self.process, self.conn, self._shared_buffer = (
+        _acquire_plc_wrapper_main(self._key))
+    if FLAGS.plc_max_recoveries > 0:
+      self._max_recoveries = FLAGS.plc_max_recoveries
+      self._journal = []
+      # The placement at the last checkpoint, restored after the calls of the
+      # journal made before it.
+      self._checkpoint = None
+      self._checkpoint_index = 0
+    if FLAGS.plc_record_traces_dir:
+      self.trace_file = os.path.join(
+          FLAGS.plc_record_traces_dir,
+          f'plc_{os.getpid()}_{next(_trace_ids)}.jsonl.gz')
+      logging.info('Recording the calls to plc_wrapper_main to %s.',
+                   self.trace_file)
+      self._trace_writer = plc_trace.TraceWriter(
+          self.trace_file, {
+              'netlist_file': netlist_file,
+              'framed_protocol': self._framed_protocol,
+              'cache_queries': self._cache is not None,
+          })
 
   # See circuit_training/environment/plc_client_test.py for the supported APIs.
   def __getattr__(self, name) -> Any:
-
+    method = name
     # snake_case to PascalCase.
-    name = name.replace('_', ' ').title().replace(' ', '')
+    name = plc_protocol.to_pascal_case(name)
 
     def f(*args) -> Any:
-      json_args = json.dumps({'name': name, 'args': args})
-      self.conn.send(json_args.encode('utf-8'))
-      json_ret = b''
-      retry = 0
-      # The stream from the unix socket can be incomplete after a single call
-      # to `recv` for large (200kb+) return values, e.g. GetMacroAdjacency. The
-      # loop retries until the returned value is valid json. When the host is
-      # under load ~10 retries have been needed. Adding a sleep did not seem to
-      # make a difference only added latency. b/210838186
-      while True:
-        part = self.conn.recv(PlacementCost.BUFFER_LEN)
-        json_ret += part
-        if len(part) < PlacementCost.BUFFER_LEN:
-          json_str = json_ret.decode('utf-8')
-          try:
-            output = json.loads(json_str)
-            break
-          except json.decoder.JSONDecodeError as e:
-            logging.warn('JSONDecode Error for %s \n %s', name, e)
-            if retry < PlacementCost.MAX_RETRY:
-              logging.info('Looking for more data for %s on connection:%s/%s',
-                           name, retry, PlacementCost.MAX_RETRY)
-              retry += 1
-            else:
-              raise e
-      if isinstance(output, dict):
-        if 'ok' in output and not output['ok']:  # Status::NotOk
-          raise ValueError(
-              f"Error in calling {name} with {args}: {output['message']}.")
-        elif '__tuple__' in output:  # Tuple
-          output = tuple(output['items'])
-      return output
+      if self._cache is None:
+        return self._call(name, args)
+      if method in _INVALIDATED_METHODS:
+        self._invalidate(method)
+      elif method in CACHEABLE_METHODS:
+        cache = self._cache[method]
+        if args not in cache:
+          cache[args] = self._call(name, args)
+        return _copy(cache[args])
+      return self._call(name, args)
 
     return f
 
+  def _call(self, name: Text, args: Sequence[Any]) -> Any:
+    """Calls `name` on plc_wrapper_main and returns the parsed reply."""
+    if name in _PASCAL_CASE_MUTATING_METHODS:
+      self._cost_info = None
+    output = self._send(name, plc_protocol.encode_request(name, args))
+    if self._journal is not None:
+      self._record_mutations([(name, args)])
+    return plc_protocol.parse_reply(name, args, output)
+
+  def _send(self, name: Text, request: bytes) -> Any:
+    """Sends the request, restarting plc_wrapper_main if it died."""
+    while True:
+      try:
+        return self._send_once(name, request)
+      except ConnectionError as e:
+        if (self._journal is None or self._recovering or
+            self._max_recoveries <= 0):
+          raise
+        self._max_recoveries -= 1
+        self._recover(e)
+
+  def _send_once(self, name: Text, request: bytes) -> Any:
+    """Sends the request, returns the decoded reply and records the stats."""
+    start = time.perf_counter()
+    unframed_request = request
+    if self._framed_protocol:
+      request = plc_protocol.encode_frame(request)
+      self.conn.sendall(request)
+      encoding, payload = self._frame_reader.read(self.conn)
+      response_bytes = plc_protocol.HEADER.size + len(payload)
+      output = plc_protocol.decode_payload(encoding, payload,
+                                           self._shared_buffer)
+    else:
+      self.conn.send(request)
+      output, response_bytes = self._recv_json(name)
+    seconds = time.perf_counter() - start
+    plc_stats.RPC_STATS.record(name, seconds, len(request), response_bytes)
+    if self._trace_writer is not None:
+      self._trace_writer.write(name, unframed_request, output, seconds)
+    return output
+
+  def call_many(self, calls: Sequence[Tuple[Text, Sequence[Any]]]) -> List[Any]:
+    """Calls several methods and returns their results in order.
+
+    With --plc_framed_protocol all the calls are sent as a single batch request
+    and answered with a single reply, i.e. one round trip for the whole list.
+    Otherwise they are issued one after another. With --plc_cache_queries the
+    calls with cached results are not sent.
+
+    Args:
+      calls: A sequence of (method name, args) pairs. Method names are the ones
+        used on this object, e.g. ('get_node_location', (node_index,)).
+
+    Returns:
+      The list of results, one per call.
+    """
+    if self._cache is None:
+      return self._call_many(calls)
+
+    # Looks the calls up in order, a mutating call invalidates the cached
+    # results for the calls after it.
+    results = [None] * len(calls)
+    misses = []
+    for i, (name, args) in enumerate(calls):
+      args = tuple(args)
+      if name in _INVALIDATED_METHODS:
+        self._invalidate(name)
+      elif name in CACHEABLE_METHODS and args in self._cache[name]:
+        results[i] = _copy(self._cache[name][args])
+        continue
+      misses.append(i)
+    if not misses:
+      return results
+
+    outputs = self._call_many([calls[i] for i in misses])
+    # Replays the invalidations, so that a result is not cached if a later
+    # call in the batch changed it.
+    for i, output in zip(misses, outputs):
+      name, args = calls[i]
+      results[i] = output
+      if name in _INVALIDATED_METHODS:
+        self._invalidate(name)
+      elif name in CACHEABLE_METHODS:
+        self._cache[name][tuple(args)] = _copy(output)
+    return results
+
+  def _call_many(self,
+                 calls: Sequence[Tuple[Text, Sequence[Any]]]) -> List[Any]:
+    calls = [(plc_protocol.to_pascal_case(name), list(args))
+             for name, args in calls]
+    if not self._framed_protocol:
+      return [self._call(name, args) for name, args in calls]
+    if not calls:
+      return []
+    if any(name in _PASCAL_CASE_MUTATING_METHODS for name, _ in calls):
+      self._cost_info = None
+    outputs = self._send(plc_protocol.BATCH_METHOD,
+                         plc_protocol.encode_batch_request(calls))
+    if self._journal is not None:
+      self._record_mutations(calls)
+    return [
+        plc_protocol.parse_reply(name, args, output)
+        for (name, args), output in zip(calls, outputs)
+    ]
+
+  def _record_mutations(self, calls: Sequence[Tuple[Text, Sequence[Any]]]):
+    """Adds the mutating calls (PascalCase names) to the recovery journal."""
+    if self._recovering:
+      return
+    for name, args in calls:
+      if name in _PASCAL_CASE_MUTATING_METHODS:
+        self._journal.append((_PASCAL_CASE_MUTATING_METHODS[name], list(args)))
+    if len(self._journal) - self._checkpoint_index > _MAX_JOURNAL_CALLS:
+      self.checkpoint()
+
+  def checkpoint(self) -> None:
+    """Shortens the calls replayed if plc_wrapper_main dies.
+
+    The calls that only change the placement are replaced by a snapshot of
+    the current placement. The last `restore_placement` is kept, it also sets
+    the canvas and the grid of its file header. Only with --plc_max_recoveries.
+    """
+    if self._journal is None:
+      return
+    last_restore = max(
+        (i for i, (name, _) in enumerate(self._journal)
+         if name == 'restore_placement'),
+        default=-1)
+    self._checkpoint = self.snapshot()
+    self._journal = [
+        call for i, call in enumerate(self._journal)
+        if i == last_restore or not _is_placement_mutation(call[0])
+    ]
+    self._checkpoint_index = len(self._journal)
+
+  def _recover(self, error: Exception) -> None:
+    """Restarts plc_wrapper_main and replays the journal."""
+    logging.warning(
+        'The connection to plc_wrapper_main failed (%s), restarting it and '
+        'replaying %d calls.', error, len(self._journal))
+    _stop_plc_wrapper_main(
+        (self.sock, self.process, self.conn, self._shared_buffer))
+    self.sock, self.process, self.conn, self._shared_buffer = (
+        _acquire_plc_wrapper_main(self._key))
+    self._frame_reader = plc_protocol.FrameReader(PlacementCost.BUFFER_LEN)
+    calls = self._journal[:self._checkpoint_index]
+    if self._checkpoint is not None:
+      calls += _restore_calls(self._checkpoint)
+    calls += self._journal[self._checkpoint_index:]
+    self._recovering = True
+    try:
+      self._call_many(calls)
+    finally:
+      self._recovering = False
+
+  def _invalidate(self, mutating_method: Text) -> None:
+    for method in _INVALIDATED_METHODS[mutating_method]:
+      self._cache.pop(method, None)
+
+  def clear_cache(self) -> None:
+    """Drops the cached query results, see --plc_cache_queries."""
+    if self._cache is not None:
+      self._cache.clear()
+
+  # Bulk accessors. Each one fetches a column for the given nodes, or for all
+  # the nodes, with a single call_many, i.e. in one round trip with
+  # --plc_framed_protocol. Without it the calls are still sent one by one, so
+  # callers should only pass the nodes they need.
+
+  def _query_nodes(self, name: Text,
+                   nodes: Optional[Sequence[int]]) -> List[Any]:
+    if nodes is None:
+      nodes = range(self.num_nodes())
+    return self.call_many([(name, (int(node),)) for node in nodes])
+
+  def node_types(self, nodes: Optional[Sequence[int]] = None) -> np.ndarray:
+    """Returns the types of the nodes, e.g. 'MACRO' or 'PORT'."""
+    return np.array(self._query_nodes('get_node_type', nodes), dtype=str)
+
+  def node_locations(self,
+                     nodes: Optional[Sequence[int]] = None) -> np.ndarray:
+    """Returns the (x, y) of the nodes as a [num_nodes, 2] array."""
+    locations = self._query_nodes('get_node_location', nodes)
+    return np.array(locations, dtype=np.float64).reshape(-1, 2)
+
+  def node_sizes(self, nodes: Optional[Sequence[int]] = None) -> np.ndarray:
+    """Returns the (width, height) of the nodes as a [num_nodes, 2] array."""
+    sizes = self._query_nodes('get_node_width_height', nodes)
+    return np.array(sizes, dtype=np.float64).reshape(-1, 2)
+
+  def grid_cells(self, nodes: Optional[Sequence[int]] = None) -> np.ndarray:
+    """Returns the grid cell index of the nodes."""
+    return np.array(
+        self._query_nodes('get_grid_cell_of_node', nodes), dtype=np.int64)
+
+  def placed_mask(self, nodes: Optional[Sequence[int]] = None) -> np.ndarray:
+    """Returns a bool array, True for the placed nodes."""
+    return np.array(self._query_nodes('is_node_placed', nodes), dtype=bool)
+
+  def fixed_mask(self, nodes: Optional[Sequence[int]] = None) -> np.ndarray:
+    """Returns a bool array, True for the fixed nodes."""
+    return np.array(self._query_nodes('is_node_fixed', nodes), dtype=bool)
+
+  def orientations(self,
+                   nodes: Optional[Sequence[int]] = None,
+                   node_types: Optional[np.ndarray] = None) -> np.ndarray:
+    """Returns the orientation of the macros, '' for the other nodes.
+
+    Args:
+      nodes: The nodes, all the nodes if None.
+      node_types: The result of `node_types()` for all the nodes, if the caller
+        has it. Otherwise the types of the nodes are fetched.
+    """
+    if node_types is None:
+      types = self.node_types(nodes)
+    else:
+      types = np.asarray(node_types)
+      if nodes is not None:
+        types = types[np.asarray(nodes, dtype=np.int64)]
+    nodes = (
+        np.arange(len(types))
+        if nodes is None else np.asarray(nodes, dtype=np.int64))
+    orientations = np.full(len(nodes), '', dtype=object)
+    macros = np.flatnonzero(types == 'MACRO')
+    orientations[macros] = self._query_nodes('get_macro_orientation',
+                                             nodes[macros])
+    return orientations.astype(str)
+
+  def fan_outs(
+      self,
+      nodes: Optional[Sequence[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the fan-outs of the nodes in CSR format.
+
+    Returns:
+      (indptr, indices): The fan-outs of the i-th node are
+      indices[indptr[i]:indptr[i + 1]].
+    """
+    fan_outs = self._query_nodes('get_fan_outs_of_node', nodes)
+    indptr = np.zeros(len(fan_outs) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(f) for f in fan_outs])
+    indices = np.array([i for f in fan_outs for i in f], dtype=np.int64)
+    return indptr, indices
+
+  def update_node_coords_bulk(self, nodes: Sequence[int],
+                              locations: Sequence[Tuple[float, float]]) -> bool:
+    """Moves the nodes to the (x, y) locations."""
+    return all(
+        self.call_many([('update_node_coords', (int(node), float(x), float(y)))
+                        for node, (x, y) in zip(nodes, locations)]))
+
+  def update_macro_orientation_bulk(self, nodes: Sequence[int],
+                                    orientations: Sequence[Text]) -> bool:
+    """Sets the orientations of the macros."""
+    return all(
+        self.call_many([('update_macro_orientation', (int(node), str(o)))
+                        for node, o in zip(nodes, orientations)]))
+
+  def get_cost_info(
+      self,
+      components: Optional[Sequence[Text]] = None) -> Dict[Text, float]:
+    """Returns the proxy cost components, see COST_INFO_METHODS.
+
+    The missing components are evaluated with a single call_many, and reused
+    until a mutating call changes the placement or the settings.
+
+    Args:
+      components: The components to return, all of them if None. The others
+        are not evaluated, e.g. congestion when its weight is 0.
+
+    Returns:
+      A dict from the component name to its cost.
+    """
+    components = list(COST_INFO_METHODS if components is None else components)
+    if self._cost_info is None:
+      self._cost_info = {}
+    missing = [name for name in components if name not in self._cost_info]
+    if missing:
+      values = self.call_many([(COST_INFO_METHODS[name], ()) for name in missing
+                              ])
+      self._cost_info.update(zip(missing, values))
+    return {name: self._cost_info[name] for name in components}
+
+  def snapshot(self,
+               nodes: Optional[Sequence[int]] = None) -> PlacementSnapshot:
+    """Returns the placement of the nodes except the macro pins.
+
+    The snapshot is taken with a single call_many, after fetching the node
+    types.
+
+    Args:
+      nodes: The nodes, all the nodes if None.
+    """
+    types = self.node_types()
+    if nodes is None:
+      nodes = np.flatnonzero(types != 'MACRO_PIN')
+    else:
+      nodes = np.asarray(nodes, dtype=np.int64)
+      nodes = nodes[types[nodes] != 'MACRO_PIN']
+    macros = nodes[types[nodes] == 'MACRO']
+    calls = []
+    for name in ('get_node_location', 'is_node_placed', 'is_node_fixed'):
+      calls.extend((name, (int(node),)) for node in nodes)
+    for name in ('get_macro_orientation', 'is_node_soft_macro'):
+      calls.extend((name, (int(node),)) for node in macros)
+    results = self.call_many(calls)
+    n, m = len(nodes), len(macros)
+    # Soft macros have no orientation to restore.
+    orientations = np.full(len(types), '', dtype=object)
+    orientations[macros] = np.where(results[3 * n + m:], '',
+                                    results[3 * n:3 * n + m])
+    return PlacementSnapshot(
+        nodes=nodes,
+        locations=np.array(results[:n], dtype=np.float64).reshape(-1, 2),
+        orientations=orientations[nodes].astype(str),
+        placed=np.array(results[n:2 * n], dtype=bool),
+        fixed=np.array(results[2 * n:3 * n], dtype=bool))
+
+  def restore(self, snapshot: PlacementSnapshot) -> None:
+    """Restores a snapshot with a single call_many."""
+    self.call_many(_restore_calls(snapshot))
+
+  def _recv_json(self, name: Text) -> Tuple[Any, int]:
+    """Reads an unframed reply until it parses as JSON, returns its size."""
+    json_ret = b''
+    retry = 0
+    # The stream from the unix socket can be incomplete after a single call
+    # to `recv` for large (200kb+) return values, e.g. GetMacroAdjacency. The
+    # loop retries until the returned value is valid json. When the host is
+    # under load ~10 retries have been needed. Adding a sleep did not seem to
+    # make a difference only added latency. b/210838186
+    # The framed protocol (--plc_framed_protocol) avoids this entirely.
+    while True:
+      part = self.conn.recv(PlacementCost.BUFFER_LEN)
+      if not part:
+        raise ConnectionError('The connection to plc_wrapper_main is closed.')
+      json_ret += part
+      if len(part) < PlacementCost.BUFFER_LEN:
+        json_str = json_ret.decode('utf-8')
+        try:
+          return json.loads(json_str), len(json_ret)
+        except json.decoder.JSONDecodeError as e:
+          logging.warn('JSONDecode Error for %s \n %s', name, e)
+          plc_stats.RPC_STATS.record_json_retry(name)
+          if retry < PlacementCost.MAX_RETRY:
+            logging.info('Looking for more data for %s on connection:%s/%s',
+                         name, retry, PlacementCost.MAX_RETRY)
+            retry += 1
+          else:
+            raise e
+
+  def __del__(self) -> None:
+    if self._trace_writer is not None:
+      self._trace_writer.close()
+    _stop_plc_wrapper_main(
+        (self.sock, self.process, self.conn, self._shared_buffer))
+
+
+class ReplayPlacementCost(PlacementCost):
+  """Answers the calls of a PlacementCost from a trace, see plc_trace.
+
+  The calls should be the ones that were recorded, in the same order, e.g. by
+  running the recorded code with the same inputs. The Python side of the
+  client (batching, caching, parsing of the replies) runs as it did when
+  recording, so the replay can be used to benchmark and test it without
+  plc_wrapper_main.
+  """
+
+  def __init__(self, trace_file: Text, simulate_latency: bool = False) -> None:
+    """Loads a trace.
+
+    Args:
+      trace_file: A trace recorded with --plc_record_traces_dir.
+      simulate_latency: If True, each call sleeps for the recorded latency.
+    """
+    header, records = plc_trace.read_trace(trace_file)
+    self.netlist_file = header['netlist_file']
+    self._framed_protocol = header['framed_protocol']
+    self._cache = (
+        collections.defaultdict(dict) if header['cache_queries'] else None)
+    self._records = collections.deque(records)
+    self._simulate_latency = simulate_latency
+
+  def _send(self, name: Text, request: bytes) -> Any:
+    if not self._records:
+      raise ValueError(f'The trace has no more calls, got {name}.')
+    record = self._records.popleft()
+    request = request.decode('utf-8')
+    if record['name'] != name or record['request'] != request:
+      raise ValueError(f'The call does not match the trace: got {request}, '
+                       f'expected {record["request"]}.')
+    if self._simulate_latency:
+      time.sleep(record['seconds'])
+    return record['output']
+
+  def num_remaining_calls(self) -> int:
+    """Returns the number of recorded calls that were not replayed yet."""
+    return len(self._records)
+
   def __del__(self) -> None:
-    self.conn.close()
-    self.process.kill()
-    self.process.wait()
-    self.sock.close()
+    pass
@@ -14,10 +14,19 @@
 # limitations under the License.
 """Tests for plc_client."""
 
+import json
 import os
+import re
+import socket
+import threading
+from unittest import mock
 
 from absl import flags
+from absl.testing import flagsaver
+from circuit_training.environment import placement_util
 from circuit_training.environment import plc_client
+from circuit_training.environment import plc_numpy
+from circuit_training.environment import plc_stats
 from circuit_training.utils import test_utils
 
 FLAGS = flags.FLAGS
@@ -426,6 +435,96 @@ MACRO_ADJACENCY = [
 ]
 
 
+class _FakeProcess(object):
+  """Answers unframed requests with the NumPy backend, on a thread."""
+
+  def __init__(self, netlist_file, conn):
+    self._conn = conn
+    self._plc = plc_numpy.PlacementCost(netlist_file)
+    threading.Thread(target=self._serve, daemon=True).start()
+
+  def _run(self, request):
+    name = re.sub(r'(?<!^)(?=[A-Z])', '_', request['name']).lower()
+    output = getattr(self._plc, name)(*request['args'])
+    if isinstance(output, tuple):
+      return {'__tuple__': True, 'items': list(output)}
+    return output
+
+  def _serve(self):
+    try:
+      while True:
+        request = json.loads(self._conn.recv(1024 * 1024))
+        self._conn.sendall(json.dumps(self._run(request)).encode('utf-8'))
+    except (OSError, ValueError):
+      return
+
+  def kill(self):
+    self._conn.close()
+
+  def wait(self):
+    pass
+
+
+def _start_fake_process(key):
+  client, server = socket.socketpair()
+  return client, _FakeProcess(key[0], server), client, None
+
+
+# The per-type loops that the placement_util helpers replaced, as the baseline
+# of their number of calls.
+
+
+def _baseline_get_node_xy_coordinates(plc):
+  node_coords = dict()
+  for node_index in placement_util.nodes_of_types(plc,
+                                                  ['MACRO', 'STDCELL', 'PORT']):
+    if plc.is_node_placed(node_index):
+      node_coords[node_index] = plc.get_node_location(node_index)
+  return node_coords
+
+
+def _baseline_get_macro_orientations(plc):
+  macro_orientations = dict()
+  for node_index in placement_util.nodes_of_types(plc, ['MACRO']):
+    macro_orientations[node_index] = plc.get_macro_orientation(node_index)
+  return macro_orientations
+
+
+def _baseline_get_node_locations(plc):
+  node_locations = dict()
+  for i in placement_util.nodes_of_types(plc, ['MACRO', 'STDCELL']):
+    node_locations[i] = plc.get_grid_cell_of_node(i)
+  return node_locations
+
+
+def _baseline_get_node_ordering_by_size(plc):
+  node_areas = dict()
+  for i in placement_util.nodes_of_types(plc, ['MACRO', 'STDCELL']):
+    if plc.is_node_fixed(i):
+      continue
+    w, h = plc.get_node_width_height(i)
+    node_areas[i] = w * h
+  return sorted(node_areas, key=node_areas.get, reverse=True)
+
+
+def _baseline_restore_node_xy_coordinates(plc, node_coords):
+  for node_index, coords in node_coords.items():
+    if not plc.is_node_fixed(node_index):
+      plc.update_node_coords(node_index, coords[0], coords[1])
+
+
+def _baseline_disconnect_high_fanout_nets(plc, max_allowed_fanouts=500):
+  high_fanout_nets = []
+  for i in placement_util.nodes_of_types(plc, ['PORT', 'STDCELL', 'MACRO_PIN']):
+    if len(plc.get_fan_outs_of_node(i)) > max_allowed_fanouts:
+      high_fanout_nets.append(i)
+  plc.disconnect_nets(high_fanout_nets)
+
+
+def _num_calls():
+  return sum(s['count'] for s in plc_stats.RPC_STATS.snapshot().values())
+
+
 class PlcClientTest(test_utils.TestCase):
   """Tests for the PlcClient.
 
@@ -571,6 +670,265 @@ class PlcClientTest(test_utils.TestCase):
     self.assertTrue(plc.save_placement(initial_placement, 'Info'))
     self.assertTrue(os.path.exists(initial_placement))
 
+  def test_bulk_accessors(self):
+    netlist_file = os.path.join(FLAGS.test_srcdir,
+                                'circuit_training/environment/test_data/'
+                                'sample_clustered/netlist.pb.txt')
+    plc = plc_client.PlacementCost(netlist_file)
+    nodes = range(plc.num_nodes())
+    self.assertEqual(plc.node_types().tolist(),
+                     [plc.get_node_type(i) for i in nodes])
+    self.assertEqual(plc.node_locations().tolist(),
+                     [list(plc.get_node_location(i)) for i in nodes])
+    self.assertEqual(plc.node_sizes().tolist(),
+                     [list(plc.get_node_width_height(i)) for i in nodes])
+    self.assertEqual(plc.grid_cells().tolist(),
+                     [plc.get_grid_cell_of_node(i) for i in nodes])
+    self.assertEqual(plc.placed_mask().tolist(),
+                     [plc.is_node_placed(i) for i in nodes])
+    self.assertEqual(plc.fixed_mask().tolist(),
+                     [plc.is_node_fixed(i) for i in nodes])
+    self.assertEqual(plc.orientations()[[2, 3]].tolist(),
+                     [plc.get_macro_orientation(2),
+                      plc.get_macro_orientation(3)])
+    indptr, indices = plc.fan_outs()
+    self.assertEqual(indices[indptr[0]:indptr[1]].tolist(),
+                     plc.get_fan_outs_of_node(0))
+
+    self.assertTrue(
+        plc.update_node_coords_bulk([2, 3], [(100.0, 110.0), (200.0, 210.0)]))
+    self.assertEqual(plc.get_node_location(3), (200.0, 210.0))
+    self.assertTrue(plc.update_macro_orientation_bulk([2], ['FN']))
+    self.assertEqual(plc.get_macro_orientation(2), 'FN')
+
+  def test_snapshot_restore(self):
+    netlist_file = os.path.join(FLAGS.test_srcdir,
+                                'circuit_training/environment/test_data/'
+                                'sample_clustered/netlist.pb.txt')
+    plc = plc_client.PlacementCost(netlist_file)
+    plc.update_node_coords(2, 100.0, 110.0)
+    plc.update_macro_orientation(2, 'FN')
+    snapshot = plc.snapshot()
+    plc.update_node_coords(2, 200.0, 210.0)
+    plc.update_macro_orientation(2, 'S')
+    plc.unplace_node(3)
+    plc.restore(snapshot)
+    self.assertEqual(plc.get_node_location(2), (100.0, 110.0))
+    self.assertEqual(plc.get_macro_orientation(2), 'FN')
+    self.assertTrue(plc.is_node_placed(3))
+
+  @flagsaver.flagsaver(plc_cache_queries=True)
+  def test_cache_queries(self):
+    netlist_file = os.path.join(FLAGS.test_srcdir,
+                                'circuit_training/environment/test_data/'
+                                'sample_clustered/netlist.pb.txt')
+    plc = plc_client.PlacementCost(netlist_file)
+    self.assertEqual(plc.get_macro_indices(), [2, 3, 8])
+    self.assertEqual(plc._cache['get_macro_indices'][()], [2, 3, 8])
+    # The cached list can not be changed by the caller.
+    plc.get_macro_indices().append(0)
+    self.assertEqual(plc.get_macro_indices(), [2, 3, 8])
+
+    width, height = plc.get_node_width_height(8)
+    self.assertNotEqual(width, height)
+    plc.make_soft_macros_square()
+    width, height = plc.get_node_width_height(8)
+    self.assertAlmostEqual(width, height)
+
+    canvas_size = plc.get_canvas_width_height()
+    self.assertEqual(
+        plc.call_many([
+            ('get_canvas_width_height', ()),
+            ('set_canvas_size', (300.0, 300.0)),
+            ('get_canvas_width_height', ()),
+            ('get_node_type', (2,)),
+        ]), [canvas_size, True, (300.0, 300.0), 'MACRO'])
+    self.assertEqual(plc.get_canvas_width_height(), (300.0, 300.0))
+
+    self.assertFalse(plc.is_node_fixed(2))
+    self.assertTrue(plc.fix_node_coord(2))
+    self.assertTrue(plc.is_node_fixed(2))
+
+    plc.clear_cache()
+    self.assertEmpty(plc._cache)
+
+  @flagsaver.flagsaver(plc_cache_queries=True)
+  def test_cache_restore_placement(self):
+    self.enter_context(
+        mock.patch.object(plc_client, '_acquire_plc_wrapper_main',
+                          side_effect=_start_fake_process))
+    test_data_dir = os.path.join(FLAGS.test_srcdir,
+                                 'circuit_training/environment/test_data/'
+                                 'sample_clustered')
+    with open(os.path.join(test_data_dir, 'netlist.pb.txt')) as f:
+      netlist = f.read()
+    # M0 (node 2) is 80x120, so that its size depends on its orientation.
+    m0 = netlist.index('name: "M0"')
+    width = netlist.index('f: 120', netlist.index('key: "width"', m0))
+    netlist_file = self.create_tempfile(
+        content=netlist[:width] + 'f: 80' + netlist[width + len('f: 120'):])
+    plc = plc_client.PlacementCost(netlist_file.full_path)
+
+    self.assertEqual(plc.get_node_width_height(2), (80.0, 120.0))
+    self.assertTrue(plc.update_macro_orientation(2, 'E'))
+    self.assertEqual(plc.get_node_width_height(2), (120.0, 80.0))
+    plc.get_canvas_width_height()
+    plc.get_grid_num_columns_rows()
+    self.assertFalse(plc.is_node_fixed(0))
+    # The file restores the N orientation and the fixed ports.
+    self.assertTrue(
+        plc.restore_placement(os.path.join(test_data_dir, 'initial.plc')))
+    self.assertNotIn('get_canvas_width_height', plc._cache)
+    self.assertNotIn('get_grid_num_columns_rows', plc._cache)
+    self.assertEqual(plc.get_node_width_height(2), (80.0, 120.0))
+    self.assertTrue(plc.is_node_fixed(0))
+
+  @flagsaver.flagsaver
+  def test_record_and_replay(self):
+    FLAGS.plc_record_traces_dir = self.create_tempdir().full_path
+    netlist_file = os.path.join(FLAGS.test_srcdir,
+                                'circuit_training/environment/test_data/'
+                                'sample_clustered/netlist.pb.txt')
+
+    def run(plc):
+      plc.update_node_coords(2, 100.0, 110.0)
+      return [plc.get_node_location(2), plc.get_cost(), plc.snapshot().fixed]
+
+    plc = plc_client.PlacementCost(netlist_file)
+    expected = run(plc)
+    trace_file = plc.trace_file
+    del plc
+    replay = plc_client.ReplayPlacementCost(trace_file)
+    results = run(replay)
+    self.assertEqual(results[:2], expected[:2])
+    self.assertEqual(results[2].tolist(), expected[2].tolist())
+    self.assertEqual(replay.num_remaining_calls(), 0)
+
+  @flagsaver.flagsaver(plc_max_recoveries=2)
+  def test_recovery(self):
+    self.enter_context(
+        mock.patch.object(plc_client, '_acquire_plc_wrapper_main',
+                          side_effect=_start_fake_process))
+    netlist_file = os.path.join(FLAGS.test_srcdir,
+                                'circuit_training/environment/test_data/'
+                                'sample_clustered/netlist.pb.txt')
+    plc = plc_client.PlacementCost(netlist_file)
+    plc.set_canvas_size(300.0, 300.0)
+    plc.update_node_coords(2, 100.0, 110.0)
+    plc.call_many([('unplace_node', (3,)), ('fix_node_coord', (2,))])
+
+    def assert_state():
+      self.assertEqual(plc.get_canvas_width_height(), (300.0, 300.0))
+      self.assertEqual(plc.get_node_location(2), (100.0, 110.0))
+      self.assertTrue(plc.is_node_fixed(2))
+      self.assertFalse(plc.is_node_placed(3))
+
+    plc.process.kill()
+    assert_state()
+    # The placement calls are replaced by a snapshot.
+    plc.checkpoint()
+    self.assertEqual(plc._journal, [('set_canvas_size', [300.0, 300.0])])
+    plc.process.kill()
+    assert_state()
+    # No recoveries left.
+    plc.process.kill()
+    with self.assertRaises(ConnectionError):
+      plc.get_cost()
+
+  @flagsaver.flagsaver(plc_max_recoveries=1)
+  def test_recovery_after_restore_placement(self):
+    self.enter_context(
+        mock.patch.object(plc_client, '_acquire_plc_wrapper_main',
+                          side_effect=_start_fake_process))
+    test_data_dir = os.path.join(FLAGS.test_srcdir,
+                                 'circuit_training/environment/test_data/'
+                                 'sample_clustered')
+    plc = plc_client.PlacementCost(
+        os.path.join(test_data_dir, 'netlist.pb.txt'))
+    plc.set_placement_grid(5, 5)
+    # Sets the canvas and the grid of the file header.
+    plc.restore_placement(os.path.join(test_data_dir, 'initial.plc'))
+    plc.update_node_coords(2, 100.0, 110.0)
+    plc.checkpoint()
+    self.assertEqual(plc._journal, [
+        ('set_placement_grid', [5, 5]),
+        ('restore_placement', [os.path.join(test_data_dir, 'initial.plc')]),
+    ])
+    plc.process.kill()
+    # Queried with call_many, the cached sizes would hide a bad recovery.
+    self.assertEqual(
+        plc.call_many([('get_node_location', (2,)),
+                       ('get_grid_cell_of_node', (3,)),
+                       ('is_node_fixed', (0,))]), [(100.0, 110.0), 3, True])
+
+  def test_cost_info(self):
+    self.enter_context(
+        mock.patch.object(plc_client, '_acquire_plc_wrapper_main',
+                          side_effect=_start_fake_process))
+    netlist_file = os.path.join(FLAGS.test_srcdir,
+                                'circuit_training/environment/test_data/'
+                                'sample_clustered/netlist.pb.txt')
+    plc = plc_client.PlacementCost(netlist_file)
+    expected = plc_numpy.PlacementCost(netlist_file)
+    plc_stats.RPC_STATS.reset()
+    self.assertEqual(plc.get_cost_info(), expected.get_cost_info())
+    plc.get_cost_info()
+    # The second call is answered from the cache.
+    self.assertEqual(plc_stats.RPC_STATS.snapshot()['GetCost']['count'], 1)
+
+    plc.call_many([('update_node_coords', (2, 100.0, 110.0))])
+    expected.update_node_coords(2, 100.0, 110.0)
+    self.assertEqual(plc.get_cost_info(), expected.get_cost_info())
+    self.assertEqual(plc_stats.RPC_STATS.snapshot()['GetCost']['count'], 2)
+
+    # Only the requested components are evaluated.
+    plc.call_many([('update_node_coords', (2, 120.0, 110.0))])
+    expected.update_node_coords(2, 120.0, 110.0)
+    plc_stats.RPC_STATS.reset()
+    self.assertEqual(
+        plc.get_cost_info(['wirelength']),
+        {'wirelength': expected.get_cost()})
+    self.assertEqual(
+        plc.get_cost_info(['wirelength', 'density']),
+        expected.get_cost_info(['wirelength', 'density']))
+    stats = plc_stats.RPC_STATS.snapshot()
+    self.assertEqual(stats['GetCost']['count'], 1)
+    self.assertEqual(stats['GetDensityCost']['count'], 1)
+    self.assertNotIn('GetCongestionCost', stats)
+
+  def test_bulk_helpers_calls(self):
+    self.enter_context(
+        mock.patch.object(plc_client, '_acquire_plc_wrapper_main',
+                          side_effect=_start_fake_process))
+    netlist_file = os.path.join(FLAGS.test_srcdir,
+                                'circuit_training/environment/test_data/'
+                                'sample_clustered/netlist.pb.txt')
+    plc = plc_client.PlacementCost(netlist_file)
+    plc.restore_placement(
+        os.path.join(FLAGS.test_srcdir, 'circuit_training/environment/'
+                     'test_data/sample_clustered/initial.plc'))
+    node_coords = placement_util.get_node_xy_coordinates(plc)
+    for helper, baseline in (
+        (placement_util.get_node_xy_coordinates,
+         _baseline_get_node_xy_coordinates),
+        (placement_util.get_macro_orientations,
+         _baseline_get_macro_orientations),
+        (placement_util.get_node_locations, _baseline_get_node_locations),
+        (placement_util.get_node_ordering_by_size,
+         _baseline_get_node_ordering_by_size),
+        (lambda plc: placement_util.restore_node_xy_coordinates(
+            plc, node_coords),
+         lambda plc: _baseline_restore_node_xy_coordinates(plc, node_coords)),
+        (placement_util.disconnect_high_fanout_nets,
+         _baseline_disconnect_high_fanout_nets),
+    ):
+      plc_stats.RPC_STATS.reset()
+      expected = baseline(plc)
+      baseline_calls = _num_calls()
+      plc_stats.RPC_STATS.reset()
+      self.assertEqual(helper(plc), expected)
+      self.assertLessEqual(_num_calls(), baseline_calls, msg=baseline.__name__)
+
 
 if __name__ == '__main__':
   test_utils.main()
@@ -0,0 +1,1068 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A pure NumPy implementation of the PlacementCost interface.
+
+`PlacementCost` in this module runs in-process and does not need the
+plc_wrapper_main binary. Nodes and nets are stored as arrays, so the proxy
+costs and placement masks are computed with vectorized NumPy operations:
+
+  - Wirelength is the weighted half perimeter wirelength (HPWL) of all nets.
+  - Density is the occupied area of each grid cell over its area.
+  - Congestion uses RUDY (rectangular uniform wire density) to spread the
+    wires of each net over its bounding box, smooths it over the neighboring
+    rows/columns and adds the routing resources used by hard macros.
+  - Node masks are computed geometrically from the canvas, the placed hard
+    macros (with the macro-to-macro spacing) and the blockages.
+
+Wirelength, density, node masks and the hard/soft macro classification agree
+with plc_wrapper_main on the netlists of test_data (see plc_numpy_test).
+Congestion is only approximate: RUDY is not the routing estimate of
+plc_wrapper_main, and the costs differ by up to ~15%. Use the binary when the
+exact congestion matters.
+
+See plc_client.PlacementCost and docs/PLACEMENT_COST.md for the interface.
+"""
+
+import datetime
+import math
+import re
+from typing import Any, Dict, List, Optional, Sequence, Text, Tuple, Union
+
+from circuit_training.environment import plc_client
+import numpy as np
+
+# Canvas utilization used to pick a square canvas when the netlist does not
+# specify its size.
+_DEFAULT_CANVAS_UTILIZATION = 0.6
+_DEFAULT_GRID_SIZE = 10
+
+# Fraction of the most dense/congested grid cells averaged by the costs.
+_DENSITY_TOP_FRACTION = 0.1
+_CONGESTION_TOP_FRACTION = 0.1
+
+_ORIENTATIONS = ('N', 'S', 'E', 'W', 'FN', 'FS', 'FE', 'FW')
+_ORIENTATION_INDEX = {o: i for i, o in enumerate(_ORIENTATIONS)}
+# Transforms of the pin offsets, relative to the 'N' orientation.
+_ORIENTATION_TRANSFORMS = np.array([
+    [[1, 0], [0, 1]],  # N
+    [[-1, 0], [0, -1]],  # S
+    [[0, 1], [-1, 0]],  # E
+    [[0, -1], [1, 0]],  # W
+    [[-1, 0], [0, 1]],  # FN
+    [[1, 0], [0, -1]],  # FS
+    [[0, 1], [1, 0]],  # FE
+    [[0, -1], [-1, 0]],  # FW
+], dtype=np.float64)
+# Orientations that swap the width and height of a macro.
+_IS_ROTATED = np.array([o in ('E', 'W', 'FE', 'FW') for o in _ORIENTATIONS])
+
+_NODE_TYPES = {
+    'MACRO': 'MACRO',
+    'MACRO_PIN': 'MACRO_PIN',
+    'PORT': 'PORT',
+    'STDCELL': 'STDCELL',
+}
+
+NodeId = Union[int, Text]
+
+
+def _unquote(value: Text) -> Text:
+  value = value.strip()
+  if len(value) >= 2 and value[0] == value[-1] == '"':
+    return value[1:-1]
+  return value
+
+
+def read_netlist(netlist_file: Text) -> List[Dict[Text, Any]]:
+  """Reads the nodes of a netlist proto text file.
+
+  Args:
+    netlist_file: Path to the netlist proto text file.
+
+  Returns:
+    A list of nodes, each a dict with 'name', 'inputs' and 'attrs' keys.
+  """
+  nodes = []
+  node = None
+  key = None
+  with open(netlist_file, 'rt') as f:
+    for line in f:
+      line = line.strip()
+      if line.startswith('node {'):
+        node = {'name': '', 'inputs': [], 'attrs': {}}
+        nodes.append(node)
+      elif node is None:
+        continue
+      elif line.startswith('name:'):
+        node['name'] = _unquote(line[len('name:'):])
+      elif line.startswith('input:'):
+        node['inputs'].append(_unquote(line[len('input:'):]))
+      elif line.startswith('key:'):
+        key = _unquote(line[len('key:'):])
+      elif line.startswith(('placeholder:', 's:')):
+        node['attrs'][key] = _unquote(line.split(':', 1)[1])
+      elif line.startswith(('f:', 'i:')):
+        node['attrs'][key] = float(line.split(':', 1)[1])
+  return nodes
+
+
+def _is_soft_macro(node: Dict[Text, Any]) -> bool:
+  """Returns True if a macro of read_netlist is a soft macro.
+
+  The netlist format has no attribute that marks soft macros. A macro with the
+  'MACRO' type or an orientation is hard, soft macros (clusters of standard
+  cells) have neither. Macros without these attributes, e.g. the 'macro' nodes
+  of macro_tiles_10x10, are soft if their name starts with 'Grp', like in
+  plc_wrapper_main (see docs/NETLIST_FORMAT.md).
+
+  Args:
+    node: A node of read_netlist, of the 'MACRO' type.
+  """
+  attrs = node['attrs']
+  if attrs.get('type') == 'MACRO' or 'orientation' in attrs:
+    return False
+  return node['name'].startswith('Grp')
+
+
+def _select(nodes: Optional[Sequence[int]]) -> Union[slice, np.ndarray]:
+  """Returns the index of the nodes in the arrays of all the nodes."""
+  return slice(None) if nodes is None else np.asarray(nodes, dtype=np.int64)
+
+
+def _overlaps(lo: np.ndarray, hi: np.ndarray, edges: np.ndarray) -> np.ndarray:
+  """Returns the overlap of each [lo, hi] interval with each bin of edges."""
+  return np.clip(
+      np.minimum(edges[1:], hi[:, None]) - np.maximum(edges[:-1], lo[:, None]),
+      0, None)
+
+
+def _top_average(values: np.ndarray, fraction: float) -> float:
+  """Returns the average of the given fraction of the largest values."""
+  values = np.asarray(values).ravel()
+  if not values.size:
+    return 0.0
+  count = max(int(math.floor(values.size * fraction)), 1)
+  return float(np.mean(np.partition(values, values.size - count)[-count:]))
+
+
+def _smooth(values: np.ndarray, smooth_range: int, axis: int) -> np.ndarray:
+  """Spreads each value evenly over its neighbors along the axis."""
+  smooth_range = int(smooth_range)
+  if smooth_range <= 0:
+    return values
+  values = np.moveaxis(values, axis, -1)
+  n = values.shape[-1]
+  index = np.arange(n)
+  counts = (np.minimum(index + smooth_range, n - 1) -
+            np.maximum(index - smooth_range, 0) + 1)
+  scaled = values / counts
+  smoothed = np.zeros_like(values)
+  for offset in range(-smooth_range, smooth_range + 1):
+    if offset >= 0:
+      smoothed[..., offset:] += scaled[..., :n - offset]
+    else:
+      smoothed[..., :offset] += scaled[..., -offset:]
+  return np.moveaxis(smoothed, -1, axis)
+
+
+class PlacementCost(object):
+  """In-process PlacementCost backed by NumPy arrays."""
+
+  def __init__(self,
+               netlist_file: Text,
+               macro_macro_x_spacing: float = 0.0,
+               macro_macro_y_spacing: float = 0.0) -> None:
+    """Creates a PlacementCost object from a netlist.
+
+    Args:
+      netlist_file: Path to the netlist proto text file.
+      macro_macro_x_spacing: Macro-to-macro x spacing in microns.
+      macro_macro_y_spacing: Macro-to-macro y spacing in microns.
+    """
+    self._netlist_file = netlist_file
+    self._macro_macro_x_spacing = macro_macro_x_spacing
+    self._macro_macro_y_spacing = macro_macro_y_spacing
+    self._load_nodes(read_netlist(netlist_file))
+    self._build_nets()
+
+    side = math.sqrt(max(self.get_area(), 1.0) / _DEFAULT_CANVAS_UTILIZATION)
+    self._canvas_width = side
+    self._canvas_height = side
+    self._num_columns = _DEFAULT_GRID_SIZE
+    self._num_rows = _DEFAULT_GRID_SIZE
+    self._blockages = []
+    self._project_name = ''
+    self._block_name = ''
+    self._routes_per_micron = (70.33, 74.51)
+    self._macro_routing_allocation = (51.79, 51.79)
+    self._congestion_smooth_range = 2
+    self._overlap_threshold = 4e-3
+    self._canvas_boundary_check = False
+    self._use_incremental_cost = False
+    self._hard_macros_over_std_cells = False
+
+  def _load_nodes(self, nodes: List[Dict[Text, Any]]) -> None:
+    """Stores the parsed nodes as arrays."""
+    n = len(nodes)
+    self._names = [node['name'] for node in nodes]
+    self._name_to_index = {name: i for i, name in enumerate(self._names)}
+    self._types = []
+    self._sides = []
+    self._width = np.zeros(n)
+    self._height = np.zeros(n)
+    self._x = np.zeros(n)
+    self._y = np.zeros(n)
+    self._x_offset = np.zeros(n)
+    self._y_offset = np.zeros(n)
+    self._weight = np.ones(n)
+    self._placed = np.zeros(n, dtype=bool)
+    self._fixed = np.zeros(n, dtype=bool)
+    self._orientation = np.zeros(n, dtype=np.int32)
+    self._ref = np.full(n, -1, dtype=np.int64)
+    for i, node in enumerate(nodes):
+      attrs = node['attrs']
+      node_type = _NODE_TYPES.get(str(attrs.get('type', '')).upper())
+      if node_type is None:
+        raise ValueError(f'Unknown type of node {node["name"]}: '
+                         f'{attrs.get("type")}.')
+      self._types.append(node_type)
+      self._sides.append(attrs.get('side', ''))
+      self._width[i] = attrs.get('width', 0.0)
+      self._height[i] = attrs.get('height', 0.0)
+      self._x_offset[i] = attrs.get('x_offset', 0.0)
+      self._y_offset[i] = attrs.get('y_offset', 0.0)
+      self._weight[i] = attrs.get('weight', 1.0)
+      if 'x' in attrs and 'y' in attrs:
+        self._x[i] = attrs['x']
+        self._y[i] = attrs['y']
+        self._placed[i] = True
+      orientation = attrs.get('orientation', 'N')
+      if orientation in _ORIENTATION_INDEX:
+        self._orientation[i] = _ORIENTATION_INDEX[orientation]
+    types = np.array(self._types)
+    self._is_macro = types == 'MACRO'
+    self._is_soft = self._is_macro & np.array(
+        [_is_soft_macro(node) for node in nodes], dtype=bool)
+    self._is_hard = self._is_macro & ~self._is_soft
+    self._is_stdcell = types == 'STDCELL'
+    self._is_port = types == 'PORT'
+    self._is_pin = types == 'MACRO_PIN'
+    for i in np.flatnonzero(self._is_pin):
+      macro_name = nodes[i]['attrs'].get('macro_name', '')
+      if macro_name not in self._name_to_index:
+        raise ValueError(f'Unknown macro {macro_name} of pin {self._names[i]}.')
+      self._ref[i] = self._name_to_index[macro_name]
+    self._macro_indices = np.flatnonzero(self._is_macro)
+
+    # Pin offsets and macro sizes are given in the orientation of the netlist,
+    # store them relative to the 'N' orientation.
+    pins = np.flatnonzero(self._is_pin)
+    transforms = _ORIENTATION_TRANSFORMS[self._orientation[self._ref[pins]]]
+    offsets = np.stack([self._x_offset[pins], self._y_offset[pins]], axis=-1)
+    offsets = np.einsum('pji,pj->pi', transforms, offsets)
+    self._x_offset[pins] = offsets[:, 0]
+    self._y_offset[pins] = offsets[:, 1]
+    rotated = self._is_hard & _IS_ROTATED[self._orientation]
+    self._width[rotated], self._height[rotated] = (self._height[rotated],
+                                                   self._width[rotated])
+
+    self._fan_outs = []
+    for node in nodes:
+      fan_outs = []
+      for name in node['inputs']:
+        if name not in self._name_to_index:
+          raise ValueError(f'Unknown input {name} of node {node["name"]}.')
+        fan_outs.append(self._name_to_index[name])
+      self._fan_outs.append(fan_outs)
+
+  def _build_nets(self) -> None:
+    """Builds the nets, each a driver followed by its fan-outs, as arrays."""
+    drivers = [i for i, fan_outs in enumerate(self._fan_outs) if fan_outs]
+    pins = []
+    starts = []
+    for driver in drivers:
+      starts.append(len(pins))
+      pins.append(driver)
+      pins.extend(self._fan_outs[driver])
+    self._net_driver = np.asarray(drivers, dtype=np.int64)
+    self._net_start = np.asarray(starts, dtype=np.int64)
+    self._net_pins = np.asarray(pins, dtype=np.int64)
+    self._net_of_pin = np.repeat(
+        np.arange(len(drivers)),
+        np.diff(np.append(self._net_start, len(pins))))
+    self._net_weight = self._weight[self._net_driver]
+
+  def _index(self, node: NodeId) -> int:
+    """Returns the index of a node given by index or name."""
+    if isinstance(node, str):
+      if node not in self._name_to_index:
+        raise ValueError(f'Unknown node name: {node}.')
+      return self._name_to_index[node]
+    node = int(node)
+    if node < 0 or node >= len(self._names):
+      raise ValueError(f'Node index out of range: {node}.')
+    return node
+
+  def call_many(self, calls: Sequence[Tuple[Text, Sequence[Any]]]) -> List[Any]:
+    """Calls several methods and returns their results in order."""
+    return [getattr(self, name)(*args) for name, args in calls]
+
+  # Geometry.
+
+  def _grid_cell_size(self) -> Tuple[float, float]:
+    return (self._canvas_width / self._num_columns,
+            self._canvas_height / self._num_rows)
+
+  def _grid_edges(self) -> Tuple[np.ndarray, np.ndarray]:
+    return (np.linspace(0.0, self._canvas_width, self._num_columns + 1),
+            np.linspace(0.0, self._canvas_height, self._num_rows + 1))
+
+  def _grid_centers(self) -> Tuple[np.ndarray, np.ndarray]:
+    grid_width, grid_height = self._grid_cell_size()
+    return ((np.arange(self._num_columns) + 0.5) * grid_width,
+            (np.arange(self._num_rows) + 0.5) * grid_height)
+
+  def _node_sizes(self) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the width and height of all nodes in their orientation."""
+    rotated = self._is_hard & _IS_ROTATED[self._orientation]
+    return (np.where(rotated, self._height, self._width),
+            np.where(rotated, self._width, self._height))
+
+  def _locations(self) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the x and y of all nodes, with macro pins on their macro."""
+    x = self._x.copy()
+    y = self._y.copy()
+    pins = np.flatnonzero(self._is_pin)
+    macros = self._ref[pins]
+    transforms = _ORIENTATION_TRANSFORMS[self._orientation[macros]]
+    x[pins] = (self._x[macros] + transforms[:, 0, 0] * self._x_offset[pins] +
+               transforms[:, 0, 1] * self._y_offset[pins])
+    y[pins] = (self._y[macros] + transforms[:, 1, 0] * self._x_offset[pins] +
+               transforms[:, 1, 1] * self._y_offset[pins])
+    return x, y
+
+  def _grid_occupancy(self, nodes: np.ndarray) -> np.ndarray:
+    """Returns the area of each grid cell covered by the nodes."""
+    col_edges, row_edges = self._grid_edges()
+    width, height = self._node_sizes()
+    x, y, w, h = self._x[nodes], self._y[nodes], width[nodes], height[nodes]
+    x_overlaps = _overlaps(x - w / 2, x + w / 2, col_edges)
+    y_overlaps = _overlaps(y - h / 2, y + h / 2, row_edges)
+    return y_overlaps.T @ x_overlaps
+
+  def _net_bounding_boxes(
+      self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    x, y = self._locations()
+    x = x[self._net_pins]
+    y = y[self._net_pins]
+    return (np.minimum.reduceat(x, self._net_start),
+            np.maximum.reduceat(x, self._net_start),
+            np.minimum.reduceat(y, self._net_start),
+            np.maximum.reduceat(y, self._net_start))
+
+  # Costs.
+
+  def get_area(self) -> float:
+    nodes = self._is_macro | self._is_stdcell
+    return float(np.sum(self._width[nodes] * self._height[nodes]))
+
+  def get_wirelength(self) -> float:
+    if not self._net_driver.size:
+      return 0.0
+    x_min, x_max, y_min, y_max = self._net_bounding_boxes()
+    return float(np.dot(self._net_weight, (x_max - x_min) + (y_max - y_min)))
+
+  def get_cost(self) -> float:
+    """Returns the wirelength normalized by the canvas half perimeter."""
+    if not self._net_driver.size:
+      return 0.0
+    return self.get_wirelength() / (
+        (self._canvas_width + self._canvas_height) * self._net_driver.size)
+
+  def get_grid_cells_density(self) -> List[float]:
+    return self._grid_density().ravel().tolist()
+
+  def _grid_density(self) -> np.ndarray:
+    """Returns the (rows, columns) density of the grid cells."""
+    nodes = np.flatnonzero((self._is_macro | self._is_stdcell) & self._placed)
+    occupied = self._grid_occupancy(nodes)
+    if self._blockages:
+      col_edges, row_edges = self._grid_edges()
+      blockages = np.asarray(self._blockages, dtype=np.float64)
+      x_overlaps = _overlaps(blockages[:, 0], blockages[:, 2], col_edges)
+      y_overlaps = _overlaps(blockages[:, 1], blockages[:, 3], row_edges)
+      occupied += (y_overlaps * blockages[:, 4:5]).T @ x_overlaps
+    grid_width, grid_height = self._grid_cell_size()
+    return occupied / (grid_width * grid_height)
+
+  def get_density_cost(self) -> float:
+    density = self._grid_density()
+    if density.size * _DENSITY_TOP_FRACTION < 1:
+      # Like plc_wrapper_main, report the highest density on tiny grids.
+      return float(np.max(density))
+    return 0.5 * _top_average(density, _DENSITY_TOP_FRACTION)
+
+  def _routing_congestion(self) -> Tuple[np.ndarray, np.ndarray]:
+    """Returns the (rows, columns) horizontal and vertical congestion."""
+    grid_width, grid_height = self._grid_cell_size()
+    col_edges, row_edges = self._grid_edges()
+    horizontal = np.zeros((self._num_rows, self._num_columns))
+    vertical = np.zeros((self._num_rows, self._num_columns))
+
+    if self._net_driver.size:
+      # RUDY: the horizontal (vertical) wirelength of a net is spread evenly
+      # over its bounding box. Boxes are at least a grid cell wide and high so
+      # that straight nets still cover the cells they cross.
+      x_min, x_max, y_min, y_max = self._net_bounding_boxes()
+      net_width = x_max - x_min
+      net_height = y_max - y_min
+      box_width = np.maximum(net_width, grid_width)
+      box_height = np.maximum(net_height, grid_height)
+      x_center = (x_min + x_max) / 2
+      y_center = (y_min + y_max) / 2
+      x_overlaps = _overlaps(x_center - box_width / 2, x_center + box_width / 2,
+                             col_edges)
+      y_overlaps = _overlaps(y_center - box_height / 2,
+                             y_center + box_height / 2, row_edges)
+      wire_density = self._net_weight / (box_width * box_height)
+      # Number of routing tracks used in each grid cell.
+      horizontal = y_overlaps.T @ (
+          x_overlaps * (wire_density * net_width / grid_width)[:, None])
+      vertical = y_overlaps.T @ (
+          x_overlaps * (wire_density * net_height / grid_height)[:, None])
+      horizontal_routes, vertical_routes = self._routes_per_micron
+      horizontal = _smooth(horizontal / (grid_height * horizontal_routes),
+                           self._congestion_smooth_range, axis=0)
+      vertical = _smooth(vertical / (grid_width * vertical_routes),
+                         self._congestion_smooth_range, axis=1)
+
+    macros = np.flatnonzero(self._is_hard & self._placed)
+    if macros.size:
+      # A hard macro uses its routing allocation on the part of each grid cell
+      # that it covers.
+      width, height = self._node_sizes()
+      x, y = self._x[macros], self._y[macros]
+      w, h = width[macros], height[macros]
+      x_overlaps = _overlaps(x - w / 2, x + w / 2, col_edges)
+      y_overlaps = _overlaps(y - h / 2, y + h / 2, row_edges)
+      horizontal_routes, vertical_routes = self._routes_per_micron
+      horizontal_allocation, vertical_allocation = (
+          self._macro_routing_allocation)
+      horizontal = horizontal + (y_overlaps.T @ (x_overlaps > 0)) * (
+          horizontal_allocation / (grid_height * horizontal_routes))
+      vertical = vertical + ((y_overlaps > 0).T @ x_overlaps) * (
+          vertical_allocation / (grid_width * vertical_routes))
+    return horizontal, vertical
+
+  def get_congestion_cost(self) -> float:
+    horizontal, vertical = self._routing_congestion()
+    return _top_average(
+        np.concatenate([horizontal.ravel(), vertical.ravel()]),
+        _CONGESTION_TOP_FRACTION)
+
+  def get_overlap_cost(self) -> float:
+    """Returns the overlap area of the placed hard macros over canvas area."""
+    macros = np.flatnonzero(self._is_hard & self._placed)
+    width, height = self._node_sizes()
+    x, y, w, h = self._x[macros], self._y[macros], width[macros], height[macros]
+    x_overlap = np.clip(
+        np.minimum(x + w / 2, (x + w / 2)[:, None]) -
+        np.maximum(x - w / 2, (x - w / 2)[:, None]), 0, None)
+    y_overlap = np.clip(
+        np.minimum(y + h / 2, (y + h / 2)[:, None]) -
+        np.maximum(y - h / 2, (y - h / 2)[:, None]), 0, None)
+    overlap = np.triu(x_overlap * y_overlap, k=1).sum()
+    return float(overlap / (self._canvas_width * self._canvas_height))
+
+  # Placement masks.
+
+  def get_node_mask(self, node: NodeId) -> List[int]:
+    """Returns the grid cells that the node can be placed in."""
+    return self._node_mask(self._index(node)).ravel().astype(int).tolist()
+
+  def _node_mask(self, node: int) -> np.ndarray:
+    """Returns the (rows, columns) placement mask of a node."""
+    x_centers, y_centers = self._grid_centers()
+    if not self._is_hard[node]:
+      # Soft macros and stdcells can be placed anywhere but on fully blocked
+      # grid cells.
+      blocked = np.zeros((self._num_rows, self._num_columns), dtype=bool)
+      for minx, miny, maxx, maxy, rate in self._blockages:
+        if rate >= 1.0:
+          blocked |= np.outer((y_centers >= miny) & (y_centers <= maxy),
+                              (x_centers >= minx) & (x_centers <= maxx))
+      return ~blocked
+
+    width, height = self._node_sizes()
+    w, h = width[node], height[node]
+    valid = np.ones((self._num_rows, self._num_columns), dtype=bool)
+    if self._canvas_boundary_check:
+      valid &= np.outer(
+          (y_centers - h / 2 >= 0) & (y_centers + h / 2 <= self._canvas_height),
+          (x_centers - w / 2 >= 0) & (x_centers + w / 2 <= self._canvas_width))
+
+    # Like plc_wrapper_main, a placed node also blocks its own location.
+    others = np.flatnonzero(self._is_hard & self._placed)
+    # A cell is blocked by a macro if the node would be closer to it than the
+    # macro spacing in both dimensions.
+    x_blocked = np.abs(x_centers[None, :] - self._x[others, None]) < (
+        (w + width[others, None]) / 2 + self._macro_macro_x_spacing)
+    y_blocked = np.abs(y_centers[None, :] - self._y[others, None]) < (
+        (h + height[others, None]) / 2 + self._macro_macro_y_spacing)
+    if self._blockages:
+      blockages = np.asarray(self._blockages, dtype=np.float64)
+      x_blocked = np.concatenate([
+          x_blocked, (x_centers[None, :] + w / 2 > blockages[:, 0:1]) &
+          (x_centers[None, :] - w / 2 < blockages[:, 2:3])
+      ])
+      y_blocked = np.concatenate([
+          y_blocked, (y_centers[None, :] + h / 2 > blockages[:, 1:2]) &
+          (y_centers[None, :] - h / 2 < blockages[:, 3:4])
+      ])
+    blocked = (y_blocked.T.astype(np.float32) @ x_blocked.astype(np.float32))
+    return valid & (blocked == 0)
+
+  def can_place_node(self, node: NodeId, grid_cell_index: int) -> bool:
+    mask = self._node_mask(self._index(node))
+    return bool(mask.ravel()[grid_cell_index])
+
+  # Node placement.
+
+  def place_node(self, node: NodeId, grid_cell_index: int) -> bool:
+    node = self._index(node)
+    if grid_cell_index < 0 or (grid_cell_index >=
+                               self._num_columns * self._num_rows):
+      raise ValueError(f'Grid cell index out of range: {grid_cell_index}.')
+    x_centers, y_centers = self._grid_centers()
+    self._x[node] = x_centers[grid_cell_index % self._num_columns]
+    self._y[node] = y_centers[grid_cell_index // self._num_columns]
+    self._placed[node] = True
+    return True
+
+  def unplace_node(self, node: NodeId) -> bool:
+    self._placed[self._index(node)] = False
+    return True
+
+  def unplace_all_nodes(self) -> None:
+    self._placed[~self._fixed & ~self._is_pin] = False
+
+  def update_node_coords(self, node: NodeId, x: float, y: float,
+                         *args) -> bool:
+    del args  # Unused.
+    node = self._index(node)
+    self._x[node] = x
+    self._y[node] = y
+    self._placed[node] = True
+    return True
+
+  def update_macro_orientation(self, node: NodeId, orientation: Text) -> bool:
+    node = self._index(node)
+    if not self._is_macro[node] or orientation not in _ORIENTATION_INDEX:
+      raise ValueError(f'Cannot set orientation {orientation} of node '
+                       f'{self._names[node]}.')
+    self._orientation[node] = _ORIENTATION_INDEX[orientation]
+    return True
+
+  def fix_node_coord(self, node: NodeId) -> bool:
+    self._fixed[self._index(node)] = True
+    return True
+
+  def unfix_node_coord(self, node: NodeId) -> bool:
+    self._fixed[self._index(node)] = False
+    return True
+
+  # The nodes can be given by name to all the methods above.
+  place_node_by_name = place_node
+  unplace_node_by_name = unplace_node
+  update_node_coords_by_name = update_node_coords
+  update_macro_orientation_by_name = update_macro_orientation
+
+  def make_soft_macros_square(self) -> None:
+    side = np.sqrt(self._width[self._is_soft] * self._height[self._is_soft])
+    self._width[self._is_soft] = side
+    self._height[self._is_soft] = side
+
+  def update_port_sides(self) -> None:
+    """Sets the side of each port to the closest canvas edge."""
+    for i in np.flatnonzero(self._is_port):
+      distances = {
+          'LEFT': self._x[i],
+          'RIGHT': self._canvas_width - self._x[i],
+          'BOTTOM': self._y[i],
+          'TOP': self._canvas_height - self._y[i],
+      }
+      self._sides[i] = min(distances, key=distances.get)
+
+  def snap_ports_to_edges(self) -> None:
+    """Moves each port to the canvas edge of its side."""
+    for i in np.flatnonzero(self._is_port):
+      side = self._sides[i]
+      if side == 'LEFT':
+        self._x[i] = 0.0
+      elif side == 'RIGHT':
+        self._x[i] = self._canvas_width
+      elif side == 'BOTTOM':
+        self._y[i] = 0.0
+      elif side == 'TOP':
+        self._y[i] = self._canvas_height
+
+  def disconnect_nets(self, drivers: Sequence[NodeId]) -> None:
+    for driver in drivers:
+      self._fan_outs[self._index(driver)] = []
+    self._build_nets()
+
+  def optimize_stdcells(self, use_current_loc: bool, move_stdcells: bool,
+                        move_macros: bool, log_scale_conns: bool,
+                        use_sizes: bool, io_factor: float,
+                        num_steps: Sequence[int],
+                        max_move_distance: Sequence[float],
+                        attract_factor: Sequence[float],
+                        repel_factor: Sequence[float]) -> bool:
+    """Places soft macros and stdcells with a force directed method.
+
+    Nets pull the pins of the movable nodes to their center (star model) and
+    nodes are pushed down the gradient of the grid density. In every step
+    the displacements are scaled so that the node under the largest force
+    moves `max_move_distance`.
+
+    Args:
+      use_current_loc: If false, movable nodes start at the canvas center.
+      move_stdcells: Move the soft macros and stdcells.
+      move_macros: Move the hard macros.
+      log_scale_conns: Unused.
+      use_sizes: Unused.
+      io_factor: Multiplier of the attraction of nets connected to ports.
+      num_steps: Number of steps of each round.
+      max_move_distance: Maximum distance a node moves in a step, per round.
+      attract_factor: Spring constant of the nets, per round.
+      repel_factor: Repelling factor of dense grid cells, per round.
+
+    Returns:
+      True.
+    """
+    del log_scale_conns, use_sizes  # Unused.
+    movable = np.zeros(len(self._names), dtype=bool)
+    if move_stdcells:
+      movable |= self._is_soft | self._is_stdcell
+    if move_macros:
+      movable |= self._is_hard
+    movable &= ~self._fixed
+    movable_indices = np.flatnonzero(movable)
+    if not movable_indices.size:
+      return True
+    if not use_current_loc:
+      self._x[movable] = self._canvas_width / 2
+      self._y[movable] = self._canvas_height / 2
+    self._placed[movable] = True
+
+    # Each pin pulls its owner, i.e. the node itself or the macro of a pin.
+    owner = np.where(self._is_pin, self._ref, np.arange(len(self._names)))
+    net_owner = owner[self._net_pins]
+    has_port = np.zeros(self._net_driver.size, dtype=bool)
+    np.logical_or.at(has_port, self._net_of_pin, self._is_port[self._net_pins])
+    net_factor = self._net_weight * np.where(has_port, io_factor, 1.0)
+    net_size = np.bincount(self._net_of_pin, minlength=self._net_driver.size)
+    width, height = self._node_sizes()
+    grid_width, grid_height = self._grid_cell_size()
+
+    for steps, max_move, attract, repel in zip(num_steps, max_move_distance,
+                                               attract_factor, repel_factor):
+      for _ in range(steps):
+        x, y = self._locations()
+        force_x = np.zeros(len(self._names))
+        force_y = np.zeros(len(self._names))
+        if self._net_driver.size:
+          pin_x = x[self._net_pins]
+          pin_y = y[self._net_pins]
+          center_x = np.bincount(self._net_of_pin, pin_x) / net_size
+          center_y = np.bincount(self._net_of_pin, pin_y) / net_size
+          pull = attract * net_factor[self._net_of_pin]
+          force_x += np.bincount(
+              net_owner, pull * (center_x[self._net_of_pin] - pin_x),
+              minlength=len(self._names))
+          force_y += np.bincount(
+              net_owner, pull * (center_y[self._net_of_pin] - pin_y),
+              minlength=len(self._names))
+        if repel:
+          gradient_y, gradient_x = np.gradient(self._grid_density())
+          cols = np.clip((self._x / grid_width).astype(int), 0,
+                         self._num_columns - 1)
+          rows = np.clip((self._y / grid_height).astype(int), 0,
+                         self._num_rows - 1)
+          force_x -= repel * gradient_x[rows, cols]
+          force_y -= repel * gradient_y[rows, cols]
+        force_x = force_x[movable_indices]
+        force_y = force_y[movable_indices]
+        largest = np.max(np.hypot(force_x, force_y))
+        if largest <= 0:
+          break
+        scale = max_move / largest
+        w = width[movable_indices]
+        h = height[movable_indices]
+        self._x[movable_indices] = np.clip(
+            self._x[movable_indices] + scale * force_x, w / 2,
+            np.maximum(self._canvas_width - w / 2, w / 2))
+        self._y[movable_indices] = np.clip(
+            self._y[movable_indices] + scale * force_y, h / 2,
+            np.maximum(self._canvas_height - h / 2, h / 2))
+    return True
+
+  # Placement files.
+
+  def restore_placement(self, filename: Text) -> bool:
+    """Restores the node locations, orientations and fixed bits.
+
+    Like plc_wrapper_main, the canvas and grid sizes of the file header are
+    restored too.
+    """
+    with open(filename, 'rt') as f:
+      for line in f:
+        line = line.strip()
+        if line.startswith('#'):
+          sizes = re.search(r'Width : ([\d.]+)\s+Height : ([\d.]+)', line)
+          if sizes:
+            self.set_canvas_size(float(sizes.group(1)), float(sizes.group(2)))
+          sizes = re.search(r'Columns : (\d+)\s+Rows : (\d+)', line)
+          if sizes:
+            self.set_placement_grid(int(sizes.group(1)), int(sizes.group(2)))
+          continue
+        if not line:
+          continue
+        items = line.split()
+        node = self._index(int(items[0]))
+        self._x[node] = float(items[1])
+        self._y[node] = float(items[2])
+        self._placed[node] = True
+        if len(items) > 3 and items[3] in _ORIENTATION_INDEX:
+          self._orientation[node] = _ORIENTATION_INDEX[items[3]]
+        if len(items) > 4:
+          self._fixed[node] = bool(int(items[4]))
+    return True
+
+  def save_placement(self, filename: Text, info: Text) -> bool:
+    """Saves the placed nodes with a header and the info as comments."""
+    lines = [
+        'Placement file for Circuit Training',
+        f'Source input file(s) : {self._netlist_file}',
+        f'This file : {filename}',
+        f'Date : {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}',
+        f'Columns : {self._num_columns}  Rows : {self._num_rows}',
+        f'Width : {self._canvas_width:.3f}  Height : {self._canvas_height:.3f}',
+    ]
+    lines.extend(info.split('\n'))
+    lines.append('node_index x y orientation fixed')
+    with open(filename, 'wt') as f:
+      for line in lines:
+        f.write(f'# {line}\n')
+      nodes = (self._is_macro | self._is_stdcell | self._is_port) & self._placed
+      for i in np.flatnonzero(nodes):
+        orientation = (
+            '-' if self._is_port[i] else _ORIENTATIONS[self._orientation[i]])
+        f.write(f'{i} {self._x[i]:.10g} {self._y[i]:.10g} {orientation} '
+                f'{int(self._fixed[i])}\n')
+    return True
+
+  # Netlist queries.
+
+  def num_nodes(self) -> int:
+    return len(self._names)
+
+  def get_macro_indices(self) -> List[int]:
+    return self._macro_indices.tolist()
+
+  def get_node_name(self, node: int) -> Text:
+    if node < 0 or node >= len(self._names):
+      return ''
+    return self._names[node]
+
+  def get_node_type(self, node: int) -> Text:
+    if node < 0 or node >= len(self._names):
+      return ''
+    return self._types[node]
+
+  def get_node_width_height(self, node: NodeId) -> Tuple[float, float]:
+    node = self._index(node)
+    width, height = self._node_sizes()
+    return (float(width[node]), float(height[node]))
+
+  def get_node_location(self, node: NodeId) -> Tuple[float, float]:
+    node = self._index(node)
+    if self._is_pin[node]:
+      x, y = self._locations()
+    else:
+      x, y = self._x, self._y
+    return (float(x[node]), float(y[node]))
+
+  def get_node_locations(self,
+                         nodes: Sequence[NodeId]) -> List[Tuple[float, float]]:
+    x, y = self._locations()
+    indices = [self._index(node) for node in nodes]
+    return list(zip(x[indices].tolist(), y[indices].tolist()))
+
+  def get_grid_cell_of_node(self, node: NodeId) -> int:
+    x, y = self.get_node_location(node)
+    grid_width, grid_height = self._grid_cell_size()
+    col = min(max(int(x // grid_width), 0), self._num_columns - 1)
+    row = min(max(int(y // grid_height), 0), self._num_rows - 1)
+    return row * self._num_columns + col
+
+  def get_macro_orientation(self, node: NodeId) -> Text:
+    node = self._index(node)
+    if not self._is_hard[node]:
+      return ''
+    return _ORIENTATIONS[self._orientation[node]]
+
+  def is_node_placed(self, node: NodeId) -> bool:
+    node = self._index(node)
+    if self._is_pin[node]:
+      node = self._ref[node]
+    return bool(self._placed[node])
+
+  def is_node_fixed(self, node: NodeId) -> bool:
+    return bool(self._fixed[self._index(node)])
+
+  def is_node_soft_macro(self, node: NodeId) -> bool:
+    return bool(self._is_soft[self._index(node)])
+
+  def get_ref_node_id(self, node: NodeId) -> int:
+    return int(self._ref[self._index(node)])
+
+  def get_node_weight(self, node: NodeId) -> float:
+    return float(self._weight[self._index(node)])
+
+  def get_fan_outs_of_node(self, node: NodeId) -> List[int]:
+    return list(self._fan_outs[self._index(node)])
+
+  def _adjacency(self, owner: np.ndarray, size: int) -> np.ndarray:
+    """Counts the driver to fan-out connections between node owners."""
+    driver_owner = owner[self._net_pins[self._net_start][self._net_of_pin]]
+    pin_owner = owner[self._net_pins]
+    connected = (driver_owner >= 0) & (pin_owner >= 0) & (
+        driver_owner != pin_owner)
+    adjacency = np.zeros((size, size), dtype=np.int64)
+    np.add.at(adjacency, (driver_owner[connected], pin_owner[connected]), 1)
+    return adjacency + adjacency.T
+
+  def _macro_owners(self) -> np.ndarray:
+    owner = np.full(len(self._names), -1, dtype=np.int64)
+    owner[self._macro_indices] = np.arange(self._macro_indices.size)
+    pins = np.flatnonzero(self._is_pin)
+    owner[pins] = owner[self._ref[pins]]
+    return owner
+
+  def get_macro_adjacency(self) -> List[int]:
+    """Returns the flattened number of connections between macros."""
+    return self._adjacency(self._macro_owners(),
+                           self._macro_indices.size).ravel().tolist()
+
+  def get_macro_and_clustered_port_adjacency(
+      self) -> Tuple[List[int], List[int]]:
+    """Returns the adjacency of macros and ports clustered by grid cell."""
+    owner = self._macro_owners()
+    ports = np.flatnonzero(self._is_port)
+    port_cells = np.asarray(
+        [self.get_grid_cell_of_node(p) for p in ports], dtype=np.int64)
+    clustered_port_cells, cluster = np.unique(port_cells, return_inverse=True)
+    num_macros = self._macro_indices.size
+    owner[ports] = num_macros + cluster.ravel()
+    adjacency = self._adjacency(owner, num_macros + clustered_port_cells.size)
+    adjacency[num_macros:, num_macros:] = 0
+    return adjacency.ravel().tolist(), clustered_port_cells.tolist()
+
+  # Bulk accessors, see plc_client.PlacementCost.
+
+  def node_types(self, nodes: Optional[Sequence[int]] = None) -> np.ndarray:
+    return np.array(self._types)[_select(nodes)]
+
+  def node_locations(self,
+                     nodes: Optional[Sequence[int]] = None) -> np.ndarray:
+    return np.stack(self._locations(), axis=1)[_select(nodes)]
+
+  def node_sizes(self, nodes: Optional[Sequence[int]] = None) -> np.ndarray:
+    return np.stack(self._node_sizes(), axis=1)[_select(nodes)]
+
+  def grid_cells(self, nodes: Optional[Sequence[int]] = None) -> np.ndarray:
+    x, y = self._locations()
+    grid_width, grid_height = self._grid_cell_size()
+    cols = np.clip((x // grid_width).astype(np.int64), 0, self._num_columns - 1)
+    rows = np.clip((y // grid_height).astype(np.int64), 0, self._num_rows - 1)
+    return (rows * self._num_columns + cols)[_select(nodes)]
+
+  def placed_mask(self, nodes: Optional[Sequence[int]] = None) -> np.ndarray:
+    placed = np.where(self._is_pin, self._placed[self._ref], self._placed)
+    return placed[_select(nodes)]
+
+  def fixed_mask(self, nodes: Optional[Sequence[int]] = None) -> np.ndarray:
+    return self._fixed[_select(nodes)].copy()
+
+  def orientations(self,
+                   nodes: Optional[Sequence[int]] = None,
+                   node_types: Optional[np.ndarray] = None) -> np.ndarray:
+    del node_types  # Only used by the client to save calls.
+    return np.where(self._is_hard,
+                    np.array(_ORIENTATIONS)[self._orientation],
+                    '')[_select(nodes)]
+
+  def fan_outs(
+      self,
+      nodes: Optional[Sequence[int]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    fan_outs = (
+        self._fan_outs if nodes is None else [self._fan_outs[int(i)]
+                                              for i in nodes])
+    indptr = np.zeros(len(fan_outs) + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(f) for f in fan_outs])
+    indices = np.array([i for f in fan_outs for i in f], dtype=np.int64)
+    return indptr, indices
+
+  def update_node_coords_bulk(self, nodes: Sequence[int],
+                              locations: Sequence[Tuple[float, float]]) -> bool:
+    nodes = np.asarray(nodes, dtype=np.int64)
+    locations = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+    self._x[nodes] = locations[:, 0]
+    self._y[nodes] = locations[:, 1]
+    self._placed[nodes] = True
+    return True
+
+  def update_macro_orientation_bulk(self, nodes: Sequence[int],
+                                    orientations: Sequence[Text]) -> bool:
+    for node, orientation in zip(nodes, orientations):
+      self.update_macro_orientation(int(node), orientation)
+    return True
+
+  def get_cost_info(
+      self,
+      components: Optional[Sequence[Text]] = None) -> Dict[Text, float]:
+    if components is None:
+      components = plc_client.COST_INFO_METHODS
+    return {
+        name: getattr(self, plc_client.COST_INFO_METHODS[name])()
+        for name in components
+    }
+
+  def snapshot(
+      self,
+      nodes: Optional[Sequence[int]] = None) -> plc_client.PlacementSnapshot:
+    if nodes is None:
+      nodes = np.flatnonzero(~self._is_pin)
+    else:
+      nodes = np.asarray(nodes, dtype=np.int64)
+      nodes = nodes[~self._is_pin[nodes]]
+    return plc_client.PlacementSnapshot(
+        nodes=nodes,
+        locations=np.stack([self._x[nodes], self._y[nodes]], axis=1),
+        orientations=np.where(self._is_hard[nodes],
+                              np.array(_ORIENTATIONS)[self._orientation[nodes]],
+                              ''),
+        placed=self._placed[nodes].copy(),
+        fixed=self._fixed[nodes].copy())
+
+  def restore(self, snapshot: plc_client.PlacementSnapshot) -> None:
+    nodes = snapshot.nodes
+    self._x[nodes] = snapshot.locations[:, 0]
+    self._y[nodes] = snapshot.locations[:, 1]
+    self._placed[nodes] = snapshot.placed
+    self._fixed[nodes] = snapshot.fixed
+    for node, orientation in zip(nodes.tolist(), snapshot.orientations):
+      if orientation:
+        self._orientation[node] = _ORIENTATION_INDEX[orientation]
+
+  # Canvas and settings.
+
+  def get_source_filename(self) -> Text:
+    return self._netlist_file
+
+  def set_canvas_size(self, width: float, height: float) -> bool:
+    self._canvas_width = float(width)
+    self._canvas_height = float(height)
+    return True
+
+  def get_canvas_width_height(self) -> Tuple[float, float]:
+    return (self._canvas_width, self._canvas_height)
+
+  def set_placement_grid(self, columns: int, rows: int) -> bool:
+    self._num_columns = int(columns)
+    self._num_rows = int(rows)
+    return True
+
+  def get_grid_num_columns_rows(self) -> Tuple[int, int]:
+    return (self._num_columns, self._num_rows)
+
+  def create_blockage(self,
+                      minx: float,
+                      miny: float,
+                      maxx: float,
+                      maxy: float,
+                      blockage_rate: float = 1.0) -> bool:
+    self._blockages.append([minx, miny, maxx, maxy, blockage_rate])
+    return True
+
+  def get_blockages(self) -> List[List[float]]:
+    return [list(b) for b in self._blockages]
+
+  def set_project_name(self, project_name: Text) -> None:
+    self._project_name = project_name
+
+  def get_project_name(self) -> Text:
+    return self._project_name
+
+  def set_block_name(self, block_name: Text) -> None:
+    self._block_name = block_name
+
+  def get_block_name(self) -> Text:
+    return self._block_name
+
+  def set_routes_per_micron(self, horizontal: float, vertical: float) -> None:
+    self._routes_per_micron = (horizontal, vertical)
+
+  def get_routes_per_micron(self) -> Tuple[float, float]:
+    return self._routes_per_micron
+
+  def set_macro_routing_allocation(self, horizontal: float,
+                                   vertical: float) -> None:
+    self._macro_routing_allocation = (horizontal, vertical)
+
+  def get_macro_routing_allocation(self) -> Tuple[float, float]:
+    return self._macro_routing_allocation
+
+  def set_congestion_smooth_range(self, smooth_range: float) -> None:
+    self._congestion_smooth_range = smooth_range
+
+  def get_congestion_smooth_range(self) -> float:
+    return self._congestion_smooth_range
+
+  def set_overlap_threshold(self, overlap_threshold: float) -> None:
+    self._overlap_threshold = overlap_threshold
+
+  def get_overlap_threshold(self) -> float:
+    return self._overlap_threshold
+
+  def set_canvas_boundary_check(self, boundary_check: bool) -> None:
+    self._canvas_boundary_check = boundary_check
+
+  def get_canvas_boundary_check(self) -> bool:
+    return self._canvas_boundary_check
+
+  def get_macro_bloat_width(self) -> float:
+    return self._macro_macro_x_spacing
+
+  def get_macro_bloat_height(self) -> float:
+    return self._macro_macro_y_spacing
+
+  def set_use_incremental_cost(self, use_incremental_cost: bool) -> None:
+    # Costs are always computed from scratch.
+    self._use_incremental_cost = use_incremental_cost
+
+  def allow_hard_macros_over_std_cells(self, allow: bool) -> None:
+    self._hard_macros_over_std_cells = allow
@@ -0,0 +1,299 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for plc_numpy."""
+
+import os
+import re
+
+from absl import flags
+from absl.testing import parameterized
+from circuit_training.environment import placement_util
+from circuit_training.environment import plc_client
+from circuit_training.environment import plc_numpy
+from circuit_training.utils import test_utils
+import numpy as np
+
+FLAGS = flags.FLAGS
+
+_TEST_DATA_DIR = 'circuit_training/environment/test_data'
+
+
+def _netlist_file(block_name):
+  return os.path.join(FLAGS.test_srcdir, _TEST_DATA_DIR, block_name,
+                      'netlist.pb.txt')
+
+
+def _initial_placement(block_name):
+  return os.path.join(FLAGS.test_srcdir, _TEST_DATA_DIR, block_name,
+                      'initial.plc')
+
+
+def _header_counts(block_name):
+  """Returns the counts of node types in the header of initial.plc."""
+  counts = {}
+  with open(_initial_placement(block_name)) as f:
+    for line in f:
+      if not line.startswith('#'):
+        break
+      match = re.fullmatch(r'# (\w+)\s*:\s*(\d+)\s*', line)
+      if match:
+        counts[match.group(1)] = int(match.group(2))
+  return counts
+
+
+class PlcNumpyTest(parameterized.TestCase, test_utils.TestCase):
+
+  def test_macro_tiles_matches_plc_wrapper_main(self):
+    # Expected values are the ones of plc_wrapper_main in plc_client_test.
+    plc = plc_numpy.PlacementCost(_netlist_file('macro_tiles_10x10'))
+    self.assertAlmostEqual(plc.get_cost(), 0.007745966692414834)
+    self.assertEqual(
+        plc.get_cost_info(), {
+            'wirelength': plc.get_cost(),
+            'congestion': plc.get_congestion_cost(),
+            'density': plc.get_density_cost(),
+        })
+    self.assertEqual(plc.get_area(), 250000)
+    self.assertEqual(plc.get_wirelength(), 5400)
+    self.assertAlmostEqual(plc.get_density_cost(), 0.3570806661517036)
+    # RUDY only approximates the congestion of plc_wrapper_main.
+    self.assertAllClose(
+        plc.get_congestion_cost(), 1.124405186246434, rtol=0.15)
+
+    self.assertTrue(plc.set_canvas_size(1200.0, 1200.0))
+    self.assertTrue(plc.set_placement_grid(20, 20))
+    self.assertEqual(plc.get_macro_indices(), list(range(0, 1300, 13)))
+    self.assertFalse(plc.is_node_soft_macro(13))
+    self.assertEqual(plc.get_node_type(9), 'MACRO_PIN')
+    # The macros cover the bottom left 600x600 microns of the canvas.
+    expected_mask = np.ones((20, 20), dtype=int)
+    expected_mask[:10, :10] = 0
+    self.assertEqual(plc.get_node_mask(13), expected_mask.ravel().tolist())
+    self.assertEqual(
+        plc.get_node_mask('M_R0_C1'), expected_mask.ravel().tolist())
+
+    # Each macro is connected to its neighbors on the 10x10 tile with 3 nets.
+    rows, cols = np.divmod(np.arange(100), 10)
+    distance = (
+        np.abs(rows[:, None] - rows[None, :]) +
+        np.abs(cols[:, None] - cols[None, :]))
+    expected_adjacency = (3 * (distance == 1)).ravel().tolist()
+    self.assertEqual(plc.get_macro_adjacency(), expected_adjacency)
+    self.assertEqual(plc.get_macro_and_clustered_port_adjacency(),
+                     (expected_adjacency, []))
+
+  def test_sample_clustered(self):
+    plc = plc_numpy.PlacementCost(_netlist_file('sample_clustered'))
+    self.assertEqual(plc.get_macro_indices(), [2, 3, 8])
+    self.assertEqual([plc.is_node_soft_macro(m) for m in [2, 3, 8]],
+                     [False, False, True])
+    self.assertEqual(plc.get_ref_node_id(9), 8)
+    self.assertEqual(plc.get_fan_outs_of_node(0), [10, 4])
+    self.assertAlmostEqual(plc.get_area(), 17603.53279986302, places=3)
+
+    plc.set_canvas_size(500, 500)
+    plc.set_placement_grid(2, 2)
+    plc.make_soft_macros_square()
+    self.assertTrue(plc.restore_placement(
+        _initial_placement('sample_clustered')))
+    self.assertTrue(plc.is_node_fixed(0))
+    self.assertEqual(plc.get_node_location(3), (375.0, 375.0))
+    # Macro pins follow their macro.
+    self.assertEqual(plc.get_node_location(7), (415.0, 395.0))
+    # As reported in the header of initial.plc.
+    self.assertAlmostEqual(plc.get_density_cost(), 0.2305, places=4)
+
+  @parameterized.parameters('sample_clustered', 'macro_tiles_10x10')
+  def test_node_counts_match_plc_wrapper_main(self, block_name):
+    # The header of initial.plc is written by plc_wrapper_main.
+    plc = plc_numpy.PlacementCost(_netlist_file(block_name))
+    macros = plc.get_macro_indices()
+    soft = {m for m in macros if plc.is_node_soft_macro(m)}
+    types = plc.node_types()
+    pins = np.flatnonzero(types == 'MACRO_PIN')
+    soft_pins = sum(plc.get_ref_node_id(p) in soft for p in pins)
+    self.assertEqual(
+        _header_counts(block_name), {
+            'HARD_MACROs': len(macros) - len(soft),
+            'HARD_MACRO_PINs': len(pins) - soft_pins,
+            'MACROs': len(macros),
+            'MACRO_PINs': len(pins),
+            'PORTs': int(np.sum(types == 'PORT')),
+            'SOFT_MACROs': len(soft),
+            'SOFT_MACRO_PINs': soft_pins,
+            'STDCELLs': 0,
+        })
+
+  def test_soft_macros_from_attributes(self):
+    # A macro with the 'MACRO' type and an orientation is hard, whatever its
+    # name.
+    with open(_netlist_file('sample_clustered')) as f:
+      netlist = f.read().replace('"M0"', '"Grp_M0"')
+    netlist_file = self.create_tempfile(
+        'netlist.pb.txt', content=netlist).full_path
+    plc = plc_numpy.PlacementCost(netlist_file)
+    self.assertEqual(plc.get_node_name(2), 'Grp_M0')
+    self.assertEqual([plc.is_node_soft_macro(m) for m in [2, 3, 8]],
+                     [False, False, True])
+
+  def test_place_and_save(self):
+    plc = plc_numpy.PlacementCost(_netlist_file('sample_clustered'))
+    plc.set_canvas_size(500, 500)
+    plc.set_placement_grid(5, 5)
+    plc.unplace_all_nodes()
+    self.assertFalse(plc.is_node_placed(2))
+    self.assertTrue(plc.place_node(2, 12))
+    self.assertEqual(plc.get_node_location(2), (250.0, 250.0))
+    self.assertEqual(plc.get_grid_cell_of_node(2), 12)
+
+    # M1 (80x40) only overlaps M0 (120x120) in the center cell, next to it
+    # they touch.
+    mask = np.array(plc.get_node_mask(3)).reshape(5, 5)
+    self.assertEqual(mask[2, 2], 0)
+    self.assertEqual(mask.sum(), 24)
+    self.assertFalse(plc.can_place_node(3, 12))
+    self.assertTrue(plc.can_place_node(3, 0))
+
+    plc.create_blockage(0, 0, 100, 100, 1.0)
+    self.assertFalse(plc.can_place_node(3, 0))
+    self.assertFalse(plc.get_node_mask(8)[0])
+
+    self.assertTrue(plc.update_macro_orientation(2, 'FN'))
+    self.assertEqual(plc.get_macro_orientation(2), 'FN')
+    # The pin offsets are mirrored.
+    self.assertEqual(plc.get_node_location(4), (310.0, 310.0))
+    with self.assertRaises(ValueError):
+      plc.update_macro_orientation(2, 'X')
+
+    filename = os.path.join(self.create_tempdir(), 'placement.plc')
+    self.assertTrue(plc.save_placement(filename, 'Info'))
+    restored = plc_numpy.PlacementCost(_netlist_file('sample_clustered'))
+    restored.restore_placement(filename)
+    self.assertEqual(restored.get_node_location(2), (250.0, 250.0))
+    self.assertEqual(restored.get_macro_orientation(2), 'FN')
+
+  def test_optimize_stdcells(self):
+    plc = plc_numpy.PlacementCost(_netlist_file('sample_clustered'))
+    plc.set_canvas_size(500, 500)
+    plc.set_placement_grid(5, 5)
+    plc.make_soft_macros_square()
+    plc.restore_placement(_initial_placement('sample_clustered'))
+    self.assertTrue(
+        plc.optimize_stdcells(False, True, False, False, False, 1.0,
+                              [100, 100], [5.0, 5.0], [100, 1e-3], [0, 1e6]))
+    # Only the soft macro moves.
+    self.assertEqual(plc.get_node_location(2), (125.0, 375.0))
+    x, y = plc.get_node_location(8)
+    self.assertBetween(x, 0, 500)
+    self.assertBetween(y, 0, 500)
+    self.assertNotEqual((x, y), (250.0, 250.0))
+
+  def test_bulk_accessors(self):
+    plc = plc_numpy.PlacementCost(_netlist_file('sample_clustered'))
+    plc.set_canvas_size(500, 500)
+    plc.set_placement_grid(5, 5)
+    plc.restore_placement(_initial_placement('sample_clustered'))
+    plc.update_macro_orientation(2, 'E')
+    plc.unplace_node(3)
+    nodes = range(plc.num_nodes())
+    self.assertEqual(plc.node_types().tolist(),
+                     [plc.get_node_type(i) for i in nodes])
+    self.assertEqual(plc.node_locations().tolist(),
+                     [list(plc.get_node_location(i)) for i in nodes])
+    self.assertEqual(plc.node_sizes().tolist(),
+                     [list(plc.get_node_width_height(i)) for i in nodes])
+    self.assertEqual(plc.grid_cells().tolist(),
+                     [plc.get_grid_cell_of_node(i) for i in nodes])
+    self.assertEqual(plc.placed_mask().tolist(),
+                     [plc.is_node_placed(i) for i in nodes])
+    self.assertEqual(plc.fixed_mask().tolist(),
+                     [plc.is_node_fixed(i) for i in nodes])
+    self.assertEqual(plc.orientations().tolist(),
+                     [plc.get_macro_orientation(i) for i in nodes])
+    indptr, indices = plc.fan_outs()
+    self.assertEqual([indices[indptr[i]:indptr[i + 1]].tolist() for i in nodes],
+                     [plc.get_fan_outs_of_node(i) for i in nodes])
+    # The accessors of a subset of the nodes.
+    subset = [8, 2]
+    for accessor in ('node_types', 'node_locations', 'node_sizes',
+                     'grid_cells', 'placed_mask', 'fixed_mask',
+                     'orientations'):
+      self.assertEqual(
+          getattr(plc, accessor)(subset).tolist(),
+          getattr(plc, accessor)()[subset].tolist(),
+          msg=accessor)
+    indptr, indices = plc.fan_outs(subset)
+    self.assertEqual(indices[indptr[1]:indptr[2]].tolist(),
+                     plc.get_fan_outs_of_node(2))
+
+    self.assertTrue(
+        plc.update_node_coords_bulk([2, 3], [(100.0, 110.0), (200.0, 210.0)]))
+    self.assertEqual(plc.get_node_location(3), (200.0, 210.0))
+    self.assertTrue(plc.is_node_placed(3))
+    self.assertTrue(plc.update_macro_orientation_bulk([2, 3], ['N', 'FS']))
+    self.assertEqual(plc.orientations()[[2, 3]].tolist(), ['N', 'FS'])
+
+  def test_snapshot_restore(self):
+    plc = plc_numpy.PlacementCost(_netlist_file('sample_clustered'))
+    plc.restore_placement(_initial_placement('sample_clustered'))
+    snapshot = plc.snapshot()
+    self.assertEqual(snapshot.nodes.tolist(), [0, 1, 2, 3, 8])
+    self.assertEqual(snapshot.locations[2].tolist(), [125.0, 375.0])
+    self.assertEqual(snapshot.orientations.tolist(), ['', '', 'N', 'N', ''])
+    self.assertEqual(snapshot.fixed.tolist(), [True, True, False, False, False])
+    expected = (plc.node_locations(), plc.placed_mask(), plc.fixed_mask(),
+                plc.orientations())
+
+    plc.unfix_node_coord(0)
+    plc.unplace_all_nodes()
+    plc.update_node_coords(2, 10.0, 20.0)
+    plc.update_macro_orientation(3, 'FS')
+    plc.restore(snapshot)
+    for array, expected_array in zip(
+        (plc.node_locations(), plc.placed_mask(), plc.fixed_mask(),
+         plc.orientations()), expected):
+      self.assertEqual(array.tolist(), expected_array.tolist())
+
+  def test_snapshot_matches_client(self):
+    plc = plc_numpy.PlacementCost(_netlist_file('sample_clustered'))
+    plc.restore_placement(_initial_placement('sample_clustered'))
+    plc.update_macro_orientation(2, 'E')
+    plc.unplace_node(3)
+    # The client implementation only uses node_types and call_many.
+    # The macro pin 4 is left out.
+    for nodes in (None, [8, 4, 2]):
+      expected = plc_client.PlacementCost.snapshot(plc, nodes)
+      snapshot = plc.snapshot(nodes)
+      for field in ('nodes', 'locations', 'orientations', 'placed', 'fixed'):
+        self.assertEqual(
+            getattr(snapshot, field).tolist(),
+            getattr(expected, field).tolist(),
+            msg=field)
+    self.assertEqual(plc.snapshot([8, 4, 2]).nodes.tolist(), [8, 2])
+
+  def test_create_placement_cost(self):
+    plc = placement_util.create_placement_cost(
+        netlist_file=_netlist_file('macro_tiles_10x10'),
+        init_placement=_initial_placement('macro_tiles_10x10'),
+        backend='numpy')
+    self.assertIsInstance(plc, plc_numpy.PlacementCost)
+    self.assertEqual(plc.get_canvas_width_height(), (1200.0, 1200.0))
+    self.assertEqual(plc.get_grid_num_columns_rows(), (20, 20))
+    self.assertEqual(plc.get_block_name(), 'macro_tiles_10x10')
+    self.assertEqual(plc.get_node_location(0), (390.0, 210.0))
+
+
+if __name__ == '__main__':
+  test_utils.main()
@@ -0,0 +1,316 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A pool of PlacementCost workers to evaluate placements in parallel.
+
+All the workers load the same netlist. Mutating calls on the pool are replayed
+on every worker, so all of them hold the same placement. Independent jobs, e.g.
+"place this node here and return the cost", run on idle workers from a thread
+pool with `PlacementCostPool.map`. The mutations a job makes are undone after
+it finishes, so the workers stay in sync.
+
+Example usage:
+
+  pool = plc_pool.PlacementCostPool(
+      functools.partial(placement_util.create_placement_cost, netlist_file,
+                        init_placement), num_workers=8)
+
+  def cost_at(plc, location):
+    plc.place_node(node, location)
+    return plc.get_cost()
+
+  costs = pool.map(cost_at, locations)
+"""
+
+import concurrent.futures
+import queue
+from typing import (Any, Callable, Dict, Iterable, List, Optional, Sequence,
+                    Text, Tuple, TypeVar)
+
+from circuit_training.environment import plc_client
+
+_T = TypeVar('_T')
+_R = TypeVar('_R')
+
+# Mutations of settings, undone by calling them with the value of the getter.
+_SETTING_GETTERS = {
+    'set_block_name': 'get_block_name',
+    'set_canvas_boundary_check': 'get_canvas_boundary_check',
+    'set_canvas_size': 'get_canvas_width_height',
+    'set_congestion_smooth_range': 'get_congestion_smooth_range',
+    'set_macro_routing_allocation': 'get_macro_routing_allocation',
+    'set_overlap_threshold': 'get_overlap_threshold',
+    'set_placement_grid': 'get_grid_num_columns_rows',
+    'set_project_name': 'get_project_name',
+    'set_routes_per_micron': 'get_routes_per_micron',
+}
+
+# Number of calls in the journal of the pool that triggers a checkpoint.
+_MAX_JOURNAL_CALLS = 10000
+
+Call = Tuple[Text, Sequence[Any]]
+
+
+def _is_placement_mutation(name: Text) -> bool:
+  name = name[:-len('_by_name')] if name.endswith('_by_name') else name
+  return (name in plc_client.NODE_MUTATING_METHODS or
+          name in plc_client.PLACEMENT_MUTATING_METHODS)
+
+
+class _JobPlacementCost(object):
+  """Wraps the worker of a job and records how to undo the job's mutations."""
+
+  def __init__(self, plc: plc_client.PlacementCost,
+               node_indices: Dict[Text, int]) -> None:
+    self._plc = plc
+    self._node_indices = node_indices
+    self._saved_nodes = set()
+    self._saved_all_nodes = False
+    self._saved_settings = set()
+    self._undo_calls = []
+    # Set if the job made a mutation that cannot be undone.
+    self.needs_respawn = False
+
+  def __getattr__(self, name: Text) -> Any:
+    method = getattr(self._plc, name)
+    if name not in plc_client.MUTATING_METHODS:
+      return method
+
+    def f(*args) -> Any:
+      self._record(name, args)
+      return method(*args)
+
+    return f
+
+  def call_many(self, calls: Sequence[Call]) -> List[Any]:
+    for name, args in calls:
+      if name in plc_client.MUTATING_METHODS:
+        self._record(name, args)
+    return self._plc.call_many(calls)
+
+  # The bulk updates of the client are built on call_many, run them on this
+  # object so that the calls are recorded.
+  update_node_coords_bulk = plc_client.PlacementCost.update_node_coords_bulk
+  update_macro_orientation_bulk = (
+      plc_client.PlacementCost.update_macro_orientation_bulk)
+  restore = plc_client.PlacementCost.restore
+
+  def _record(self, name: Text, args: Sequence[Any]) -> None:
+    """Saves the state that the mutation `name` is about to change."""
+    if name.endswith('_by_name'):
+      name = name[:-len('_by_name')]
+      # The undo calls and the saved nodes use indices.
+      if args[0] not in self._node_indices:
+        self.needs_respawn = True
+        return
+      args = (self._node_indices[args[0]],) + tuple(args[1:])
+    # Node mutations are undone by restoring the node's location, orientation
+    # and fixed bit.
+    if name in plc_client.NODE_MUTATING_METHODS:
+      self._save_nodes([args[0]])
+    elif name in plc_client.PLACEMENT_MUTATING_METHODS:
+      self._save_nodes(None)
+    elif name in _SETTING_GETTERS:
+      if name in self._saved_settings:
+        return
+      self._saved_settings.add(name)
+      value = getattr(self._plc, _SETTING_GETTERS[name])()
+      args = tuple(value) if isinstance(value, (list, tuple)) else (value,)
+      self._undo_calls.append([(name, args)])
+    else:
+      self.needs_respawn = True
+
+  def _save_nodes(self, nodes: Optional[Sequence[int]]) -> None:
+    """Saves a snapshot of the nodes, of all the nodes if None."""
+    if self._saved_all_nodes:
+      return
+    if nodes is None:
+      self._saved_all_nodes = True
+    else:
+      nodes = [n for n in nodes if n not in self._saved_nodes]
+      if not nodes:
+        return
+      self._saved_nodes.update(nodes)
+    snapshot = self._plc.snapshot(nodes)
+    self._undo_calls.append(plc_client._restore_calls(snapshot))  # pylint: disable=protected-access
+
+  def undo(self) -> None:
+    """Restores the state of the worker from before the job."""
+    calls = [call for calls in reversed(self._undo_calls) for call in calls]
+    if calls:
+      self._plc.call_many(calls)
+
+
+class PlacementCostPool(object):
+  """A pool of PlacementCost workers kept in sync by replaying mutations.
+
+  Mutating methods called on the pool run on every worker, query methods run
+  on the first one. The pool is not thread-safe: call its methods from a
+  single thread and use `map` for parallel work.
+  """
+
+  def __init__(self, create_placement_cost_fn: Callable[
+      [], plc_client.PlacementCost], num_workers: int) -> None:
+    """Creates the workers.
+
+    Args:
+      create_placement_cost_fn: A function that returns a new PlacementCost,
+        e.g. a partial of placement_util.create_placement_cost. All the
+        returned objects should be in the same state.
+      num_workers: Number of workers.
+    """
+    if num_workers < 1:
+      raise ValueError(f'num_workers should be positive, got {num_workers}.')
+    self._create_placement_cost_fn = create_placement_cost_fn
+    self._executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=num_workers)
+    self._workers = list(
+        self._executor.map(lambda _: create_placement_cost_fn(),
+                           range(num_workers)))
+    self._idle_workers = queue.SimpleQueue()
+    for i in range(num_workers):
+      self._idle_workers.put(i)
+    # The mutating calls made on the pool, to bring up new workers: the calls
+    # before the checkpoint, the placement of the checkpoint, the calls after.
+    self._journal = []
+    self._checkpoint = None
+    self._checkpoint_index = 0
+
+    plc = self._workers[0]
+    node_names = plc.call_many([
+        ('get_node_name', (i,)) for i in range(plc.num_nodes())
+    ])
+    self._node_indices = {name: i for i, name in enumerate(node_names)}
+
+  @property
+  def num_workers(self) -> int:
+    return len(self._workers)
+
+  def __getattr__(self, name: Text) -> Any:
+    if name.startswith('_'):
+      raise AttributeError(name)
+    if name in plc_client.MUTATING_METHODS:
+      return lambda *args: self._broadcast([(name, args)])[0]
+    return getattr(self._workers[0], name)
+
+  def call_many(self, calls: Sequence[Call]) -> List[Any]:
+    """Calls several methods, on every worker if any of them is mutating."""
+    calls = [(name, tuple(args)) for name, args in calls]
+    if any(name in plc_client.MUTATING_METHODS for name, _ in calls):
+      return self._broadcast(calls)
+    return self._workers[0].call_many(calls)
+
+  # Broadcast through call_many.
+  update_node_coords_bulk = plc_client.PlacementCost.update_node_coords_bulk
+  update_macro_orientation_bulk = (
+      plc_client.PlacementCost.update_macro_orientation_bulk)
+  restore = plc_client.PlacementCost.restore
+
+  def _broadcast(self, calls: Sequence[Call]) -> List[Any]:
+    self._journal.extend(calls)
+    results = list(
+        self._executor.map(lambda plc: plc.call_many(calls), self._workers))
+    if len(self._journal) - self._checkpoint_index > _MAX_JOURNAL_CALLS:
+      self.checkpoint()
+    return results[0]
+
+  def checkpoint(self) -> None:
+    """Shortens the calls replayed on new workers.
+
+    The calls that only change the placement are replaced by a snapshot of
+    the current placement. The last `restore_placement` is kept, it also sets
+    the canvas and the grid of its file.
+    """
+    last_restore = max(
+        (i for i, (name, _) in enumerate(self._journal)
+         if name == 'restore_placement'),
+        default=-1)
+    self._checkpoint = self._workers[0].snapshot()
+    self._journal = [
+        call for i, call in enumerate(self._journal)
+        if i == last_restore or not _is_placement_mutation(call[0])
+    ]
+    self._checkpoint_index = len(self._journal)
+
+  def _respawn(self) -> plc_client.PlacementCost:
+    plc = self._create_placement_cost_fn()
+    if self._checkpoint_index:
+      plc.call_many(self._journal[:self._checkpoint_index])
+    if self._checkpoint is not None:
+      plc.restore(self._checkpoint)
+    if len(self._journal) > self._checkpoint_index:
+      plc.call_many(self._journal[self._checkpoint_index:])
+    return plc
+
+  def map(self, fn: Callable[[plc_client.PlacementCost, _T], _R],
+          items: Iterable[_T]) -> List[_R]:
+    """Runs `fn(plc, item)` for every item on the idle workers.
+
+    The mutations `fn` makes on `plc` are undone once it returns: node moves
+    and settings are restored, for other mutations, e.g.
+    `make_soft_macros_square`, the worker is replaced by a new one.
+
+    Args:
+      fn: The job. It gets a worker in the state of the pool and an item.
+      items: The items.
+
+    Returns:
+      The results of the jobs in the order of the items.
+    """
+
+    def run(item: _T) -> _R:
+      index = self._idle_workers.get()
+      try:
+        plc = _JobPlacementCost(self._workers[index], self._node_indices)
+        try:
+          return fn(plc, item)
+        finally:
+          if plc.needs_respawn:
+            self._workers[index] = self._respawn()
+          else:
+            plc.undo()
+      finally:
+        self._idle_workers.put(index)
+
+    return list(self._executor.map(run, items))
+
+  def close(self) -> None:
+    self._executor.shutdown()
+    self._workers = []
+
+  def __enter__(self) -> 'PlacementCostPool':
+    return self
+
+  def __exit__(self, *unused_args) -> None:
+    self.close()
+
+
+def map_jobs(plc: Any, fn: Callable[[plc_client.PlacementCost, _T], _R],
+             items: Iterable[_T]) -> List[_R]:
+  """Runs `fn(plc, item)` for every item, in parallel if plc is a pool.
+
+  Unlike `PlacementCostPool.map`, the mutations made by `fn` on a single
+  PlacementCost are not undone.
+
+  Args:
+    plc: A PlacementCost or a PlacementCostPool.
+    fn: The job.
+    items: The items.
+
+  Returns:
+    The results of the jobs in the order of the items.
+  """
+  if isinstance(plc, PlacementCostPool):
+    return plc.map(fn, items)
+  return [fn(plc, item) for item in items]
@@ -0,0 +1,229 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for plc_pool."""
+
+import functools
+import os
+from unittest import mock
+
+from absl import flags
+from circuit_training.environment import placement_util
+from circuit_training.environment import plc_pool
+from circuit_training.utils import test_utils
+
+FLAGS = flags.FLAGS
+
+_TEST_DATA_DIR = 'circuit_training/environment/test_data/sample_clustered'
+
+
+def _create_placement_cost_fn():
+  # The NumPy backend does not need plc_wrapper_main.
+  test_data_dir = os.path.join(FLAGS.test_srcdir, _TEST_DATA_DIR)
+  return functools.partial(
+      placement_util.create_placement_cost,
+      netlist_file=os.path.join(test_data_dir, 'netlist.pb.txt'),
+      init_placement=os.path.join(test_data_dir, 'initial.plc'),
+      backend='numpy')
+
+
+def _cost_at(plc, location):
+  plc.place_node(2, location)
+  return plc.get_cost()
+
+
+class PlcPoolTest(test_utils.TestCase):
+
+  def setUp(self):
+    super(PlcPoolTest, self).setUp()
+    self._pool = plc_pool.PlacementCostPool(
+        _create_placement_cost_fn(), num_workers=3)
+    self.addCleanup(self._pool.close)
+
+  def _assert_workers_equal(self):
+    expected = placement_util.get_node_xy_coordinates(self._pool._workers[0])
+    for plc in self._pool._workers[1:]:
+      self.assertEqual(placement_util.get_node_xy_coordinates(plc), expected)
+
+  def test_broadcast(self):
+    self.assertEqual(self._pool.num_workers, 3)
+    self.assertTrue(self._pool.update_node_coords(2, 100.0, 100.0))
+    self._pool.call_many([('unplace_node', (3,)),
+                          ('set_placement_grid', (4, 4))])
+    for plc in self._pool._workers:
+      self.assertEqual(plc.get_node_location(2), (100.0, 100.0))
+      self.assertFalse(plc.is_node_placed(3))
+      self.assertEqual(plc.get_grid_num_columns_rows(), (4, 4))
+    self.assertEqual(self._pool.get_node_location(2), (100.0, 100.0))
+
+  def test_snapshot_restore(self):
+    snapshot = self._pool.snapshot()
+    self._pool.unplace_all_nodes()
+    self._pool.restore(snapshot)
+    for plc in self._pool._workers:
+      self.assertEqual(plc.get_node_location(2), (125.0, 375.0))
+      self.assertTrue(plc.is_node_placed(2))
+    self._assert_workers_equal()
+
+    def job(plc, unused_item):
+      plc.restore(snapshot)
+      return plc.is_node_placed(3)
+
+    self._pool.unplace_node(3)
+    self.assertEqual(self._pool.map(job, [0, 1]), [True, True])
+    # The job's restore is undone.
+    for plc in self._pool._workers:
+      self.assertFalse(plc.is_node_placed(3))
+
+  def test_map(self):
+    plc = _create_placement_cost_fn()()
+    locations = list(range(4))
+    expected = [_cost_at(plc, loc) for loc in locations]
+    self.assertEqual(self._pool.map(_cost_at, locations), expected)
+    # The jobs are undone.
+    for worker in self._pool._workers:
+      self.assertEqual(worker.get_node_location(2), (125.0, 375.0))
+    self._assert_workers_equal()
+
+  def test_map_undoes_settings(self):
+
+    def job(plc, grid_size):
+      plc.set_placement_grid(*grid_size)
+      plc.unplace_all_nodes()
+      plc.update_macro_orientation(3, 'FN')
+      return plc.get_grid_num_columns_rows()
+
+    grid_sizes = [(3, 3), (4, 4), (5, 5)]
+    self.assertEqual(self._pool.map(job, grid_sizes), grid_sizes)
+    for worker in self._pool._workers:
+      self.assertEqual(worker.get_grid_num_columns_rows(), (2, 2))
+      self.assertEqual(worker.get_macro_orientation(3), 'N')
+      self.assertTrue(worker.is_node_placed(2))
+      self.assertTrue(worker.is_node_fixed(0))
+    self._assert_workers_equal()
+
+  def test_map_respawns(self):
+    self._pool.update_node_coords(2, 100.0, 100.0)
+    workers = list(self._pool._workers)
+
+    def job(plc, unused_item):
+      plc.make_soft_macros_square()
+      return plc.get_node_width_height(8)
+
+    self._pool.map(job, [0])
+    respawned = [
+        old is not new for old, new in zip(workers, self._pool._workers)
+    ]
+    self.assertEqual(sum(respawned), 1)
+    # The new worker replayed the mutations made on the pool.
+    self._assert_workers_equal()
+
+  def test_map_undo_calls(self):
+    calls = []
+    for worker in self._pool._workers:
+      call_many = worker.call_many
+      self.enter_context(
+          mock.patch.object(
+              worker,
+              'call_many',
+              side_effect=lambda c, f=call_many: calls.extend(c) or f(c)))
+
+    def job(plc, unused_item):
+      plc.unplace_all_nodes()
+      plc.update_macro_orientation(3, 'FS')
+
+    self._pool.map(job, [0])
+    # Like a snapshot, only the macros are asked for their orientation and
+    # only the hard macros have one to restore.
+    self.assertContainsSubset(
+        [args[0] for name, args in calls if name == 'get_macro_orientation'],
+        [2, 3, 8])
+    self.assertEqual(
+        sorted(args[0] for name, args in calls
+               if name == 'update_macro_orientation'), [2, 3])
+    for worker in self._pool._workers:
+      self.assertEqual(worker.get_macro_orientation(3), 'N')
+      self.assertTrue(worker.is_node_placed(8))
+    self._assert_workers_equal()
+
+  def test_map_undoes_mutations_by_name(self):
+
+    def job(plc, location):
+      plc.update_node_coords_by_name('M0', *location)
+      plc.update_macro_orientation_by_name('M1', 'FS')
+      plc.unplace_node_by_name('Grp_2')
+      return plc.get_node_location(2)
+
+    locations = [(10.0, 20.0), (30.0, 40.0)]
+    workers = list(self._pool._workers)
+    self.assertEqual(self._pool.map(job, locations), locations)
+    self.assertEqual(self._pool._workers, workers)
+    for worker in self._pool._workers:
+      self.assertEqual(worker.get_node_location(2), (125.0, 375.0))
+      self.assertEqual(worker.get_macro_orientation(3), 'N')
+      self.assertTrue(worker.is_node_placed(8))
+    self._assert_workers_equal()
+
+  def test_map_respawns_for_unknown_names(self):
+    workers = list(self._pool._workers)
+
+    def job(plc, unused_item):
+      try:
+        plc.unplace_node_by_name('Unknown')
+      except ValueError:
+        pass
+
+    self._pool.map(job, [0])
+    respawned = [
+        old is not new for old, new in zip(workers, self._pool._workers)
+    ]
+    self.assertEqual(sum(respawned), 1)
+    self._assert_workers_equal()
+
+  def test_checkpoint(self):
+    self.enter_context(mock.patch.object(plc_pool, '_MAX_JOURNAL_CALLS', 4))
+    self._pool.set_placement_grid(4, 4)
+    for x in range(10):
+      self._pool.update_node_coords(2, float(x), 100.0)
+    self._pool.update_macro_orientation(3, 'FS')
+    # The node moves are replaced by a snapshot.
+    self.assertLessEqual(len(self._pool._journal), 5)
+    self.assertEqual(self._pool._journal[0], ('set_placement_grid', (4, 4)))
+
+    def job(plc, unused_item):
+      plc.make_soft_macros_square()
+
+    self._pool.map(job, [0])
+    # The new worker replayed the checkpoint.
+    for worker in self._pool._workers:
+      self.assertEqual(worker.get_node_location(2), (9.0, 100.0))
+      self.assertEqual(worker.get_macro_orientation(3), 'FS')
+      self.assertEqual(worker.get_grid_num_columns_rows(), (4, 4))
+    self._assert_workers_equal()
+
+  def test_map_jobs_without_pool(self):
+    plc = _create_placement_cost_fn()()
+    self.assertEqual(
+        plc_pool.map_jobs(plc, _cost_at, [0, 1]),
+        self._pool.map(_cost_at, [0, 1]))
+    # Without a pool the mutations stay.
+    self.assertEqual(plc.get_grid_cell_of_node(2), 1)
+
+  def test_invalid_num_workers(self):
+    with self.assertRaises(ValueError):
+      plc_pool.PlacementCostPool(_create_placement_cost_fn(), num_workers=0)
+
+
+if __name__ == '__main__':
+  test_utils.main()
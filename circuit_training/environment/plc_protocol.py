@@ -0,0 +1,319 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Wire protocol helpers for talking to plc_wrapper_main.
+
+The legacy protocol sends a JSON request and reads the reply until the bytes
+parse as JSON. The framed protocol prefixes every message with a fixed size
+header holding the payload encoding and length, so the reader knows up front
+how many bytes to expect and reads them with `recv_into` into a reusable
+buffer. Replies that are flat numeric lists may optionally be sent as raw
+little-endian arrays instead of JSON text.
+
+Frame layout:
+  | encoding (1 byte) | payload length (8 bytes, big-endian) | payload |
+
+Array payload layout:
+  | dtype code (1 byte) | raw little-endian array data |
+
+With a `SharedArrayBuffer`, a memory mapped file that plc_wrapper_main also
+maps, the numeric lists of a JSON reply may instead be written to the buffer
+and replaced in the JSON by a reference:
+  {"__shared_array__": [dtype code, byte offset, number of values]}
+"""
+
+import json
+import mmap
+import os
+import socket
+import struct
+import tempfile
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+HEADER = struct.Struct('!cQ')
+
+# Name of the method that runs a list of calls and replies with a list of
+# results, see `encode_batch_request`.
+BATCH_METHOD = 'CallMany'
+
+ENCODING_JSON = b'J'
+ENCODING_ARRAY = b'A'
+
+_ARRAY_DTYPES = {
+    b'i': np.dtype('<i4'),
+    b'q': np.dtype('<i8'),
+    b'f': np.dtype('<f4'),
+    b'd': np.dtype('<f8'),
+}
+_ARRAY_CODES = {dtype: code for code, dtype in _ARRAY_DTYPES.items()}
+
+
+_SHARED_ARRAY_KEY = '__shared_array__'
+# Shorter numeric lists stay in the JSON, e.g. the (x, y) of a node.
+MIN_SHARED_ARRAY_SIZE = 64
+
+# Directory of the shared memory files, a tmpfs if there is one.
+_SHARED_MEMORY_DIR = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+
+class SharedArrayBuffer(object):
+  """A memory mapped file holding the raw arrays of the replies."""
+
+  def __init__(self, size: int, path: Optional[str] = None) -> None:
+    """Creates the file and maps it.
+
+    Args:
+      size: Size of the buffer in bytes.
+      path: Path of the file. By default a new file in /dev/shm.
+    """
+    if path is None:
+      fd, path = tempfile.mkstemp(prefix='plc_', dir=_SHARED_MEMORY_DIR)
+    else:
+      fd = os.open(path, os.O_RDWR | os.O_CREAT)
+    try:
+      os.ftruncate(fd, size)
+      self._mmap = mmap.mmap(fd, size)
+    finally:
+      os.close(fd)
+    self.path = path
+    self.size = size
+
+  def array(self, code: str, offset: int, count: int) -> np.ndarray:
+    """Returns a view of `count` values of type `code` at `offset`."""
+    dtype = _ARRAY_DTYPES.get(code.encode('ascii'))
+    if dtype is None:
+      raise ValueError(f'Unknown array dtype code: {code}.')
+    if offset < 0 or count < 0 or offset + count * dtype.itemsize > self.size:
+      raise ValueError(f'Shared array out of bounds: {count} values of type '
+                       f'{code} at offset {offset}.')
+    return np.frombuffer(self._mmap, dtype=dtype, count=count, offset=offset)
+
+  def write_array(self, values: np.ndarray, offset: int) -> Dict[str, Any]:
+    """Writes the values at `offset` and returns the reference to them."""
+    values = np.asarray(values)
+    dtype = values.dtype.newbyteorder('<')
+    if dtype not in _ARRAY_CODES:
+      raise ValueError(f'Unsupported array dtype: {values.dtype}.')
+    data = values.astype(dtype, copy=False).tobytes()
+    if offset + len(data) > self.size:
+      raise ValueError(f'{len(data)} bytes do not fit at offset {offset}.')
+    self._mmap[offset:offset + len(data)] = data
+    return {_SHARED_ARRAY_KEY: [_ARRAY_CODES[dtype].decode('ascii'), offset,
+                                values.size]}
+
+  def close(self) -> None:
+    self._mmap.close()
+    if os.path.exists(self.path):
+      os.unlink(self.path)
+
+
+def to_pascal_case(name: str) -> str:
+  """Converts a snake_case method name to the PascalCase name of the RPC."""
+  return name.replace('_', ' ').title().replace(' ', '')
+
+
+def encode_request(name: str, args: Sequence[Any]) -> bytes:
+  """Returns the JSON encoded request for calling `name` with `args`."""
+  return json.dumps({'name': name, 'args': args}).encode('utf-8')
+
+
+def encode_batch_request(calls: Sequence[Tuple[str, Sequence[Any]]]) -> bytes:
+  """Returns a single request that runs all the (name, args) calls in order."""
+  return encode_request(BATCH_METHOD,
+                        [[name, list(args)] for name, args in calls])
+
+
+def encode_frame(payload: bytes, encoding: bytes = ENCODING_JSON) -> bytes:
+  """Prefixes the payload with the frame header."""
+  return HEADER.pack(encoding, len(payload)) + payload
+
+
+def encode_array(values: np.ndarray) -> bytes:
+  """Returns an array frame holding the values."""
+  values = np.asarray(values)
+  dtype = values.dtype.newbyteorder('<')
+  if dtype not in _ARRAY_CODES:
+    raise ValueError(f'Unsupported array dtype: {values.dtype}.')
+  payload = _ARRAY_CODES[dtype] + values.astype(dtype, copy=False).tobytes()
+  return encode_frame(payload, ENCODING_ARRAY)
+
+
+def _is_numeric_list(obj: Any) -> bool:
+  return (isinstance(obj, list) and bool(obj) and all(
+      isinstance(v, (int, float)) and not isinstance(v, bool) for v in obj))
+
+
+def _numeric_array(values: Sequence[Any]) -> np.ndarray:
+  if all(isinstance(v, int) for v in values):
+    return np.asarray(values, dtype='<i8')
+  return np.asarray(values, dtype='<f8')
+
+
+def _share_arrays(obj: Any, shared_buffer: SharedArrayBuffer,
+                  offset: int) -> Tuple[Any, int]:
+  """Moves the numeric lists of obj that fit to the buffer, from `offset`."""
+  if _is_numeric_list(obj) and len(obj) >= MIN_SHARED_ARRAY_SIZE:
+    values = _numeric_array(obj)
+    if offset + values.nbytes <= shared_buffer.size:
+      return shared_buffer.write_array(values, offset), offset + values.nbytes
+    return obj, offset
+  if isinstance(obj, list):
+    items = []
+    for item in obj:
+      item, offset = _share_arrays(item, shared_buffer, offset)
+      items.append(item)
+    return items, offset
+  if isinstance(obj, dict):
+    shared = {}
+    for key, value in obj.items():
+      shared[key], offset = _share_arrays(value, shared_buffer, offset)
+    return shared, offset
+  return obj, offset
+
+
+def encode_reply(obj: Any,
+                 binary_arrays: bool = False,
+                 shared_buffer: Optional[SharedArrayBuffer] = None) -> bytes:
+  """Encodes a reply the way plc_wrapper_main does in framed mode.
+
+  Args:
+    obj: The (JSON serializable) reply.
+    binary_arrays: If set, flat numeric lists are sent as raw arrays.
+    shared_buffer: If set, the numeric lists in the reply with at least
+      MIN_SHARED_ARRAY_SIZE values are written to the buffer, from its start,
+      as long as they fit.
+
+  Returns:
+    The framed reply.
+  """
+  if shared_buffer is not None:
+    obj, _ = _share_arrays(obj, shared_buffer, 0)
+  elif binary_arrays and _is_numeric_list(obj):
+    return encode_array(_numeric_array(obj))
+  return encode_frame(json.dumps(obj).encode('utf-8'))
+
+
+def recv_exactly_into(conn: socket.socket, view: memoryview) -> None:
+  """Fills the view from the socket.
+
+  Args:
+    conn: A connected socket.
+    view: The writable memoryview to fill.
+
+  Raises:
+    ConnectionError: If the peer closes the connection before the view is
+      filled.
+  """
+  received = 0
+  size = len(view)
+  while received < size:
+    n = conn.recv_into(view[received:], size - received)
+    if not n:
+      raise ConnectionError(
+          f'Connection closed after {received} of {size} bytes.')
+    received += n
+
+
+def decode_payload(
+    encoding: bytes,
+    payload: memoryview,
+    shared_buffer: Optional[SharedArrayBuffer] = None) -> Any:
+  """Decodes a frame payload.
+
+  Args:
+    encoding: The encoding of the frame.
+    payload: The payload.
+    shared_buffer: The buffer the shared array references of the reply point
+      to. The arrays are copied out of it, since the next reply reuses it.
+
+  Returns:
+    The decoded reply. The shared arrays are returned as numpy arrays.
+  """
+  if encoding == ENCODING_JSON:
+    if shared_buffer is None:
+      return json.loads(str(payload, 'utf-8'))
+
+    def object_hook(obj):
+      if _SHARED_ARRAY_KEY in obj:
+        return shared_buffer.array(*obj[_SHARED_ARRAY_KEY]).copy()
+      return obj
+
+    return json.loads(str(payload, 'utf-8'), object_hook=object_hook)
+  if encoding == ENCODING_ARRAY:
+    dtype = _ARRAY_DTYPES.get(bytes(payload[:1]))
+    if dtype is None:
+      raise ValueError(f'Unknown array dtype code: {bytes(payload[:1])}.')
+    return np.frombuffer(payload, dtype=dtype, offset=1).tolist()
+  raise ValueError(f'Unknown frame encoding: {encoding}.')
+
+
+class FrameReader(object):
+  """Reads frames from a socket into a preallocated, growable buffer."""
+
+  def __init__(self, initial_size: int = 1024 * 1024):
+    self._buffer = bytearray(initial_size)
+    self._header = bytearray(HEADER.size)
+
+  def read(self, conn: socket.socket) -> Tuple[bytes, memoryview]:
+    """Reads one frame.
+
+    The returned view aliases the internal buffer and is only valid until the
+    next call to `read`.
+
+    Args:
+      conn: A connected socket.
+
+    Returns:
+      A tuple of the payload encoding and a view of the payload.
+    """
+    recv_exactly_into(conn, memoryview(self._header))
+    encoding, size = HEADER.unpack(self._header)
+    if size > len(self._buffer):
+      self._buffer = bytearray(max(size, 2 * len(self._buffer)))
+    view = memoryview(self._buffer)[:size]
+    recv_exactly_into(conn, view)
+    return encoding, view
+
+  def read_object(
+      self,
+      conn: socket.socket,
+      shared_buffer: Optional[SharedArrayBuffer] = None) -> Any:
+    """Reads and decodes one frame."""
+    encoding, view = self.read(conn)
+    return decode_payload(encoding, view, shared_buffer)
+
+
+def parse_reply(name: str, args: Sequence[Any], output: Any) -> Any:
+  """Converts a decoded reply to the value returned to the caller.
+
+  Args:
+    name: The PascalCase name of the called method.
+    args: The arguments of the call.
+    output: The decoded reply.
+
+  Returns:
+    The reply with tuples restored.
+
+  Raises:
+    ValueError: If the reply is a `Status::NotOk`.
+  """
+  if isinstance(output, dict):
+    if 'ok' in output and not output['ok']:  # Status::NotOk
+      raise ValueError(
+          f"Error in calling {name} with {args}: {output['message']}.")
+    elif '__tuple__' in output:  # Tuple
+      output = tuple(output['items'])
+  return output
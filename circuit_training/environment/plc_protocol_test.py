@@ -0,0 +1,138 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for plc_protocol."""
+
+import json
+import socket
+import threading
+
+from absl.testing import absltest
+from circuit_training.environment import plc_protocol
+import numpy as np
+
+
+class PlcProtocolTest(absltest.TestCase):
+
+  def setUp(self):
+    super(PlcProtocolTest, self).setUp()
+    self._client, self._server = socket.socketpair()
+
+  def tearDown(self):
+    self._client.close()
+    self._server.close()
+    super(PlcProtocolTest, self).tearDown()
+
+  def test_json_frame(self):
+    reply = {'__tuple__': True, 'items': [1.0, 2.0]}
+    self._server.sendall(plc_protocol.encode_reply(reply))
+    reader = plc_protocol.FrameReader(initial_size=4)
+    output = reader.read_object(self._client)
+    self.assertEqual(plc_protocol.parse_reply('Foo', [], output), (1.0, 2.0))
+
+  def test_array_frames(self):
+    mask = [0, 1, 1, 0] * 1000
+    density = [0.25, 0.5, 0.75]
+    self._server.sendall(plc_protocol.encode_reply(mask, binary_arrays=True))
+    self._server.sendall(plc_protocol.encode_reply(density, binary_arrays=True))
+    reader = plc_protocol.FrameReader(initial_size=16)
+    self.assertEqual(reader.read_object(self._client), mask)
+    self.assertEqual(reader.read_object(self._client), density)
+
+  def test_non_numeric_lists_stay_json(self):
+    frame = plc_protocol.encode_reply(['N', 'S'], binary_arrays=True)
+    encoding, _ = plc_protocol.HEADER.unpack(frame[:plc_protocol.HEADER.size])
+    self.assertEqual(encoding, plc_protocol.ENCODING_JSON)
+
+  def test_shared_arrays(self):
+    shared_buffer = plc_protocol.SharedArrayBuffer(size=1024 * 1024)
+    self.addCleanup(shared_buffer.close)
+    mask = [0, 1] * 1000
+    adjacency = [0.5] * 100
+    reply = [
+        mask, {'__tuple__': True, 'items': [adjacency, [1, 2]]}, [1.0, 2.0]
+    ]
+    frame = plc_protocol.encode_reply(reply, shared_buffer=shared_buffer)
+    # Only the short lists are left in the JSON.
+    self.assertLess(len(frame), 200)
+    self._server.sendall(frame)
+    output = plc_protocol.FrameReader().read_object(self._client,
+                                                    shared_buffer)
+    self.assertIsInstance(output[0], np.ndarray)
+    self.assertEqual(output[0].tolist(), mask)
+    self.assertEqual(output[1]['items'][0].tolist(), adjacency)
+    self.assertEqual(output[1]['items'][1], [1, 2])
+    self.assertEqual(output[2], [1.0, 2.0])
+
+    # The arrays are copies, the next reply can reuse the buffer.
+    self._server.sendall(
+        plc_protocol.encode_reply([7] * 2000, shared_buffer=shared_buffer))
+    plc_protocol.FrameReader().read_object(self._client, shared_buffer)
+    self.assertEqual(output[0].tolist(), mask)
+
+  def test_shared_arrays_that_do_not_fit_stay_json(self):
+    shared_buffer = plc_protocol.SharedArrayBuffer(size=64)
+    self.addCleanup(shared_buffer.close)
+    mask = [1] * 1000
+    frame = plc_protocol.encode_reply(mask, shared_buffer=shared_buffer)
+    self._server.sendall(frame)
+    self.assertEqual(
+        plc_protocol.FrameReader().read_object(self._client, shared_buffer),
+        mask)
+
+  def test_shared_array_out_of_bounds(self):
+    shared_buffer = plc_protocol.SharedArrayBuffer(size=64)
+    self.addCleanup(shared_buffer.close)
+    with self.assertRaises(ValueError):
+      shared_buffer.array('q', 32, 8)
+
+  def test_large_frame_in_many_chunks(self):
+    values = np.arange(300000, dtype=np.int32)
+    frame = plc_protocol.encode_array(values)
+
+    def send_in_chunks():
+      for i in range(0, len(frame), 4096):
+        self._server.sendall(frame[i:i + 4096])
+
+    sender = threading.Thread(target=send_in_chunks)
+    sender.start()
+    output = plc_protocol.FrameReader().read_object(self._client)
+    sender.join()
+    self.assertEqual(output, values.tolist())
+
+  def test_closed_connection(self):
+    self._server.sendall(plc_protocol.encode_frame(b'{}')[:5])
+    self._server.close()
+    with self.assertRaises(ConnectionError):
+      plc_protocol.FrameReader().read(self._client)
+
+  def test_batch_request(self):
+    request = plc_protocol.encode_batch_request([('GetNodeType', (3,)),
+                                                 ('GetCost', [])])
+    self.assertEqual(
+        json.loads(request), {
+            'name': 'CallMany',
+            'args': [['GetNodeType', [3]], ['GetCost', []]],
+        })
+
+  def test_error_reply(self):
+    with self.assertRaisesRegex(ValueError, 'bad node'):
+      plc_protocol.parse_reply('GetNodeMask', [-1], {
+          'ok': False,
+          'message': 'bad node'
+      })
+
+
+if __name__ == '__main__':
+  absltest.main()
@@ -0,0 +1,116 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Per-method statistics of the calls to plc_wrapper_main.
+
+plc_client.PlacementCost records every call in `RPC_STATS`, shared by all the
+clients of the process:
+
+  print(plc_stats.format_stats(plc_stats.RPC_STATS.snapshot()))
+"""
+
+import collections
+import threading
+from typing import Any, Dict, Text
+
+import numpy as np
+
+# Number of latencies kept per method for the percentiles.
+_MAX_LATENCIES = 10000
+
+
+class _MethodStats(object):
+
+  def __init__(self):
+    self.count = 0
+    self.total_seconds = 0.0
+    self.request_bytes = 0
+    self.response_bytes = 0
+    self.json_retries = 0
+    self.latencies = collections.deque(maxlen=_MAX_LATENCIES)
+
+
+class RpcStats(object):
+  """Call counts, latencies, bytes and retries per method. Thread-safe."""
+
+  def __init__(self):
+    self._lock = threading.Lock()
+    self._methods = collections.defaultdict(_MethodStats)
+
+  def record(self, method: Text, seconds: float, request_bytes: int,
+             response_bytes: int) -> None:
+    """Records a call of `method`."""
+    with self._lock:
+      stats = self._methods[method]
+      stats.count += 1
+      stats.total_seconds += seconds
+      stats.request_bytes += request_bytes
+      stats.response_bytes += response_bytes
+      stats.latencies.append(seconds)
+
+  def record_json_retry(self, method: Text) -> None:
+    """Records an extra read of an incomplete JSON reply of `method`."""
+    with self._lock:
+      self._methods[method].json_retries += 1
+
+  def snapshot(self) -> Dict[Text, Dict[Text, Any]]:
+    """Returns the statistics per method.
+
+    Returns:
+      A dict from the method name to a dict with the number of calls, the
+      total, p50 and p99 latencies in seconds (the percentiles are over the
+      last 10000 calls), the request and response bytes and the JSON decode
+      retries.
+    """
+    with self._lock:
+      snapshot = {}
+      for method, stats in self._methods.items():
+        latencies = np.asarray(stats.latencies)
+        p50, p99 = (
+            np.percentile(latencies, [50, 99]) if latencies.size else (0, 0))
+        snapshot[method] = {
+            'count': stats.count,
+            'total_seconds': stats.total_seconds,
+            'p50_seconds': float(p50),
+            'p99_seconds': float(p99),
+            'request_bytes': stats.request_bytes,
+            'response_bytes': stats.response_bytes,
+            'json_retries': stats.json_retries,
+        }
+      return snapshot
+
+  def reset(self) -> None:
+    with self._lock:
+      self._methods.clear()
+
+
+def format_stats(snapshot: Dict[Text, Dict[Text, Any]]) -> Text:
+  """Returns a table of the snapshot, the slowest methods in total first."""
+  lines = [
+      f'{"method":<40}{"count":>10}{"total s":>12}{"p50 ms":>10}'
+      f'{"p99 ms":>10}{"req KB":>12}{"resp KB":>12}{"retries":>9}'
+  ]
+  for method, stats in sorted(
+      snapshot.items(), key=lambda item: -item[1]['total_seconds']):
+    lines.append(f'{method:<40}{stats["count"]:>10}'
+                 f'{stats["total_seconds"]:>12.3f}'
+                 f'{stats["p50_seconds"] * 1e3:>10.3f}'
+                 f'{stats["p99_seconds"] * 1e3:>10.3f}'
+                 f'{stats["request_bytes"] / 1024:>12.1f}'
+                 f'{stats["response_bytes"] / 1024:>12.1f}'
+                 f'{stats["json_retries"]:>9}')
+  return '\n'.join(lines)
+
+
+RPC_STATS = RpcStats()
@@ -0,0 +1,52 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for plc_stats."""
+
+from absl.testing import absltest
+from circuit_training.environment import plc_stats
+
+
+class PlcStatsTest(absltest.TestCase):
+
+  def test_snapshot(self):
+    stats = plc_stats.RpcStats()
+    for i in range(100):
+      stats.record('GetNodeMask', (i + 1) * 1e-3, 40, 1000)
+    stats.record('GetCost', 0.5, 30, 20)
+    stats.record_json_retry('GetNodeMask')
+
+    snapshot = stats.snapshot()
+    self.assertCountEqual(snapshot, ['GetNodeMask', 'GetCost'])
+    mask = snapshot['GetNodeMask']
+    self.assertEqual(mask['count'], 100)
+    self.assertAlmostEqual(mask['total_seconds'], 5.05)
+    self.assertAlmostEqual(mask['p50_seconds'], 0.0505)
+    self.assertAlmostEqual(mask['p99_seconds'], 0.09901)
+    self.assertEqual(mask['request_bytes'], 4000)
+    self.assertEqual(mask['response_bytes'], 100000)
+    self.assertEqual(mask['json_retries'], 1)
+    self.assertEqual(snapshot['GetCost']['p99_seconds'], 0.5)
+
+    # The slowest method in total comes first.
+    lines = plc_stats.format_stats(snapshot).splitlines()
+    self.assertLen(lines, 3)
+    self.assertTrue(lines[1].startswith('GetNodeMask'))
+
+    stats.reset()
+    self.assertEmpty(stats.snapshot())
+
+
+if __name__ == '__main__':
+  absltest.main()
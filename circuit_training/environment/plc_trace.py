@@ -0,0 +1,96 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Traces of the calls to plc_wrapper_main.
+
+With --plc_record_traces_dir, every plc_client.PlacementCost writes the
+requests it sends to plc_wrapper_main, the decoded replies and the latencies
+to a trace file. plc_client.ReplayPlacementCost answers the same calls from the
+trace, without plc_wrapper_main:
+
+  plc = plc_client.ReplayPlacementCost(trace_file)
+
+A trace is a gzipped JSON lines file: a header with the settings of the
+recorded client, then one line per request.
+"""
+
+import gzip
+import json
+from typing import Any, Dict, List, Text, Tuple
+
+import numpy as np
+
+
+def _array_to_list(obj: Any) -> Any:
+  if isinstance(obj, np.ndarray):
+    return obj.tolist()
+  raise TypeError(f'{type(obj)} is not JSON serializable.')
+
+
+class TraceWriter(object):
+  """Writes a trace file."""
+
+  def __init__(self, path: Text, header: Dict[Text, Any]) -> None:
+    self._file = gzip.open(path, 'wt', encoding='utf-8')
+    self._write(header)
+
+  def _write(self, obj: Any) -> None:
+    # The arrays of --plc_shared_memory_mb replies are written as lists.
+    self._file.write(
+        json.dumps(obj, separators=(',', ':'), default=_array_to_list))
+    self._file.write('\n')
+
+  def write(self, name: Text, request: bytes, output: Any,
+            seconds: float) -> None:
+    """Writes a request, its decoded reply and its latency."""
+    self._write({
+        'name': name,
+        'request': request.decode('utf-8'),
+        'output': output,
+        'seconds': seconds,
+    })
+
+  def close(self) -> None:
+    self._file.close()
+
+
+def read_trace(path: Text) -> Tuple[Dict[Text, Any], List[Dict[Text, Any]]]:
+  """Returns the header and the records of a trace file.
+
+  A trace cut short, e.g. by a crash of the recording process, is read up to
+  its last complete record.
+
+  Args:
+    path: Path to the trace file.
+
+  Returns:
+    The header and the list of records, dicts with the 'name' of the method,
+    the 'request', the decoded reply 'output' and its latency in 'seconds'.
+  """
+  lines = []
+  with gzip.open(path, 'rt', encoding='utf-8') as f:
+    try:
+      for line in f:
+        lines.append(line)
+    except EOFError:
+      pass
+  records = []
+  for line in lines:
+    try:
+      records.append(json.loads(line))
+    except json.decoder.JSONDecodeError:
+      break
+  if not records:
+    raise ValueError(f'Empty trace file: {path}.')
+  return records[0], records[1:]
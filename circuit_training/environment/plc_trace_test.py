@@ -0,0 +1,114 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for plc_trace and plc_client.ReplayPlacementCost."""
+
+import os
+
+from absl import flags
+from circuit_training.environment import plc_client
+from circuit_training.environment import plc_numpy
+from circuit_training.environment import plc_protocol
+from circuit_training.environment import plc_trace
+from circuit_training.utils import test_utils
+
+FLAGS = flags.FLAGS
+
+_NETLIST_FILE = ('circuit_training/environment/test_data/sample_clustered/'
+                 'netlist.pb.txt')
+
+
+def _to_json(obj):
+  if isinstance(obj, tuple):
+    return {'__tuple__': True, 'items': list(obj)}
+  return obj
+
+
+class PlcTraceTest(test_utils.TestCase):
+
+  def _create_trace(self, framed_protocol=False, netlist_file=''):
+    trace_file = self.create_tempfile().full_path
+    writer = plc_trace.TraceWriter(
+        trace_file, {
+            'netlist_file': netlist_file,
+            'framed_protocol': framed_protocol,
+            'cache_queries': False,
+        })
+    return trace_file, writer
+
+  def test_replay(self):
+    netlist_file = os.path.join(FLAGS.test_srcdir, _NETLIST_FILE)
+    expected_plc = plc_numpy.PlacementCost(netlist_file)
+    trace_file, writer = self._create_trace(netlist_file=netlist_file)
+    calls = [('get_macro_indices', ()), ('update_node_coords', (2, 1.0, 2.0)),
+             ('get_node_location', (2,))]
+    for name, args in calls:
+      output = _to_json(getattr(expected_plc, name)(*args))
+      writer.write(
+          plc_protocol.to_pascal_case(name),
+          plc_protocol.encode_request(plc_protocol.to_pascal_case(name), args),
+          output, 0.01)
+    writer.close()
+
+    plc = plc_client.ReplayPlacementCost(trace_file)
+    self.assertEqual(plc.netlist_file, netlist_file)
+    self.assertEqual(plc.num_remaining_calls(), 3)
+    self.assertEqual(plc.get_macro_indices(), [2, 3, 8])
+    self.assertTrue(plc.update_node_coords(2, 1.0, 2.0))
+    self.assertEqual(plc.get_node_location(2), (1.0, 2.0))
+    self.assertEqual(plc.num_remaining_calls(), 0)
+    with self.assertRaises(ValueError):
+      plc.get_cost()
+
+  def test_replay_framed_call_many(self):
+    trace_file, writer = self._create_trace(framed_protocol=True)
+    batch = [('GetNodeType', [2]), ('GetNodeLocation', [3])]
+    writer.write(plc_protocol.BATCH_METHOD,
+                 plc_protocol.encode_batch_request(batch),
+                 ['MACRO', _to_json((375.0, 375.0))], 0.01)
+    writer.close()
+
+    plc = plc_client.ReplayPlacementCost(trace_file, simulate_latency=True)
+    self.assertEqual(
+        plc.call_many([('get_node_type', (2,)), ('get_node_location', (3,))]),
+        ['MACRO', (375.0, 375.0)])
+
+  def test_replay_mismatch(self):
+    trace_file, writer = self._create_trace()
+    writer.write('GetNodeType', plc_protocol.encode_request('GetNodeType', [2]),
+                 'MACRO', 0.01)
+    writer.close()
+
+    plc = plc_client.ReplayPlacementCost(trace_file)
+    with self.assertRaises(ValueError):
+      plc.get_node_type(3)
+
+  def test_read_truncated_trace(self):
+    trace_file = self.create_tempfile().full_path
+    writer = plc_trace.TraceWriter(trace_file, {'netlist_file': ''})
+    for i in range(100):
+      writer.write('GetNodeType', b'{}', i, 0.01)
+    writer.close()
+    with open(trace_file, 'rb') as f:
+      data = f.read()
+    with open(trace_file, 'wb') as f:
+      f.write(data[:len(data) // 2])
+    header, records = plc_trace.read_trace(trace_file)
+    self.assertEqual(header, {'netlist_file': ''})
+    self.assertLess(len(records), 100)
+    self.assertEqual([r['output'] for r in records], list(range(len(records))))
+
+
+if __name__ == '__main__':
+  test_utils.main()
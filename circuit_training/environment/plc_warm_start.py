@@ -0,0 +1,101 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Keeps pre-started processes, e.g. plc_wrapper_main, ready to be handed out.
+
+plc_wrapper_main parses the netlist when it starts, which dominates the startup
+of short jobs. With --plc_warm_processes, plc_client.PlacementCost takes a
+plc_wrapper_main that was started in the background for the same netlist, and
+a replacement is started right away for the next client:
+
+  cache = plc_warm_start.WarmStartCache(start_fn, stop_fn, num_spares=2,
+                                        max_keys=4)
+  process = cache.acquire(key)  # start_fn(key), started ahead of time.
+
+The spares of the `max_keys` most recently acquired keys are kept, the ones of
+the other keys are stopped. The first acquire of a key waits for a full start.
+"""
+
+import collections
+import concurrent.futures
+import threading
+from typing import Callable, Generic, Hashable, TypeVar
+
+_K = TypeVar('_K', bound=Hashable)
+_V = TypeVar('_V')
+
+
+class WarmStartCache(Generic[_K, _V]):
+  """An LRU of keys, each with spare values started in the background."""
+
+  def __init__(self, start_fn: Callable[[_K], _V],
+               stop_fn: Callable[[_V], None], num_spares: int,
+               max_keys: int) -> None:
+    """Creates the cache.
+
+    Args:
+      start_fn: Starts and returns the value of a key, e.g. a connected
+        plc_wrapper_main. Called from background threads.
+      stop_fn: Stops a spare value that will not be handed out.
+      num_spares: Number of values kept started per key.
+      max_keys: Number of keys that keep spares.
+    """
+    if num_spares < 1 or max_keys < 1:
+      raise ValueError('num_spares and max_keys should be positive, got '
+                       f'{num_spares} and {max_keys}.')
+    self._start_fn = start_fn
+    self._stop_fn = stop_fn
+    self._num_spares = num_spares
+    self._max_keys = max_keys
+    self._executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=num_spares * max_keys)
+    self._lock = threading.Lock()
+    # Key -> futures of the spare values, least recently acquired key first.
+    self._spares = collections.OrderedDict()
+
+  def acquire(self, key: _K) -> _V:
+    """Returns a spare value of `key`, or starts one if there is none."""
+    with self._lock:
+      spares = self._spares.pop(key, collections.deque())
+      self._spares[key] = spares
+      spare = spares.popleft() if spares else None
+      while len(spares) < self._num_spares:
+        spares.append(self._executor.submit(self._start_fn, key))
+      evicted = []
+      while len(self._spares) > self._max_keys:
+        evicted.extend(self._spares.popitem(last=False)[1])
+    for future in evicted:
+      self._stop(future)
+    if spare is None:
+      return self._start_fn(key)
+    return spare.result()
+
+  def _stop(self, future: 'concurrent.futures.Future[_V]') -> None:
+    if future.cancel():
+      return
+
+    def stop(future):
+      if future.exception() is None:
+        self._stop_fn(future.result())
+
+    future.add_done_callback(stop)
+
+  def close(self) -> None:
+    """Stops all the spare values."""
+    with self._lock:
+      spares = [f for futures in self._spares.values() for f in futures]
+      self._spares.clear()
+    for future in spares:
+      self._stop(future)
+    self._executor.shutdown()
@@ -0,0 +1,95 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for plc_warm_start."""
+
+import concurrent.futures
+import itertools
+import threading
+
+from circuit_training.environment import plc_warm_start
+from circuit_training.utils import test_utils
+
+
+class _FakeProcesses(object):
+  """Starts (key, id, thread name) tuples instead of processes."""
+
+  def __init__(self):
+    self._ids = itertools.count()
+    self._lock = threading.Lock()
+    self.stopped = []
+
+  def start(self, key):
+    with self._lock:
+      return (key, next(self._ids), threading.current_thread().name)
+
+  def stop(self, value):
+    with self._lock:
+      self.stopped.append(value)
+
+
+class PlcWarmStartTest(test_utils.TestCase):
+
+  def setUp(self):
+    super(PlcWarmStartTest, self).setUp()
+    self._processes = _FakeProcesses()
+    self._cache = plc_warm_start.WarmStartCache(
+        self._processes.start,
+        self._processes.stop,
+        num_spares=2,
+        max_keys=2)
+
+  def _wait_for_spares(self):
+    # The spares still starting when they are dropped are cancelled instead.
+    concurrent.futures.wait(
+        [f for futures in self._cache._spares.values() for f in futures])
+
+  def test_acquire(self):
+    main_thread = threading.current_thread().name
+    key, _, thread = self._cache.acquire('a')
+    # The first acquire of a key starts the value itself.
+    self.assertEqual((key, thread), ('a', main_thread))
+    values = [self._cache.acquire('a') for _ in range(3)]
+    self.assertEqual([key for key, _, _ in values], ['a'] * 3)
+    for _, _, thread in values:
+      self.assertNotEqual(thread, main_thread)
+    self.assertLen(set(values), 3)
+    self._wait_for_spares()
+    self._cache.close()
+    # The two spares left are stopped.
+    self.assertLen(self._processes.stopped, 2)
+
+  def test_evicts_least_recently_used(self):
+    self._cache.acquire('a')
+    self._cache.acquire('b')
+    self._cache.acquire('a')
+    self.assertEmpty(self._processes.stopped)
+    self._wait_for_spares()
+    self._cache.acquire('c')
+    self._wait_for_spares()
+    self._cache.close()
+    stopped_keys = [key for key, _, _ in self._processes.stopped]
+    # 'b' is evicted when 'c' is acquired, then close stops the rest.
+    self.assertEqual(stopped_keys[:2], ['b', 'b'])
+    self.assertCountEqual(stopped_keys[2:], ['a', 'a', 'c', 'c'])
+
+  def test_invalid_args(self):
+    with self.assertRaises(ValueError):
+      plc_warm_start.WarmStartCache(
+          self._processes.start, self._processes.stop, num_spares=0,
+          max_keys=1)
+
+
+if __name__ == '__main__':
+  test_utils.main()
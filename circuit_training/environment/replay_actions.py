@@ -0,0 +1,192 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Replays sequences of RL actions into placements and reports their costs.
+
+Each sequence has the action of every hard macro, in the node order of
+CircuitEnv, e.g. the `current_actions` of an episode or of a beam search. The
+macros are placed without masks or observations, the analytical placer places
+the soft macros, and the costs of `cost_info_fn` are reported:
+
+  create_env_fn = functools.partial(environment.CircuitEnv,
+                                    netlist_file=netlist_file,
+                                    init_placement=init_placement)
+  rows = replay_actions.replay_action_sequences(
+      create_env_fn, replay_actions.read_action_sequences(path), num_workers=8)
+  replay_actions.write_rows(rows, '/tmp/costs.csv')
+
+Identical sequences are replayed once. With several workers, each process has
+its own CircuitEnv, and the rows are yielded in the order of the sequences.
+"""
+
+import concurrent.futures
+import csv
+import itertools
+import re
+from typing import (Callable, Dict, Iterable, Iterator, List, Optional,
+                    Sequence, Text, Tuple, Union)
+
+from absl import logging
+from circuit_training.environment import environment
+import gin
+import numpy as np
+import tensorflow as tf
+
+ActionsType = Tuple[int, ...]
+RowType = Dict[Text, Union[Text, float]]
+
+# Columns of the rows, with the cost components of the info.
+COLUMNS = ('actions', 'cost') + tuple(environment.COST_COMPONENTS) + ('error',)
+
+# The CircuitEnv of a worker process.
+_worker_env = None
+
+
+def read_action_sequences(path: Text) -> Iterator[ActionsType]:
+  """Reads a sequence per line, its actions separated by spaces or commas."""
+  with tf.io.gfile.GFile(path) as f:
+    for line in f:
+      line = line.strip()
+      if line and not line.startswith('#'):
+        yield tuple(int(a) for a in re.split(r'[\s,]+', line))
+
+
+def dedupe(sequences: Iterable[Sequence[int]]) -> Iterator[ActionsType]:
+  """Yields the first occurrence of each sequence."""
+  seen = set()
+  num_duplicates = 0
+  for actions in sequences:
+    actions = tuple(int(a) for a in actions)
+    if actions in seen:
+      num_duplicates += 1
+      continue
+    seen.add(actions)
+    yield actions
+  logging.info('Skipped %d duplicate action sequences.', num_duplicates)
+
+
+def replay(env: environment.CircuitEnv, actions: ActionsType) -> RowType:
+  """Returns the row of the costs of a sequence, or of the error it raised."""
+  row = {column: np.nan for column in COLUMNS}
+  row['actions'] = ' '.join(str(a) for a in actions)
+  row['error'] = ''
+  try:
+    cost, info = env.replay(actions)
+  except (ValueError, environment.InfeasibleActionError) as e:
+    row['error'] = str(e)
+    return row
+  row['cost'] = float(cost)
+  for name in environment.COST_COMPONENTS:
+    row[name] = float(info[name])
+  return row
+
+
+def _init_worker(create_env_fn: Callable[[], environment.CircuitEnv],
+                 gin_bindings: Sequence[Text]) -> None:
+  global _worker_env
+  gin.parse_config(gin_bindings)
+  _worker_env = create_env_fn()
+
+
+def _replay_in_worker(actions: ActionsType) -> RowType:
+  return replay(_worker_env, actions)
+
+
+def replay_action_sequences(
+    create_env_fn: Callable[[], environment.CircuitEnv],
+    sequences: Iterable[Sequence[int]],
+    num_workers: int = 1,
+    chunk_size: int = 16,
+    gin_bindings: Optional[Sequence[Text]] = None) -> Iterator[RowType]:
+  """Replays the distinct sequences and yields their rows, in order.
+
+  Args:
+    create_env_fn: Creates a CircuitEnv, with the node order, grid size and
+      cost function the sequences are scored with. Must be picklable if
+      `num_workers` > 1, e.g. a functools.partial.
+    sequences: The actions of the hard macros of each placement.
+    num_workers: Number of processes, each with its own CircuitEnv.
+    chunk_size: Number of sequences sent at once to a process.
+    gin_bindings: Gin bindings parsed by each process before creating its env,
+      e.g. of `ObservationConfig.max_grid_size`.
+
+  Yields:
+    A row per distinct sequence, see `COLUMNS`.
+  """
+  sequences = dedupe(sequences)
+  if num_workers <= 1:
+    env = create_env_fn()
+    for actions in sequences:
+      yield replay(env, actions)
+    return
+  with concurrent.futures.ProcessPoolExecutor(
+      max_workers=num_workers,
+      initializer=_init_worker,
+      initargs=(create_env_fn, list(gin_bindings or []))) as executor:
+    # The sequences are submitted in batches, so that they are not all read
+    # before the first rows are written.
+    while True:
+      batch = list(itertools.islice(sequences, num_workers * chunk_size * 4))
+      if not batch:
+        return
+      yield from executor.map(
+          _replay_in_worker, batch, chunksize=chunk_size)
+
+
+def _write_csv(rows: Iterable[RowType], path: Text) -> int:
+  num_rows = 0
+  with tf.io.gfile.GFile(path, 'w') as f:
+    writer = csv.DictWriter(f, fieldnames=COLUMNS)
+    writer.writeheader()
+    for row in rows:
+      writer.writerow(row)
+      num_rows += 1
+  return num_rows
+
+
+def _write_parquet(rows: Iterable[RowType], path: Text,
+                   batch_size: int) -> int:
+  """Writes the rows with pyarrow, by batches of `batch_size` rows."""
+  import pyarrow as pa  # pylint: disable=g-import-not-at-top
+  from pyarrow import parquet as pq  # pylint: disable=g-import-not-at-top
+
+  schema = pa.schema([(c, pa.string() if c in ('actions', 'error') else
+                       pa.float64()) for c in COLUMNS])
+  num_rows = 0
+  with pq.ParquetWriter(path, schema) as writer:
+    while True:
+      batch: List[RowType] = list(itertools.islice(rows, batch_size))
+      if not batch:
+        return num_rows
+      writer.write_table(pa.Table.from_pylist(batch, schema=schema))
+      num_rows += len(batch)
+
+
+def write_rows(rows: Iterable[RowType],
+               path: Text,
+               batch_size: int = 1024) -> int:
+  """Streams the rows to a CSV file, or a Parquet file if it ends in .parquet.
+
+  Args:
+    rows: The rows, e.g. of `replay_action_sequences`.
+    path: The output file.
+    batch_size: Number of rows per Parquet row group.
+
+  Returns:
+    The number of rows written.
+  """
+  if path.endswith('.parquet'):
+    return _write_parquet(iter(rows), path, batch_size)
+  return _write_csv(rows, path)
+
@@ -0,0 +1,91 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+r"""Re-scores stored sequences of RL actions with the given cost weights.
+
+--actions_file has a sequence per line, the actions of the hard macros in the
+node order of CircuitEnv, separated by spaces or commas. The costs of the
+distinct sequences are written to --output_file, a CSV file or a Parquet file
+if its name ends in .parquet.
+
+Example usage:
+
+python circuit_training/environment/replay_actions_main.py
+--netlist_file "/path/to/netlist.pb.txt"
+--init_placement "/path/to/initial_placement.plc"
+--actions_file "/path/to/actions.txt"
+--output_file "/tmp/costs.csv"
+--num_workers 8
+"""
+
+import functools
+
+from absl import app
+from absl import flags
+from circuit_training.environment import environment
+from circuit_training.environment import placement_util
+from circuit_training.environment import replay_actions
+import gin
+
+flags.DEFINE_string('netlist_file', None, 'Path to netlist file.')
+flags.DEFINE_string('init_placement', None, 'Path to initial placement file.')
+flags.DEFINE_string('actions_file', None, 'Path to the action sequences.')
+flags.DEFINE_string('output_file', None, 'Path to the CSV or Parquet costs.')
+flags.DEFINE_integer('num_workers', 1,
+                     'Number of processes, each with its own PlacementCost.')
+flags.DEFINE_enum('plc_backend', 'binary', ['binary', 'numpy'],
+                  'PlacementCost backend, see placement_util.')
+flags.DEFINE_string('node_order', 'descending_size_macro_first',
+                    'The node order the actions were taken in.')
+flags.DEFINE_integer('global_seed', 111,
+                     'Global seed of the env, used by the random node order.')
+flags.DEFINE_float('wirelength_weight', 1.0, 'Weight of the wirelength cost.')
+flags.DEFINE_float('density_weight', 1.0, 'Weight of the density cost.')
+flags.DEFINE_float('congestion_weight', 0.5, 'Weight of the congestion cost.')
+_GIN_BINDINGS = flags.DEFINE_multi_string(
+    'gin_bindings', [],
+    'Gin binding parameters, e.g. ObservationConfig.max_grid_size=128.')
+
+FLAGS = flags.FLAGS
+
+
+def main(_):
+  gin.parse_config(_GIN_BINDINGS.value)
+  cost_info_fn = functools.partial(
+      environment.cost_info_function,
+      wirelength_weight=FLAGS.wirelength_weight,
+      density_weight=FLAGS.density_weight,
+      congestion_weight=FLAGS.congestion_weight)
+  create_env_fn = functools.partial(
+      environment.CircuitEnv,
+      netlist_file=FLAGS.netlist_file,
+      init_placement=FLAGS.init_placement,
+      create_placement_cost_fn=functools.partial(
+          placement_util.create_placement_cost, backend=FLAGS.plc_backend),
+      cost_info_fn=cost_info_fn,
+      node_order=FLAGS.node_order,
+      global_seed=FLAGS.global_seed)
+  rows = replay_actions.replay_action_sequences(
+      create_env_fn,
+      replay_actions.read_action_sequences(FLAGS.actions_file),
+      num_workers=FLAGS.num_workers,
+      gin_bindings=_GIN_BINDINGS.value)
+  num_rows = replay_actions.write_rows(rows, FLAGS.output_file)
+  print(f'Costs of {num_rows} action sequences written to {FLAGS.output_file}')
+
+
+if __name__ == '__main__':
+  flags.mark_flags_as_required(
+      ['netlist_file', 'init_placement', 'actions_file', 'output_file'])
+  app.run(main)
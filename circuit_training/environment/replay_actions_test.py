@@ -0,0 +1,105 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for replay_actions."""
+
+import csv
+import functools
+import os
+
+from absl import flags
+from absl.testing import parameterized
+from circuit_training.environment import environment
+from circuit_training.environment import placement_util
+from circuit_training.environment import replay_actions
+from circuit_training.utils import test_utils
+import numpy as np
+
+FLAGS = flags.FLAGS
+
+_TEST_DATA_DIR = 'circuit_training/environment/test_data/sample_clustered'
+
+
+class ReplayActionsTest(parameterized.TestCase, test_utils.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    test_data_dir = os.path.join(FLAGS.test_srcdir, _TEST_DATA_DIR)
+    self._create_env_fn = functools.partial(
+        environment.CircuitEnv,
+        netlist_file=os.path.join(test_data_dir, 'netlist.pb.txt'),
+        init_placement=os.path.join(test_data_dir, 'initial.plc'),
+        create_placement_cost_fn=functools.partial(
+            placement_util.create_placement_cost, backend='numpy'))
+
+  def _episodes(self, num_episodes):
+    """Returns the actions and costs of random episodes."""
+    env = self._create_env_fn()
+    rng = np.random.default_rng(0)
+    episodes = []
+    for _ in range(num_episodes):
+      obs = env.reset()
+      done = False
+      while not done:
+        action = rng.choice(np.flatnonzero(obs['mask']))
+        obs, reward, done, _ = env.step(action)
+      episodes.append((env.get_state().current_actions, -reward))
+    return episodes
+
+  def test_read_action_sequences(self):
+    path = self.create_tempfile(content='# Actions.\n1 2 3\n\n4,5, 6\n')
+    self.assertEqual(
+        list(replay_actions.read_action_sequences(path.full_path)),
+        [(1, 2, 3), (4, 5, 6)])
+
+  @parameterized.named_parameters(('_single_process', 1),
+                                  ('_process_pool', 2))
+  def test_replay_action_sequences(self, num_workers):
+    episodes = self._episodes(3)
+    sequences = [actions for actions, _ in episodes]
+    # A duplicate, and a sequence without all the hard macros.
+    sequences += [sequences[0], sequences[0][:1]]
+    rows = list(
+        replay_actions.replay_action_sequences(
+            self._create_env_fn,
+            sequences,
+            num_workers=num_workers,
+            chunk_size=1))
+
+    distinct = list(dict.fromkeys(actions for actions, _ in episodes))
+    self.assertLen(rows, len(distinct) + 1)
+    costs = dict(episodes)
+    for actions, row in zip(distinct, rows):
+      self.assertEqual(row['actions'], ' '.join(str(a) for a in actions))
+      self.assertAllClose(row['cost'], costs[actions])
+      self.assertEqual(row['error'], '')
+    self.assertTrue(np.isnan(rows[-1]['cost']))
+    self.assertIn('Expected', rows[-1]['error'])
+
+  def test_write_csv(self):
+    rows = list(
+        replay_actions.replay_action_sequences(
+            self._create_env_fn, [actions for actions, _ in self._episodes(2)]))
+    path = os.path.join(self.create_tempdir(), 'costs.csv')
+    self.assertEqual(replay_actions.write_rows(iter(rows), path), len(rows))
+    with open(path) as f:
+      written = list(csv.DictReader(f))
+    self.assertEqual([r['actions'] for r in written],
+                     [r['actions'] for r in rows])
+    self.assertAllClose([float(r['cost']) for r in written],
+                        [r['cost'] for r in rows])
+
+
+if __name__ == '__main__':
+  test_utils.main()
@@ -31,7 +31,7 @@ import random
 import dataclasses
 
 from absl import flags
-from circuit_training.environment import placement_util
+from circuit_training.environment import plc_pool
 
 flags.DEFINE_integer('min_num', 10, 'Minimum number for cols/rows sweep.')
 flags.DEFINE_integer('max_num', 128, 'Maximum number for cols/rows sweep.')
@@ -64,16 +64,14 @@ def get_grid_suggestion(plc):
   # Save previous placements, since get_grid_choices will move macros around
   # during evaluation. Note that this is in terms of absolute x, y coordinates,
   # not grid cell indices.
-  orig_coords = placement_util.get_node_xy_coordinates(plc)
-  orig_orientations = placement_util.get_macro_orientations(plc)
+  orig_placement = plc.snapshot()
   choices = get_grid_choices(plc, FLAGS.min_num, FLAGS.max_num,
                              FLAGS.max_grid_size, FLAGS.min_num_grid_cells,
                              FLAGS.max_num_grid_cells, FLAGS.max_aspect_ratio,
                              FLAGS.add_size,
                              FLAGS.grid_select_include_fixed_macros)
 
-  placement_util.restore_node_xy_coordinates(plc, orig_coords)
-  placement_util.restore_macro_orientations(plc, orig_orientations)
+  plc.restore(orig_placement)
   if not choices:
     return None, None
   cols, rows = select_from_grid_choices(
@@ -266,7 +264,8 @@ def get_grid_choices(plc, min_num, max_num, max_grid_size, min_num_grid_cells,
   """Returns all possible grid number of columns/rows and their metrics.
 
   Args:
-    plc: placement_cost object.
+    plc: placement_cost object, or a plc_pool.PlacementCostPool to try the
+      grid sizes in parallel.
     min_num: minimum number of columns and rows during sweep.
     max_num: maximum number of columns and rows during sweep.
     max_grid_size:  maximum acceptable number of grid in each dimenssion.
@@ -314,6 +313,7 @@ def get_grid_choices(plc, min_num, max_num, max_grid_size, min_num_grid_cells,
       plc, add_size, include_fixed_macros)
   canvas_width, canvas_height = plc.get_canvas_width_height()
   # Loop through all combinations of number of cols and rows.
+  candidates = []
   for rows in range(min_num, max_num):
     for cols in range(min_num, max_num):
       gcell_width = canvas_width / cols
@@ -327,25 +327,36 @@ def get_grid_choices(plc, min_num, max_num, max_grid_size, min_num_grid_cells,
       if not is_grid_cell_aspect_ratio_ok(gcell_width, gcell_height,
                                           max_aspect_ratio):
         continue
-      plc.set_placement_grid(cols, rows)
-      # TODO(mustafay): placement do not take add_size into account, add a
-      # resize utility to placement_cost interface.
-      if not try_placing(plc, hard_macros):
-        continue
-      # Only calculate hor_waste, ver_waste if needed.
-      if cols not in hor_waste:
-        hor_waste[cols] = get_waste_ratio(macro_widths, gcell_width)
-      if rows not in ver_waste:
-        ver_waste[rows] = get_waste_ratio(macro_heights, gcell_height)
-      d = ValueData(
-          key_metric=0,
-          empty_ratio=get_empty_cells_ratio(plc),
-          hor_waste=hor_waste[cols],
-          ver_waste=ver_waste[rows],
-          num_gcells=cols * rows)
-      # Fill in the key_metric based on the rest of the metrics.
-      d.key_metric = get_key_metric(d)
-      grid_choices[(cols, rows)] = d
+      candidates.append((cols, rows))
+
+  def get_empty_ratio(plc, grid_size):
+    plc.set_placement_grid(*grid_size)
+    # TODO(mustafay): placement do not take add_size into account, add a
+    # resize utility to placement_cost interface.
+    if not try_placing(plc, hard_macros):
+      return None
+    return get_empty_cells_ratio(plc)
+
+  # Trying the candidates is independent, a PlacementCostPool runs them in
+  # parallel.
+  empty_ratios = plc_pool.map_jobs(plc, get_empty_ratio, candidates)
+  for (cols, rows), empty_ratio in zip(candidates, empty_ratios):
+    if empty_ratio is None:
+      continue
+    # Only calculate hor_waste, ver_waste if needed.
+    if cols not in hor_waste:
+      hor_waste[cols] = get_waste_ratio(macro_widths, canvas_width / cols)
+    if rows not in ver_waste:
+      ver_waste[rows] = get_waste_ratio(macro_heights, canvas_height / rows)
+    d = ValueData(
+        key_metric=0,
+        empty_ratio=empty_ratio,
+        hor_waste=hor_waste[cols],
+        ver_waste=ver_waste[rows],
+        num_gcells=cols * rows)
+    # Fill in the key_metric based on the rest of the metrics.
+    d.key_metric = get_key_metric(d)
+    grid_choices[(cols, rows)] = d
   return grid_choices
 
 
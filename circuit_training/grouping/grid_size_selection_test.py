@@ -15,6 +15,8 @@
 """Tests for circuit_training.grouping.grid_size_selection."""
 
 import collections
+import dataclasses
+import functools
 import os
 
 from absl import flags
@@ -23,6 +25,8 @@ from absl.testing import absltest
 from circuit_training.environment import placement_util
 from circuit_training.grouping import grid_size_selection
 from circuit_training.environment import plc_client
+from circuit_training.environment import plc_numpy
+from circuit_training.environment import plc_pool
 from circuit_training.utils import test_utils
 
 FLAGS = flags.FLAGS
@@ -98,6 +102,25 @@ class GridSizeSelectionTest(absltest.TestCase):
       self.assertEqual(cols, d.exp_cols)
       self.assertEqual(rows, d.exp_rows)
 
+  def test_get_grid_choices_with_pool(self):
+    filename = os.path.join(FLAGS.test_srcdir, 'circuit_training/grouping/'
+                            'testdata/macro_tiles_3rows_3cols_1pins.pb.txt')
+    plc = plc_numpy.PlacementCost(filename)
+    plc.set_canvas_size(4, 4)
+    pool = plc_pool.PlacementCostPool(
+        functools.partial(plc_numpy.PlacementCost, filename), num_workers=4)
+    self.addCleanup(pool.close)
+    pool.set_canvas_size(4, 4)
+    args = (1, 10, 128, 5, 100, 2, 0, False)
+    # ValueData is defined by every call, compare the fields.
+    pool_choices = grid_size_selection.get_grid_choices(pool, *args)
+    choices = grid_size_selection.get_grid_choices(plc, *args)
+    self.assertEqual(
+        {k: dataclasses.astuple(v) for k, v in pool_choices.items()},
+        {k: dataclasses.astuple(v) for k, v in choices.items()})
+    self.assertEqual(
+        grid_size_selection.select_from_grid_choices(pool_choices), (4, 4))
+
 
 if __name__ == '__main__':
   test_utils.main()
@@ -207,7 +207,8 @@ def write_new_netlist(plc: plc_client.PlacementCost, fix_file: str,
   placement_util.save_placement(new_plc, plc_file, user_comments)
 
   logging.info('Placement file : %s, WL: %f, cong: %f}', plc_file,
-               new_plc.get_wirelength(), new_plc.get_congestion_cost())
+               new_plc.get_wirelength(),
+               new_plc.get_cost_info()['congestion'])
   return filename, plc_file
 
 
@@ -348,8 +349,9 @@ def break_up_and_merge(grp: grouping.Grouping, break_up_threshold: float,
 
 def print_cost_info(plc: plc_client.PlacementCost) -> None:
   logging.info('Wirelength: %f', plc.get_wirelength())
-  logging.info('Wirelength cost: %f', plc.get_cost())
-  logging.info('Congestion cost: %f', plc.get_congestion_cost())
+  costs = plc.get_cost_info(['wirelength', 'congestion'])
+  logging.info('Wirelength cost: %f', costs['wirelength'])
+  logging.info('Congestion cost: %f', costs['congestion'])
   logging.info('Overlap cost: %f', plc.get_overlap_cost())
 
 
@@ -14,6 +14,7 @@
 # limitations under the License.
 """Testing the data collection."""
 
+import functools
 import os
 
 from absl import flags
@@ -21,6 +22,7 @@ from absl import logging
 from absl.testing import parameterized
 
 from circuit_training.environment import environment
+from circuit_training.environment import placement_util
 from circuit_training.learning import agent
 from circuit_training.learning import static_feature_cache
 from circuit_training.model import model
@@ -35,6 +37,7 @@ from tf_agents.train.utils import spec_utils
 from tf_agents.train.utils import train_utils
 from tf_agents.trajectories import policy_step
 from tf_agents.trajectories import time_step as ts
+from tf_agents.utils import nest_utils
 from tf_agents.utils import test_utils
 
 FLAGS = flags.FLAGS
@@ -145,5 +148,57 @@ class CollectTest(parameterized.TestCase, test_utils.TestCase):
     logging.info('Observed episode lengths: %s', episode_lens)
 
 
+  def test_collect_with_batched_environment(self):
+    num_envs = 3
+    env = environment.create_batched_circuit_environment(
+        num_envs,
+        netlist_file=os.path.join(FLAGS.test_srcdir, _TESTDATA_DIR,
+                                  'netlist.pb.txt'),
+        init_placement=os.path.join(FLAGS.test_srcdir, _TESTDATA_DIR,
+                                    'initial.plc'),
+        create_placement_cost_fn=functools.partial(
+            placement_util.create_placement_cost, backend='numpy'))
+    observation_tensor_spec, action_tensor_spec, time_step_tensor_spec = (
+        spec_utils.get_tensor_specs(env))
+    cache = static_feature_cache.StaticFeatureCache()
+    cache.add_static_feature(env.wrapped_env().get_static_obs())
+    actor_net, value_net = model.create_grl_models(
+        observation_tensor_spec,
+        action_tensor_spec,
+        cache.get_all_static_features(),
+        use_model_tpu=False)
+    train_step = train_utils.create_train_step()
+    tf_agent = agent.create_circuit_ppo_agent(train_step, action_tensor_spec,
+                                              time_step_tensor_spec, actor_net,
+                                              value_net,
+                                              tf.distribute.get_strategy())
+    tf_agent.initialize()
+
+    # Each environment of the batch gets its own slice of the trajectories.
+    validate_time_steps = [
+        _ValidateTimeStepObserver(
+            test_case=self,
+            time_step_spec=env.time_step_spec(),
+            action_step_spec=env.action_spec()) for _ in range(num_envs)
+    ]
+
+    def unbatch_observer(trajectory):
+      trajectory = tf.nest.map_structure(np.asarray, trajectory)
+      for observer, env_trajectory in zip(
+          validate_time_steps, nest_utils.unstack_nested_arrays(trajectory)):
+        observer(env_trajectory)
+
+    driver = py_driver.PyDriver(
+        env,
+        py_tf_eager_policy.PyTFEagerPolicy(
+            tf_agent.collect_policy, batch_time_steps=False),
+        observers=[unbatch_observer],
+        max_episodes=2 * num_envs)
+    driver.run(env.reset())
+
+    for validate_time_step in validate_time_steps:
+      self.assertNotEmpty(validate_time_step.episode_lengths)
+
+
 if __name__ == '__main__':
   test_utils.main()
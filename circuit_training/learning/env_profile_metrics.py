@@ -0,0 +1,79 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Metrics of the time spent in each phase of CircuitEnv.get_profile()."""
+
+from typing import Callable, List, Sequence, Text
+
+from circuit_training.environment import env_profile
+import numpy as np
+from tf_agents.metrics import py_metric
+from tf_agents.trajectories import trajectory as traj
+
+# The phases of the steps and resets reported by default.
+DEFAULT_PHASES = ('step', 'step/mask', 'step/place_node', 'step/observation',
+                  'step/analytical_placer', 'step/cost', 'reset',
+                  'reset/unplace_all_nodes', 'reset/unplace_episode_nodes',
+                  'reset/mask', 'reset/observation')
+
+
+class EnvPhaseTimeMetric(py_metric.PyStepMetric):
+  """Milliseconds per call of a phase of the environment since the reset."""
+
+  def __init__(self,
+               get_profile_fn: Callable[[], env_profile.ProfileType],
+               phase: Text,
+               prefix: Text = 'Metrics'):
+    """Creates the metric.
+
+    Args:
+      get_profile_fn: Returns the profile, e.g. `env.get_profile`.
+      phase: Name of the phase, e.g. 'step/mask'.
+      prefix: Prefix of the metric name.
+    """
+    # Metric names are Python identifiers, e.g. EnvProfile_step_mask_ms.
+    super(EnvPhaseTimeMetric, self).__init__(
+        name=f'EnvProfile_{phase.replace("/", "_")}_ms', prefix=prefix)
+    self._get_profile_fn = get_profile_fn
+    self._phase = phase
+    self._start = {'count': 0, 'total_seconds': 0.0}
+    self.reset()
+
+  def _stats(self):
+    return self._get_profile_fn().get(self._phase, {
+        'count': 0,
+        'total_seconds': 0.0
+    })
+
+  def call(self, trajectory: traj.Trajectory) -> None:
+    # The times are read from the environment profile.
+    del trajectory
+
+  def reset(self) -> None:
+    self._start = dict(self._stats())
+
+  def result(self) -> np.float32:
+    stats = self._stats()
+    count = stats['count'] - self._start['count']
+    if not count:
+      return np.float32(0.0)
+    return np.float32(
+        1e3 * (stats['total_seconds'] - self._start['total_seconds']) / count)
+
+
+def create_env_profile_metrics(
+    get_profile_fn: Callable[[], env_profile.ProfileType],
+    phases: Sequence[Text] = DEFAULT_PHASES) -> List[EnvPhaseTimeMetric]:
+  """Returns a metric per phase, e.g. to add to the metrics of an Actor."""
+  return [EnvPhaseTimeMetric(get_profile_fn, phase) for phase in phases]
@@ -0,0 +1,46 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for env_profile_metrics."""
+
+from circuit_training.learning import env_profile_metrics
+from tf_agents.utils import test_utils
+
+
+class EnvProfileMetricsTest(test_utils.TestCase):
+
+  def test_result(self):
+    profile = {}
+    metric = env_profile_metrics.EnvPhaseTimeMetric(lambda: profile,
+                                                    'step/mask')
+    self.assertEqual(metric.name, 'EnvProfile_step_mask_ms')
+    self.assertEqual(metric.result(), 0.0)
+
+    profile['step/mask'] = {'count': 4, 'total_seconds': 0.002}
+    self.assertAllClose(metric.result(), 0.5)
+
+    # Only the calls since the reset are averaged.
+    metric.reset()
+    profile['step/mask'] = {'count': 5, 'total_seconds': 0.005}
+    self.assertAllClose(metric.result(), 3.0)
+
+  def test_create_env_profile_metrics(self):
+    metrics = env_profile_metrics.create_env_profile_metrics(
+        lambda: {}, phases=('step', 'reset'))
+    self.assertEqual([m.name for m in metrics],
+                     ['EnvProfile_step_ms', 'EnvProfile_reset_ms'])
+
+
+if __name__ == '__main__':
+  test_utils.main()
@@ -55,6 +55,9 @@ flags.DEFINE_string(
 flags.DEFINE_bool(
     'cd_finetune', False, 'runs coordinate descent to finetune macro '
     'orientations. Supposed to run in eval only, not training.')
+flags.DEFINE_bool(
+    'async_save_placement', False, 'saves the best placements and runs the '
+    'coordinate descent from a background thread, without blocking the eval.')
 
 FLAGS = flags.FLAGS
 
@@ -83,6 +86,7 @@ def main(_):
       output_plc_file=output_plc_file,
       global_seed=FLAGS.global_seed,
       cd_finetune=FLAGS.cd_finetune,
+      async_save_placement=FLAGS.async_save_placement,
       netlist_index=0,
   )
 
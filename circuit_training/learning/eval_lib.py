@@ -22,6 +22,7 @@ from typing import Any, Callable, List, Optional, Text
 
 from absl import logging
 from circuit_training.learning import agent
+from circuit_training.learning import plc_stats_summary
 from circuit_training.learning import static_feature_cache
 from circuit_training.model import fully_connected_model_lib
 from circuit_training.model import model
@@ -190,6 +191,7 @@ def evaluate(
         action_tensor_spec,
         cache.get_all_static_features(),
         use_model_tpu=False,
+        observation_config=env.observation_config,
     )
     image_metrics = [
         PlacementImage(
@@ -238,14 +240,16 @@ def evaluate(
   variable_container.update(variables)
 
   # Create the evaluator actor.
+  summary_dir = os.path.join(
+      root_dir, learner.TRAIN_DIR, summary_subdir, 'eval'
+  )
+  rpc_stats_writer = plc_stats_summary.RpcStatsSummaryWriter(summary_dir)
   eval_actor = actor.Actor(
       env,
       tf_policy,
       train_step,
       episodes_per_run=1,
-      summary_dir=os.path.join(
-          root_dir, learner.TRAIN_DIR, summary_subdir, 'eval'
-      ),
+      summary_dir=summary_dir,
       metrics=[
           py_metrics.NumberOfEpisodes(),
           py_metrics.EnvironmentSteps(),
@@ -270,4 +274,5 @@ def evaluate(
     # we can look at the wirelength, density and congestion metrics more
     # frequently.
     eval_actor.write_metric_summaries()
+    rpc_stats_writer.write(train_step.numpy())
     time.sleep(20)
@@ -0,0 +1,63 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Writes the plc_wrapper_main call statistics as TensorBoard summaries."""
+
+from circuit_training.environment import plc_stats
+import tensorflow as tf
+
+
+class RpcStatsSummaryWriter(object):
+  """Writes plc_stats.RPC_STATS to a summary directory."""
+
+  def __init__(self,
+               summary_dir: str,
+               name: str = 'plc_rpc',
+               summary_interval: int = 1):
+    """Creates the writer.
+
+    Args:
+      summary_dir: Directory of the summaries.
+      name: Prefix of the summary names, e.g. plc_rpc/GetCost/p99_seconds.
+      summary_interval: Minimum number of steps between two writes.
+    """
+    self._summary_writer = tf.summary.create_file_writer(
+        summary_dir, flush_millis=10000)
+    self._name = name
+    self._summary_interval = summary_interval
+    self._last_step = None
+
+  def write(self, step: int) -> bool:
+    """Writes a scalar per method and statistic.
+
+    The statistics are only computed and written if the step advanced by
+    `summary_interval` since the last write, e.g. a collect job calls this
+    after every episode but the train step only changes after a train
+    iteration.
+
+    Args:
+      step: The step of the summaries, e.g. the train step.
+
+    Returns:
+      True if the summaries were written.
+    """
+    if (self._last_step is not None and
+        step < self._last_step + self._summary_interval):
+      return False
+    self._last_step = step
+    with self._summary_writer.as_default():
+      for method, stats in plc_stats.RPC_STATS.snapshot().items():
+        for key, value in stats.items():
+          tf.summary.scalar(f'{self._name}/{method}/{key}', value, step=step)
+    return True
@@ -0,0 +1,41 @@
+# coding=utf-8
+# Copyright 2021 The Circuit Training Team Authors.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for plc_stats_summary."""
+
+from unittest import mock
+
+from circuit_training.environment import plc_stats
+from circuit_training.learning import plc_stats_summary
+from tf_agents.utils import test_utils
+
+
+class RpcStatsSummaryWriterTest(test_utils.TestCase):
+
+  def test_write_interval(self):
+    plc_stats.RPC_STATS.reset()
+    plc_stats.RPC_STATS.record('GetCost', 0.001, 10, 20)
+    writer = plc_stats_summary.RpcStatsSummaryWriter(
+        self.create_tempdir().full_path, summary_interval=10)
+    with mock.patch.object(
+        plc_stats.RPC_STATS, 'snapshot',
+        wraps=plc_stats.RPC_STATS.snapshot) as snapshot:
+      written = [writer.write(step) for step in (0, 0, 5, 10, 12, 25)]
+    self.assertEqual(written, [True, False, False, True, False, True])
+    # The statistics are only computed for the writes.
+    self.assertEqual(snapshot.call_count, 3)
+
+
+if __name__ == '__main__':
+  test_utils.main()
@@ -14,14 +14,18 @@
 # limitations under the License.
 """Library for PPO collect job."""
 import os
-from typing import Any, Callable
+from typing import Any, Callable, Sequence
 import gin
 
 from absl import logging
+from circuit_training.environment import environment
 from circuit_training.learning import agent
+from circuit_training.learning import env_profile_metrics
+from circuit_training.learning import plc_stats_summary
 from circuit_training.learning import static_feature_cache
 from circuit_training.model import fully_connected_model_lib
 from circuit_training.model import model
+import numpy as np
 import reverb
 import tensorflow as tf
 from tf_agents.experimental.distributed import reverb_variable_container
@@ -31,10 +35,32 @@ from tf_agents.train import actor
 from tf_agents.train import learner
 from tf_agents.train.utils import spec_utils
 from tf_agents.train.utils import train_utils
+from tf_agents.trajectories import trajectory
 from tf_agents.utils import common
+from tf_agents.utils import nest_utils
 
 
-@gin.configurable(allowlist=['write_summaries_task_threshold'])
+class _UnbatchObserver(object):
+  """Passes each environment of a batch its own slice of the trajectories.
+
+  ReverbAddEpisodeObserver only supports unbatched trajectories, so a
+  BatchedCircuitEnv gets one per environment.
+  """
+
+  def __init__(self, observers: Sequence[Callable[[trajectory.Trajectory],
+                                                  None]]):
+    self._observers = observers
+
+  def __call__(self, traj: trajectory.Trajectory) -> None:
+    traj = tf.nest.map_structure(np.asarray, traj)
+    for observer, env_traj in zip(self._observers,
+                                  nest_utils.unstack_nested_arrays(traj)):
+      observer(env_traj)
+
+
+@gin.configurable(allowlist=[
+    'write_summaries_task_threshold', 'num_envs', 'write_env_profile'
+])
 def collect(task: int,
             root_dir: str,
             replay_buffer_server_address: str,
@@ -44,11 +70,26 @@ def collect(task: int,
             rl_architecture: str = 'generalization',
             summary_subdir: str = '',
             write_summaries_task_threshold: int = 1,
-            netlist_index: int = 0):
-  """Collects experience using a policy updated after every episode."""
+            netlist_index: int = 0,
+            num_envs: int = 1,
+            write_env_profile: bool = False):
+  """Collects experience using a policy updated after every episode.
+
+  With `num_envs` > 1, the environments are stepped together in a
+  BatchedCircuitEnv and the policy is called once per step for all of them. The
+  policy is then updated after every `num_envs` episodes, some of them possibly
+  still in progress.
+
+  With `write_env_profile`, the summaries include the milliseconds per call of
+  each phase of the environment steps and resets, see CircuitEnv.get_profile.
+  """
   # Create the environment.
   train_step = train_utils.create_train_step()
-  env = create_env_fn(train_step=train_step)
+  if num_envs > 1:
+    env = environment.BatchedCircuitEnv(
+        [create_env_fn(train_step=train_step) for _ in range(num_envs)])
+  else:
+    env = create_env_fn(train_step=train_step)
   observation_tensor_spec, action_tensor_spec, time_step_tensor_spec = (
       spec_utils.get_tensor_specs(env))
   static_features = env.wrapped_env().get_static_obs()
@@ -60,7 +101,8 @@ def collect(task: int,
         observation_tensor_spec,
         action_tensor_spec,
         cache.get_all_static_features(),
-        use_model_tpu=False)
+        use_model_tpu=False,
+        observation_config=env.wrapped_env().observation_config)
   else:
     actor_net = fully_connected_model_lib.create_actor_net(
         observation_tensor_spec, action_tensor_spec)
@@ -77,7 +119,8 @@ def collect(task: int,
   )
 
   policy = tf_agent.collect_policy
-  tf_policy = py_tf_eager_policy.PyTFEagerPolicy(tf_agent.collect_policy)
+  tf_policy = py_tf_eager_policy.PyTFEagerPolicy(
+      tf_agent.collect_policy, batch_time_steps=not env.batched)
 
   # Create the variable container.
   model_id = common.create_variable('model_id')
@@ -97,31 +140,44 @@ def collect(task: int,
           reverb.Client(replay_buffer_server_address),
           table_name=[f'training_table_{netlist_index}'],
           max_sequence_length=max_sequence_length,
-          priority=model_id)
+          priority=model_id) for _ in range(num_envs)
   ]
+  if env.batched:
+    observers = [_UnbatchObserver(observers)]
+
+  # Train steps between the summaries of the actor and of the plc statistics.
+  summary_interval = 200
 
   # Write metrics only if the task ID of the current job is below the limit.
   summary_dir = None
   metrics = []
+  rpc_stats_writer = None
   if task < write_summaries_task_threshold:
     summary_dir = os.path.join(root_dir, learner.TRAIN_DIR, summary_subdir,
                                str(task))
-    metrics = actor.collect_metrics(1)
+    metrics = actor.collect_metrics(num_envs)
+    if write_env_profile:
+      metrics += env_profile_metrics.create_env_profile_metrics(
+          env.get_profile)
+    rpc_stats_writer = plc_stats_summary.RpcStatsSummaryWriter(
+        summary_dir, summary_interval=summary_interval)
 
   # Create the collect actor.
   collect_actor = actor.Actor(
       env,
       tf_policy,
       train_step,
-      episodes_per_run=1,
+      episodes_per_run=num_envs,
       summary_dir=summary_dir,
-      summary_interval=200,
+      summary_interval=summary_interval,
       metrics=metrics,
       observers=observers)
 
   # Run the experience collection loop.
   while True:
     collect_actor.run()
+    if rpc_stats_writer:
+      rpc_stats_writer.write(train_step.numpy())
     variable_container.update(variables)
     logging.info('Collecting at step: %d', train_step.numpy())
     logging.info('Collecting at model_id: %d', model_id.numpy())
@@ -103,7 +103,8 @@ def main(_):
         action_tensor_spec,
         cache.get_all_static_features(),
         use_model_tpu=use_model_tpu,
-        seed=_GLOBAL_SEED.value)
+        seed=_GLOBAL_SEED.value,
+        observation_config=env.wrapped_env().observation_config)
 
   train_ppo_lib.train(
       root_dir=root_dir,
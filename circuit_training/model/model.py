@@ -16,6 +16,7 @@
 
 from typing import Dict, Optional, Text
 
+from circuit_training.environment import observation_config as observation_config_lib
 from circuit_training.model import model_lib
 import gin
 import numpy as np
@@ -40,7 +41,9 @@ class GrlModel(network.Network):
                state_spec: types.NestedTensorSpec = (),
                policy_noise_weight: float = 0.1,
                use_model_tpu: bool = True,
-               seed: int = 0):
+               seed: int = 0,
+               observation_config: Optional[
+                   observation_config_lib.ObservationConfig] = None):
 
     super(GrlModel, self).__init__(
         input_tensor_spec=input_tensors_spec, state_spec=state_spec, name=name)
@@ -49,11 +52,13 @@ class GrlModel(network.Network):
       self._model = model_lib.CircuitTrainingTPUModel(
           policy_noise_weight=policy_noise_weight,
           all_static_features=all_static_features,
+          observation_config=observation_config,
           seed=seed)
     else:
       self._model = model_lib.CircuitTrainingModel(
           policy_noise_weight=policy_noise_weight,
           all_static_features=all_static_features,
+          observation_config=observation_config,
           seed=seed)
 
   def call(self, inputs, network_state=()):
@@ -69,7 +74,9 @@ class GrlPolicyModel(network.DistributionNetwork):
                shared_network: network.Network,
                input_tensors_spec: types.NestedTensorSpec,
                output_tensors_spec: types.NestedTensorSpec,
-               name: Optional[Text] = 'GrlPolicyModel'):
+               name: Optional[Text] = 'GrlPolicyModel',
+               observation_config: Optional[
+                   observation_config_lib.ObservationConfig] = None):
 
     super(GrlPolicyModel, self).__init__(
         input_tensor_spec=input_tensors_spec,
@@ -80,6 +87,8 @@ class GrlPolicyModel(network.DistributionNetwork):
     self._input_tensors_spec = input_tensors_spec
     self._shared_network = shared_network
     self._output_tensors_spec = output_tensors_spec
+    self._observation_config = (
+        observation_config or observation_config_lib.ObservationConfig())
 
     n_unique_actions = np.unique(output_tensors_spec.maximum -
                                  output_tensors_spec.minimum + 1)
@@ -108,10 +117,12 @@ class GrlPolicyModel(network.DistributionNetwork):
       inputs = tf.nest.map_structure(lambda x: tf.reshape(x, (1, -1)), inputs)
     model_out, _ = self._shared_network(inputs)
 
-    paddings = tf.ones_like(inputs['mask'], dtype=tf.float32) * (-2.**32 + 1)
+    # The mask is bit-packed if the observations are compact.
+    mask = observation_config_lib.unpack_observation(
+        inputs, self._observation_config)['mask']
+    paddings = tf.ones_like(mask, dtype=tf.float32) * (-2.**32 + 1)
     masked_logits = tf.where(
-        tf.cast(inputs['mask'], tf.bool), model_out['logits']['location'],
-        paddings)
+        tf.cast(mask, tf.bool), model_out['logits']['location'], paddings)
 
     output_dist = self._output_dist_spec.build_distribution(
         logits=masked_logits)
@@ -151,7 +162,9 @@ def create_grl_models(observation_tensor_spec: types.NestedTensorSpec,
                       action_tensor_spec: types.NestedTensorSpec,
                       all_static_features: Dict[str, np.ndarray],
                       use_model_tpu: bool = False,
-                      seed: int = 0):
+                      seed: int = 0,
+                      observation_config: Optional[
+                          observation_config_lib.ObservationConfig] = None):
   """Create the GRL actor and value networks from scratch.
 
   Args:
@@ -163,6 +176,9 @@ def create_grl_models(observation_tensor_spec: types.NestedTensorSpec,
       create. TPU models leverage map_fn to speed up performance on TPUs. Both
       versions generate the same output given the same inputs.
     seed: Random seed.
+    observation_config: The observation config of the environment, e.g. for
+      the sizes of the compact observations. Defaults to the gin configured
+      ObservationConfig.
 
   Returns:
     A tuple containing the GRL policy model and value model.
@@ -173,8 +189,12 @@ def create_grl_models(observation_tensor_spec: types.NestedTensorSpec,
       action_tensor_spec,
       all_static_features=all_static_features,
       use_model_tpu=use_model_tpu,
-      seed=seed)
-  grl_actor_net = GrlPolicyModel(grl_shared_net, observation_tensor_spec,
-                                 action_tensor_spec)
+      seed=seed,
+      observation_config=observation_config)
+  grl_actor_net = GrlPolicyModel(
+      grl_shared_net,
+      observation_tensor_spec,
+      action_tensor_spec,
+      observation_config=observation_config)
   grl_value_net = GrlValueModel(observation_tensor_spec, grl_shared_net)
   return grl_actor_net, grl_value_net
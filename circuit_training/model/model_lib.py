@@ -372,6 +372,8 @@ class CircuitTrainingModel(tf.keras.layers.Layer):
            inputs: tf.Tensor,
            training: bool = False,
            is_eval: bool = False) -> Tuple[Dict[Text, tf.Tensor], tf.Tensor]:
+    inputs = observation_config_lib.unpack_observation(
+        inputs, self._observation_config)
     # Netlist metadata.
     netlist_metadata_inputs = [
         self._get_static_input(key, inputs)
@@ -569,6 +571,8 @@ class CircuitTrainingTPUModel(CircuitTrainingModel):
            inputs: tf.Tensor,
            training: bool = False,
            is_eval: bool = False) -> Tuple[Dict[Text, tf.Tensor], tf.Tensor]:
+    inputs = observation_config_lib.unpack_observation(
+        inputs, self._observation_config)
     # Netlist metadata.
     netlist_metadata_inputs = [
         self._get_static_input(key, inputs)
@@ -22,6 +22,7 @@ from circuit_training.environment import observation_config
 from circuit_training.learning import static_feature_cache
 from circuit_training.model import model_lib
 from circuit_training.utils import test_utils
+import numpy as np
 import tensorflow as tf
 from tf_agents.train.utils import strategy_utils
 
@@ -135,6 +136,31 @@ class ModelTest(test_utils.TestCase):
     self.assertNotAllClose(initial_weights, current_weights)
     self.assertNotAlmostEqual(initial_loss, current_loss)
 
+  def test_compact_observation(self):
+    config = observation_config.ObservationConfig()
+    compact_config = observation_config.ObservationConfig(compact=True)
+    static_features = config.observation_space.sample()
+    cache = static_feature_cache.StaticFeatureCache()
+    cache.add_static_feature(static_features)
+    test_model = model_lib.CircuitTrainingModel(
+        all_static_features=cache.get_all_static_features(),
+        observation_config=config)
+
+    obs = config.dynamic_observation_space.sample()
+    for key in observation_config.HALF_PRECISION_OBSERVATIONS:
+      obs[key] = obs[key].astype(np.float16).astype(np.float32)
+    compact_obs = compact_config.compact_observation(obs)
+
+    def forward(x):
+      x = tf.nest.map_structure(lambda t: tf.expand_dims(t, 0), x)
+      return test_model(x)
+
+    # The model unpacks the compact observations.
+    logits, value = forward(obs)
+    compact_logits, compact_value = forward(compact_obs)
+    self.assertAllClose(logits, compact_logits)
+    self.assertAllClose(value, compact_value)
+
 
 if __name__ == '__main__':
   test_utils.main()
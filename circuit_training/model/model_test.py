@@ -22,10 +22,13 @@ import os
 from absl import flags
 from absl.testing import parameterized
 from circuit_training.environment import environment
+from circuit_training.environment import observation_config
 from circuit_training.learning import static_feature_cache
 from circuit_training.model import model as grl_model
 from circuit_training.utils import test_utils
+import numpy as np
 import tensorflow as tf
+from tf_agents.environments import gym_wrapper
 from tf_agents.environments import suite_gym
 from tf_agents.environments import tf_py_environment
 from tf_agents.specs import tensor_spec
@@ -121,5 +124,47 @@ class ActorModelTest(test_utils.TestCase, parameterized.TestCase):
       _iter_fn(x)
 
 
+
+class GrlPolicyModelTest(test_utils.TestCase):
+
+  def test_compact_observation(self):
+    # A larger grid than the default one, the mask has to be unpacked with the
+    # given config.
+    config = observation_config.ObservationConfig(
+        max_num_nodes=40, max_num_edges=60, max_grid_size=144)
+    compact_config = observation_config.ObservationConfig(
+        max_num_nodes=40, max_num_edges=60, max_grid_size=144, compact=True)
+    cache = static_feature_cache.StaticFeatureCache()
+    cache.add_static_feature(config.observation_space.sample())
+    action_spec = tensor_spec.BoundedTensorSpec(
+        (), tf.int64, minimum=0, maximum=config.max_grid_size**2 - 1)
+
+    def logits(config, obs):
+      observation_spec = tensor_spec.from_spec(
+          gym_wrapper.spec_from_gym_space(config.dynamic_observation_space))
+      actor_net, _ = grl_model.create_grl_models(
+          observation_spec,
+          action_spec,
+          cache.get_all_static_features(),
+          observation_config=config)
+      obs = tf.nest.map_structure(lambda x: tf.expand_dims(x, 0), obs)
+      distribution, _ = actor_net(obs)
+      return distribution.logits
+
+    obs = config.dynamic_observation_space.sample()
+    obs['mask'] = (np.arange(config.max_grid_size**2) % 3 > 0).astype(np.int32)
+    for key in observation_config.HALF_PRECISION_OBSERVATIONS:
+      obs[key] = obs[key].astype(np.float16).astype(np.float32)
+    tf.random.set_seed(0)
+    expected = logits(config, obs)
+    tf.random.set_seed(0)
+    compact_logits = logits(compact_config,
+                            compact_config.compact_observation(obs))
+    self.assertAllClose(expected, compact_logits)
+    # The masked locations get the padding logit.
+    self.assertAllEqual(compact_logits[0] > -1e9, obs['mask'] > 0)
+
+
+
 if __name__ == '__main__':
   test_utils.main()